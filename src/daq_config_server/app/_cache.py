@@ -0,0 +1,443 @@
+import logging
+import os
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Lock
+from typing import Any, Generic, NamedTuple, TypeVar, cast
+
+from cachetools import LRUCache, TTLCache
+
+from daq_config_server.app._config import CacheConfig
+from daq_config_server.app._metrics import COALESCED_CALLS, cache_lookup_counters
+
+LOGGER = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class FileFingerprint(NamedTuple):
+    """Cheap identity of a file on disk, taken from a single ``os.stat`` call. If any
+    of these change then anything derived from the file's contents is out of date."""
+
+    path: Path
+    inode: int
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def from_stat(cls, path: Path, stat_result: os.stat_result) -> "FileFingerprint":
+        return cls(
+            path, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+        )
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileFingerprint":
+        return cls.from_stat(path, os.stat(path))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    max_entries: int = 0
+    # Only counted by caches bounded in bytes
+    size_bytes: int = 0
+    max_size_bytes: int | None = None
+
+
+class _EvictionCountingLRUCache(LRUCache[K, V]):
+    """LRUCache only calls popitem when it needs to make room for a new item"""
+
+    def __init__(
+        self,
+        maxsize: int,
+        on_evict: Callable[[], None],
+        getsizeof: Callable[[V], int] | None = None,
+    ):
+        super().__init__(maxsize, getsizeof)
+        self._on_evict = on_evict
+
+    def popitem(self) -> tuple[K, V]:
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """A response body exactly as it is sent, along with its fully computed headers"""
+
+    body: bytes
+    raw_headers: list[tuple[bytes, bytes]]
+
+    @property
+    def size(self) -> int:
+        """Approximate memory used, in bytes"""
+        return len(self.body) + sum(
+            len(name) + len(value) for name, value in self.raw_headers
+        )
+
+
+@dataclass(frozen=True)
+class ConversionFailure:
+    """Why a file failed to convert, remembered so that the file isn't converted
+    again until it changes or ``expires_at``, a ``time.monotonic()`` timestamp"""
+
+    message: str
+    expires_at: float
+
+
+@dataclass(frozen=True)
+class _CacheEntry(Generic[V]):
+    fingerprint: FileFingerprint
+    value: V
+
+
+class FileCache(Generic[K, V]):
+    """Bounded, thread-safe LRU cache of values derived from files. Every entry is
+    stored alongside the fingerprint of the file it was derived from, and is only
+    returned if the caller's fingerprint still matches. Lookups are counted in the
+    metrics of the cache called ``name``, if given.
+
+    If ``max_size_bytes`` and ``sizeof`` are given, the total ``sizeof`` of the
+    values is also kept within ``max_size_bytes``, and values larger than it aren't
+    cached at all."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        enabled: bool = True,
+        name: str | None = None,
+        max_size_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ):
+        self._enabled = enabled and max_entries > 0
+        self._lock = Lock()
+        self._max_entries = max(max_entries, 1)
+        self._sizeof = sizeof if max_size_bytes is not None else None
+        self._stats = CacheStats(
+            max_entries=max_entries,
+            max_size_bytes=max_size_bytes if self._sizeof is not None else None,
+        )
+        self._lookup_counters = cache_lookup_counters(name) if name else None
+        self._entries: LRUCache[K, _CacheEntry[V]] = (
+            _EvictionCountingLRUCache(self._max_entries, self._count_eviction)
+            if max_size_bytes is None or sizeof is None
+            else _EvictionCountingLRUCache(
+                max(max_size_bytes, 1),
+                self._count_eviction,
+                lambda entry: sizeof(entry.value),
+            )
+        )
+
+    def _count_eviction(self):
+        self._stats.evictions += 1
+
+    def get(self, key: K, fingerprint: FileFingerprint) -> V | None:
+        if not self._enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint != fingerprint:
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        if self._lookup_counters:
+            hit_counter, miss_counter = self._lookup_counters
+            (miss_counter if entry is None else hit_counter).inc()
+        return None if entry is None else entry.value
+
+    def put(self, key: K, fingerprint: FileFingerprint, value: V):
+        if not self._enabled:
+            return
+        with self._lock:
+            try:
+                self._entries[key] = _CacheEntry(fingerprint, value)
+            except ValueError:
+                # Larger than the whole cache, so drop any older value instead
+                self._entries.pop(key, None)
+                return
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem()
+
+    def invalidate(self, key: K):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_if(self, predicate: Callable[[K], bool]):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=len(self._entries),
+                max_entries=self._stats.max_entries,
+                size_bytes=(
+                    sum(self._sizeof(entry.value) for entry in self._entries.values())
+                    if self._sizeof is not None
+                    else 0
+                ),
+                max_size_bytes=self._stats.max_size_bytes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    # Calls which waited for another call with the same key rather than doing the work
+    coalesced: int = 0
+
+
+@dataclass(eq=False)
+class _Flight(Generic[V]):
+    done: Event
+    value: V | None = None
+    error: BaseException | None = None
+
+
+class SingleFlight(Generic[K, V]):
+    """Make sure that only one thread at a time does the work for each key. Any
+    other thread which asks for the same key while the work is in progress waits
+    for it to finish and shares its result, or its exception. Coalesced calls are
+    counted in the metrics of the flight called ``name``, if given."""
+
+    def __init__(self, name: str | None = None):
+        self._lock = Lock()
+        self._flights: dict[K, _Flight[V]] = {}
+        self._stats = SingleFlightStats()
+        self._coalesced_counter = COALESCED_CALLS.labels(name) if name else None
+
+    def do(self, key: K, work: Callable[[], V]) -> V:
+        with self._lock:
+            self._stats.calls += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(Event())
+                is_leader = True
+            else:
+                self._stats.coalesced += 1
+                is_leader = False
+
+        if is_leader:
+            try:
+                flight.value = work()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.value
+
+        if self._coalesced_counter:
+            self._coalesced_counter.inc()
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return cast(V, flight.value)
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(
+                calls=self._stats.calls, coalesced=self._stats.coalesced
+            )
+
+
+class NegativeCache:
+    """Bounded, thread-safe cache of the status code and detail of responses to
+    requests for files which aren't whitelisted or don't exist. Entries expire after
+    a short time, as there is no fingerprint to check them against."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self._enabled = max_entries > 0 and ttl_s > 0
+        self._lock = Lock()
+        self._stats = CacheStats(max_entries=max_entries)
+        self._entries = TTLCache[Path, tuple[int, str]](
+            max(max_entries, 1), ttl_s if self._enabled else 1
+        )
+        self._hit_counter, self._miss_counter = cache_lookup_counters("negative")
+
+    def get(self, path: Path) -> tuple[int, str] | None:
+        if not self._enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        (self._miss_counter if entry is None else self._hit_counter).inc()
+        return entry
+
+    def put(self, path: Path, status_code: int, detail: str):
+        if not self._enabled:
+            return
+        with self._lock:
+            self._entries[path] = (status_code, detail)
+
+    def invalidate(self, path: Path, recursive: bool = False):
+        """Forget about a file, or every file below a directory if ``recursive``"""
+        with self._lock:
+            if not recursive:
+                self._entries.pop(path, None)
+                return
+            for key in [key for key in self._entries if key.is_relative_to(path)]:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                entries=len(self._entries),
+                max_entries=self._stats.max_entries,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_conversion_cache: FileCache[Path, Any] = FileCache(
+    CacheConfig().max_entries, name="conversion"
+)
+_utf8_check_cache: FileCache[Path, bool] = FileCache(
+    CacheConfig().max_entries, name="utf8_check"
+)
+_response_body_cache: FileCache[tuple[Path, str, str], EncodedBody] = FileCache(
+    CacheConfig().max_entries,
+    name="response_body",
+    max_size_bytes=CacheConfig().max_response_body_bytes,
+    sizeof=lambda body: body.size,
+)
+_conversion_failure_cache: FileCache[Path, ConversionFailure] = FileCache(
+    CacheConfig().max_entries, name="conversion_failure"
+)
+_negative_cache = NegativeCache(CacheConfig().max_entries, CacheConfig().negative_ttl_s)
+_max_body_size = CacheConfig().max_body_size
+_conversion_flight: SingleFlight[tuple[Path, FileFingerprint], Any] = SingleFlight(
+    "conversion"
+)
+_response_body_flight: SingleFlight[
+    tuple[Path, str, str, FileFingerprint], EncodedBody
+] = SingleFlight("response_body")
+
+
+def get_conversion_cache() -> FileCache[Path, Any]:
+    return _conversion_cache
+
+
+def get_utf8_check_cache() -> FileCache[Path, bool]:
+    """Whether each file is valid UTF-8, so that text files can be sent straight from
+    disk without decoding them on every request"""
+    return _utf8_check_cache
+
+
+def get_response_body_cache() -> FileCache[tuple[Path, str, str], EncodedBody]:
+    """Encoded response bodies, keyed by file path, media type and content encoding,
+    so that each file is only read, converted, serialized and compressed once per
+    representation until it changes. Bounded by the total size of the bodies as
+    well as by their number."""
+    return _response_body_cache
+
+
+def get_conversion_flight() -> SingleFlight[tuple[Path, FileFingerprint], Any]:
+    """Coalesces concurrent conversions of the same version of a file"""
+    return _conversion_flight
+
+
+def get_response_body_flight() -> SingleFlight[
+    tuple[Path, str, str, FileFingerprint], EncodedBody
+]:
+    """Coalesces concurrent encoding of the same representation of a file"""
+    return _response_body_flight
+
+
+def get_conversion_failure_cache() -> FileCache[Path, ConversionFailure]:
+    """Recent conversion failures, so that a file which is slow to fail to convert
+    isn't converted again on every request for it"""
+    return _conversion_failure_cache
+
+
+def get_negative_cache() -> NegativeCache:
+    """403 and 404 responses, so that repeated requests for files which aren't
+    whitelisted or don't exist don't each need the whitelist checked and a stat"""
+    return _negative_cache
+
+
+def get_max_body_size() -> int:
+    """Size in bytes of the largest plain text or raw file to cache the body of"""
+    return _max_body_size
+
+
+def init_cache(config: CacheConfig) -> None:
+    global _conversion_cache, _utf8_check_cache, _response_body_cache, _max_body_size
+    global _conversion_flight, _response_body_flight, _conversion_failure_cache
+    global _negative_cache
+    _conversion_cache = FileCache(
+        config.max_entries, enabled=config.enabled, name="conversion"
+    )
+    _utf8_check_cache = FileCache(
+        config.max_entries, enabled=config.enabled, name="utf8_check"
+    )
+    _response_body_cache = FileCache(
+        config.max_entries,
+        enabled=config.enabled,
+        name="response_body",
+        max_size_bytes=config.max_response_body_bytes,
+        sizeof=lambda body: body.size,
+    )
+    _conversion_failure_cache = FileCache(
+        config.max_entries, enabled=config.enabled, name="conversion_failure"
+    )
+    _negative_cache = NegativeCache(
+        config.max_entries if config.enabled else 0, config.negative_ttl_s
+    )
+    _max_body_size = config.max_body_size
+    _conversion_flight = SingleFlight("conversion")
+    _response_body_flight = SingleFlight("response_body")
+
+
+def invalidate_file(path: Path) -> None:
+    """Drop everything cached from a file"""
+    get_conversion_cache().invalidate(path)
+    get_utf8_check_cache().invalidate(path)
+    get_conversion_failure_cache().invalidate(path)
+    get_negative_cache().invalidate(path)
+    get_response_body_cache().invalidate_if(lambda key: key[0] == path)
+
+
+def log_cache_stats() -> None:
+    LOGGER.info(f"Conversion cache stats: {get_conversion_cache().stats()}")
+    LOGGER.info(f"UTF-8 check cache stats: {get_utf8_check_cache().stats()}")
+    LOGGER.info(f"Response body cache stats: {get_response_body_cache().stats()}")
+    LOGGER.info(
+        f"Conversion failure cache stats: {get_conversion_failure_cache().stats()}"
+    )
+    LOGGER.info(f"Negative cache stats: {get_negative_cache().stats()}")
+    LOGGER.info(f"Conversion single-flight stats: {get_conversion_flight().stats()}")
+    LOGGER.info(
+        f"Response body single-flight stats: {get_response_body_flight().stats()}"
+    )
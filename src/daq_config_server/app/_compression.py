@@ -0,0 +1,80 @@
+import gzip
+import sys
+from enum import StrEnum
+
+from daq_config_server.app._config import CompressionConfig
+
+if sys.version_info >= (3, 14):
+    from compression import zstd
+else:
+    from backports import zstd
+
+
+class ContentEncoding(StrEnum):
+    IDENTITY = "identity"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+# Used to break ties between encodings the client likes equally
+_PREFERRED_ENCODINGS = (ContentEncoding.ZSTD, ContentEncoding.GZIP)
+
+_compression_config = CompressionConfig()
+
+
+def get_compression_config() -> CompressionConfig:
+    return _compression_config
+
+
+def init_compression(config: CompressionConfig) -> None:
+    global _compression_config
+    _compression_config = config
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    qualities: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            qualities[coding.strip().lower()] = quality
+    return qualities
+
+
+def negotiate_encoding(accept_encoding: str | None) -> ContentEncoding:
+    """Pick the best compression for a response from a request's Accept-Encoding
+    header. Falls back to no compression if compression is disabled or the client
+    accepts none of the supported encodings."""
+    if not accept_encoding or not _compression_config.enabled:
+        return ContentEncoding.IDENTITY
+    qualities = _parse_accept_encoding(accept_encoding)
+    best, best_quality = ContentEncoding.IDENTITY, 0.0
+    for encoding in _PREFERRED_ENCODINGS:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes | memoryview, encoding: ContentEncoding) -> bytes:
+    match encoding:
+        case ContentEncoding.GZIP:
+            # Fix mtime so that the same body always compresses to the same bytes
+            return gzip.compress(
+                body, compresslevel=_compression_config.gzip_level, mtime=0
+            )
+        case ContentEncoding.ZSTD:
+            return zstd.compress(body, level=_compression_config.zstd_level)
+        case ContentEncoding.IDENTITY:
+            return bytes(body)
+
+
+def should_compress(body: bytes | memoryview) -> bool:
+    return len(body) >= _compression_config.minimum_size
@@ -1,4 +1,5 @@
 import os
+from enum import StrEnum
 
 import yaml
 from pydantic import BaseModel
@@ -20,6 +21,114 @@ class WhitelistConfig(BaseModel):
 
 class ConverterConfig(BaseModel):
     config_file: str = DEFAULT_CONVERTER_MAP_PATH
+    # Longest time a converter may take, unless its entry in the converter map sets
+    # its own ``timeout_s``. None means no limit.
+    timeout_s: float | None = None
+    # How long a file which failed to convert is answered with the same error
+    # straight away, unless it changes first
+    failure_ttl_s: float = 300.0
+    # The same for a file whose converter timed out, which is more likely to have
+    # been because the server was busy than because the file is broken
+    timeout_failure_ttl_s: float = 30.0
+
+
+class ConversionPoolConfig(BaseModel):
+    # Number of processes to run converters with ``executor: process`` in the
+    # converter map in. These are only started once they are needed. If 0, those
+    # converters are run in the thread handling the request like any other.
+    max_workers: int = 2
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    max_entries: int = 256
+    # Larger plain text and raw files are streamed from disk rather than held in memory
+    max_body_size: int = 1024 * 1024
+    # Most memory, in bytes, used by cached response bodies, including every
+    # compressed variant of converted JSON. Older bodies are dropped to stay within it.
+    max_response_body_bytes: int = 128 * 1024 * 1024
+    # How long requests for a file which isn't whitelisted or doesn't exist are
+    # answered without checking again, unless the whitelist is reloaded or the file
+    # watcher sees the file created first. 0 disables this.
+    negative_ttl_s: float = 2.0
+
+
+class SharedCacheConfig(BaseModel):
+    enabled: bool = False
+    url: str = "redis://localhost:6379/0"
+    key_prefix: str = "daq-config-server"
+    # Entries never go out of date, so this only limits how long unused ones are kept
+    ttl_s: int = 24 * 3600
+    socket_timeout_s: float = 0.5
+    # How long to convert files without the shared cache after it fails, rather than
+    # waiting for it to time out again on every request
+    backoff_s: float = 10.0
+
+
+class CompressionConfig(BaseModel):
+    enabled: bool = True
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    zstd_level: int = 3
+
+
+class FileWatcherBackend(StrEnum):
+    AUTO = "auto"
+    INOTIFY = "inotify"
+    POLLING = "polling"
+
+
+class FileWatcherConfig(BaseModel):
+    enabled: bool = False
+    # Inotify doesn't see changes made from other hosts to files on network
+    # filesystems, so ``auto`` polls files on those and uses inotify for the rest
+    backend: FileWatcherBackend = FileWatcherBackend.AUTO
+    poll_interval_s: float = 1.0
+
+
+class InvalidationBusBackend(StrEnum):
+    MEMORY = "memory"
+    REDIS = "redis"
+
+
+class InvalidationBusConfig(BaseModel):
+    # Tell every other worker, of every replica, about changes seen by the file
+    # watcher, so that they don't have to wait to see them for themselves
+    enabled: bool = False
+    backend: InvalidationBusBackend = InvalidationBusBackend.REDIS
+    url: str = "redis://localhost:6379/0"
+    channel: str = "daq-config-server:invalidate"
+    # Longest time to wait for Redis to connect or respond before retrying, so that
+    # an unreachable server doesn't hold up receiving changes for long
+    socket_timeout_s: float = 1.0
+
+
+class EventsConfig(BaseModel):
+    # How often to check for changes to files which aren't being watched
+    poll_interval_s: float = 1.0
+    keepalive_interval_s: float = 15.0
+    # Longest time that a request to the /config/watch endpoint can wait for
+    max_watch_timeout_s: float = 300.0
+
+
+class WarmupConfig(BaseModel):
+    enabled: bool = False
+    # Also read whitelisted files which don't have a converter, as plain text
+    include_whitelisted_files: bool = False
+    max_concurrency: int = 8
+
+
+class MetricsConfig(BaseModel):
+    # Where each worker keeps its metrics, so that they can be summed over every
+    # worker. Only used if there is more than one worker, and PROMETHEUS_MULTIPROC_DIR
+    # takes precedence if it is set.
+    multiprocess_dir: str = "/tmp/daq-config-server-metrics"
+
+
+class ServerTimingConfig(BaseModel):
+    # Add a Server-Timing header to /config responses, breaking down where the time
+    # taken to handle each request went
+    enabled: bool = False
 
 
 class AppConfig(BaseModel):
@@ -27,6 +136,16 @@ class AppConfig(BaseModel):
     uvicorn: UvicornConfig = UvicornConfig()
     whitelist: WhitelistConfig = WhitelistConfig()
     converter_map: ConverterConfig = ConverterConfig()
+    conversion_pool: ConversionPoolConfig = ConversionPoolConfig()
+    cache: CacheConfig = CacheConfig()
+    shared_cache: SharedCacheConfig = SharedCacheConfig()
+    compression: CompressionConfig = CompressionConfig()
+    file_watcher: FileWatcherConfig = FileWatcherConfig()
+    invalidation_bus: InvalidationBusConfig = InvalidationBusConfig()
+    events: EventsConfig = EventsConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    server_timing: ServerTimingConfig = ServerTimingConfig()
 
 
 def load_config() -> AppConfig:
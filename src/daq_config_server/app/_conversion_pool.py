@@ -0,0 +1,206 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from multiprocessing.queues import SimpleQueue
+from threading import Event, Lock, Thread
+from typing import Any
+
+from daq_config_server.app._config import ConversionPoolConfig
+from daq_config_server.app._file_converter_map import Converter
+from daq_config_server.app._json import SerializedJson, dump_json
+
+LOGGER = logging.getLogger(__name__)
+
+_lock = Lock()
+_config = ConversionPoolConfig()
+_pool: "_ConversionPool | None" = None
+
+# Set in each pool process, to tell the server process which conversions have started
+_started_queue: "SimpleQueue[tuple[int, int] | None] | None" = None
+
+
+def _init_pool_process(started_queue: "SimpleQueue[tuple[int, int] | None]"):
+    global _started_queue
+    _started_queue = started_queue
+
+
+def _convert_to_json(job_id: int, converter: Converter, raw_contents: str) -> bytes:
+    """Run in a pool process, so that only the serialized result is sent back"""
+    if _started_queue is not None:
+        _started_queue.put((job_id, os.getpid()))
+    return dump_json(converter(raw_contents))
+
+
+class _Job:
+    def __init__(self):
+        self.started = Event()
+        self.pid: int | None = None
+
+
+class _ConversionPool:
+    """A process pool whose processes say when they start each conversion, so that
+    conversions are timed from then rather than from when they were submitted, and
+    so that the process running a stuck conversion can be killed"""
+
+    def __init__(self, max_workers: int):
+        # Forking a process which has threads running isn't safe
+        context = multiprocessing.get_context("spawn")
+        self._started_queue: SimpleQueue[tuple[int, int] | None] = context.SimpleQueue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_pool_process,
+            initargs=(self._started_queue,),
+        )
+        self._lock = Lock()
+        self._job_ids = itertools.count()
+        self._jobs: dict[int, _Job] = {}
+        # Set once a stuck conversion has been killed, which breaks the pool for
+        # every other conversion in it too
+        self.killed_stuck_conversion = False
+        Thread(
+            target=self._receive_started, name="conversion-pool-started", daemon=True
+        ).start()
+
+    def _receive_started(self):
+        while (message := self._started_queue.get()) is not None:
+            job_id, pid = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                job.pid = pid
+                job.started.set()
+
+    def convert(
+        self, converter: Converter, raw_contents: str, timeout_s: float | None
+    ) -> bytes:
+        """Convert in a pool process, waiting for as long as it takes for a process
+        to be free and then for at most ``timeout_s`` seconds for the result. If it
+        times out, the process running it is killed."""
+        job_id, job = next(self._job_ids), _Job()
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            future = self._executor.submit(
+                _convert_to_json, job_id, converter, raw_contents
+            )
+            # Stop waiting for the conversion to start if it never will
+            future.add_done_callback(lambda _: job.started.set())
+            job.started.wait()
+            try:
+                return future.result(timeout_s)
+            except TimeoutError:
+                self._kill(job.pid)
+                raise
+        finally:
+            with self._lock:
+                del self._jobs[job_id]
+
+    def _kill(self, pid: int | None):
+        self.killed_stuck_conversion = True
+        if pid is not None:
+            # The pool terminates its other processes once it sees this one die
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    def shutdown(self, wait: bool, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._started_queue.put(None)
+
+
+def _get_pool() -> _ConversionPool | None:
+    global _pool
+    with _lock:
+        if _pool is None and _config.max_workers > 0:
+            _pool = _ConversionPool(_config.max_workers)
+            LOGGER.info(
+                f"Started conversion process pool with {_config.max_workers} workers"
+            )
+        return _pool
+
+
+def convert_out_of_process(
+    converter: Converter, raw_contents: str, timeout_s: float | None = None
+) -> Any:
+    """Run a converter in the conversion process pool, so that a slow conversion
+    doesn't hold the GIL of the server process, and return its result as
+    SerializedJson. If the pool is disabled, run the converter as
+    ``convert_in_thread`` does and return its result as is.
+
+    Raises:
+        TimeoutError: If the result isn't ready ``timeout_s`` seconds after a pool
+            process started converting it. Time spent waiting for a free pool
+            process doesn't count.
+    """
+    retried = False
+    while (pool := _get_pool()) is not None:
+        try:
+            return SerializedJson(pool.convert(converter, raw_contents, timeout_s))
+        except TimeoutError:
+            LOGGER.error("Conversion timed out, restarting conversion process pool")
+            _abandon_pool(pool)
+            raise
+        except BrokenProcessPool:
+            _abandon_pool(pool)
+            if pool.killed_stuck_conversion and not retried:
+                # Broken by killing another conversion, not by this one
+                LOGGER.warning("Retrying conversion in restarted process pool")
+                retried = True
+                continue
+            # A pool process died, e.g. because it ran out of memory, so start again
+            LOGGER.error("Conversion process pool is broken, restarting it")
+            raise
+    return convert_in_thread(converter, raw_contents, timeout_s)
+
+
+def convert_in_thread(
+    converter: Converter, raw_contents: str, timeout_s: float | None = None
+) -> Any:
+    """Run a converter, giving up on it after ``timeout_s`` seconds. A conversion
+    which times out can't be interrupted, so it is left to finish in its own
+    thread, where it still holds the GIL whenever it runs. Only conversions in the
+    process pool are stopped when they time out.
+
+    Raises:
+        TimeoutError: If the converter hasn't finished after ``timeout_s`` seconds
+    """
+    if timeout_s is None:
+        return converter(raw_contents)
+    future: Future[Any] = Future()
+
+    def convert():
+        try:
+            future.set_result(converter(raw_contents))
+        except BaseException as e:
+            future.set_exception(e)
+
+    Thread(target=convert, name="conversion", daemon=True).start()
+    return future.result(timeout_s)
+
+
+def _abandon_pool(pool: _ConversionPool):
+    """Stop using a pool, without waiting for conversions already submitted to it"""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def init_conversion_pool(config: ConversionPoolConfig) -> None:
+    global _config
+    shutdown_conversion_pool()
+    _config = config
+
+
+def shutdown_conversion_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
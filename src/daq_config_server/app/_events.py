@@ -0,0 +1,68 @@
+import asyncio
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+
+from daq_config_server.app._config import EventsConfig
+from daq_config_server.app._watcher import get_file_watcher
+
+_events_config = EventsConfig()
+
+
+def get_events_config() -> EventsConfig:
+    return _events_config
+
+
+def init_events(config: EventsConfig) -> None:
+    global _events_config
+    _events_config = config
+
+
+class ChangeSubscription:
+    """Wake an async task as soon as the file watcher sees a change to any of a set
+    of files. Without a file watcher changes can't be seen, so the task is woken
+    every poll interval instead to check for itself."""
+
+    def __init__(self, file_paths: Iterable[Path]):
+        self._file_paths = frozenset(file_paths)
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._watcher = get_file_watcher()
+
+    def __enter__(self) -> "ChangeSubscription":
+        if self._watcher is not None:
+            self._watcher.add_listener(self._on_change)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        if self._watcher is not None:
+            self._watcher.remove_listener(self._on_change)
+
+    def _on_change(self, changed_path: Path):
+        if any(path.is_relative_to(changed_path) for path in self._file_paths):
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def wait(self, timeout_s: float, poll: bool = False) -> bool:
+        """Wait until one of the files may have changed, or the timeout elapses.
+
+        Args:
+            timeout_s: The longest time to wait.
+            poll: Wake up after at most the poll interval even if there is a file
+                watcher, e.g. because a file doesn't exist and so isn't watched.
+        Returns:
+            Whether the file watcher saw a change.
+        """
+        if poll or self._watcher is None:
+            timeout_s = min(timeout_s, _events_config.poll_interval_s)
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout_s)
+        except TimeoutError:
+            return False
+        finally:
+            self._changed.clear()
+        return True
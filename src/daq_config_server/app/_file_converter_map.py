@@ -1,4 +1,5 @@
 from collections.abc import Callable
+from enum import StrEnum
 from pathlib import Path
 from typing import Any
 
@@ -29,6 +30,13 @@ Converter = Callable[[str], Any]
 ConverterMap = Callable[[Path], Converter | None]
 
 
+class ConverterExecutor(StrEnum):
+    # In the thread handling the request
+    THREAD = "thread"
+    # In the conversion process pool, so as not to hold the GIL of the server process
+    PROCESS = "process"
+
+
 def get_converter(path: Path) -> Converter | None:
     """Obtain a converter for converting the specified file to a format for return by
     the config server.
@@ -42,9 +50,45 @@ def get_converter(path: Path) -> Converter | None:
     return _converter_map(path)
 
 
+def get_converter_executor(path: Path) -> ConverterExecutor:
+    """Get where the converter for a file should be run, as chosen by the optional
+    ``executor`` of its entry in the converter map"""
+    return _converter_executors.get(path, ConverterExecutor.THREAD)
+
+
+def get_converter_timeout(path: Path) -> float | None:
+    """Get the longest time the converter for a file may take, as set by the optional
+    ``timeout_s`` of its entry in the converter map, or by the default for all files"""
+    return _converter_timeouts.get(path, _converter_config.timeout_s)
+
+
+def get_converter_config() -> ConverterConfig:
+    return _converter_config
+
+
+def get_converter_map_paths() -> list[Path]:
+    """Get the paths of all of the files which have a converter"""
+    return _converter_map_paths
+
+
 def init_converter_map(config: ConverterConfig):
-    global _converter_map
-    _converter_map = load_converter_map_from_config_file(Path(config.config_file))
+    global _converter_map, _converter_map_paths, _converter_executors
+    global _converter_timeouts, _converter_config
+    _converter_config = config
+    entries = _load_entries_from_config_file(Path(config.config_file))
+    mappings = _mappings_from_entries(entries)
+    _converter_map = _converter_map_from_mappings(mappings)
+    _converter_map_paths = [Path(path) for path in mappings]
+    _converter_executors = {
+        Path(entry["path"]): ConverterExecutor(entry["executor"])
+        for entry in entries
+        if "executor" in entry
+    }
+    _converter_timeouts = {
+        Path(entry["path"]): float(entry["timeout_s"])
+        for entry in entries
+        if "timeout_s" in entry
+    }
 
 
 CONVERTER_FUNCS: dict[str, Converter] = {
@@ -64,14 +108,28 @@ CONVERTER_FUNCS: dict[str, Converter] = {
 
 
 def load_converter_map_from_config_file(config_path: Path) -> ConverterMap:
+    return _converter_map_from_mappings(_load_mappings_from_config_file(config_path))
+
+
+def _load_mappings_from_config_file(config_path: Path) -> dict[str, str]:
+    return _mappings_from_entries(_load_entries_from_config_file(config_path))
+
+
+def _load_entries_from_config_file(config_path: Path) -> list[dict[str, Any]]:
     with config_path.open() as stream:
-        path_converter_kvpairs = yaml.safe_load(stream)
+        return yaml.safe_load(stream)
+
 
+def _mappings_from_entries(entries: list[dict[str, Any]]) -> dict[str, str]:
     mappings: dict[str, str] = {}
 
-    for path_converter_dict in path_converter_kvpairs:
+    for path_converter_dict in entries:
         mappings[path_converter_dict["path"]] = path_converter_dict["converter"]
 
+    return mappings
+
+
+def _converter_map_from_mappings(mappings: dict[str, str]) -> ConverterMap:
     def get_converter_func(path: Path) -> Converter | None:
         converter_name = mappings.get(str(path))
         return CONVERTER_FUNCS.get(converter_name) if converter_name else None
@@ -80,3 +138,7 @@ def load_converter_map_from_config_file(config_path: Path) -> ConverterMap:
 
 
 _converter_map: ConverterMap = lambda _: None  # noqa: E731
+_converter_map_paths: list[Path] = []
+_converter_executors: dict[Path, ConverterExecutor] = {}
+_converter_timeouts: dict[Path, float] = {}
+_converter_config = ConverterConfig()
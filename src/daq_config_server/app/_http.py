@@ -0,0 +1,103 @@
+import hashlib
+from collections.abc import Mapping
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.datastructures import Headers
+
+from ._cache import FileFingerprint
+from ._compression import ContentEncoding
+
+
+def make_etag(fingerprint: FileFingerprint, *variant: str) -> str:
+    """Make a strong ETag for one representation of a file. The ETag changes whenever
+    the file's fingerprint changes, and differs between representations (e.g. accept
+    type or converter) of the same file."""
+    digest = hashlib.blake2b(
+        repr((tuple(fingerprint), variant)).encode(), digest_size=16
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def encoded_etag(etag: str, encoding: ContentEncoding) -> str:
+    """Make the ETag for a compressed copy of a representation. This is the
+    representation's ETag with the encoding appended, so that it is distinct from
+    the uncompressed ETag but can still be matched against it."""
+    if encoding == ContentEncoding.IDENTITY:
+        return etag
+    return etag.removesuffix('"') + f'-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    for encoding in ContentEncoding:
+        if etag.endswith(f'-{encoding}"'):
+            return etag.removesuffix(f'-{encoding}"') + '"'
+    return etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, using the weak comparison
+    required for If-None-Match by RFC 9110. Compressed and uncompressed copies of
+    the same representation match each other, since a client holding either one
+    already has the same decoded content."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _strip_encoding(etag) in {
+        _strip_encoding(tag.strip().removeprefix("W/"))
+        for tag in if_none_match.split(",")
+    }
+
+
+def format_last_modified(fingerprint: FileFingerprint) -> str:
+    return formatdate(fingerprint.mtime_ns / 1e9, usegmt=True)
+
+
+def modified_since(if_modified_since: str | None, fingerprint: FileFingerprint) -> bool:
+    """Check whether a file was modified after the time in an If-Modified-Since
+    header. HTTP dates only have one second resolution, so compare whole seconds."""
+    if not if_modified_since:
+        return True
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return True
+    return fingerprint.mtime_ns // 1_000_000_000 > int(since.timestamp())
+
+
+def is_not_modified(
+    request_headers: Headers, etag: str, fingerprint: FileFingerprint
+) -> bool:
+    """Evaluate conditional GET headers. As per RFC 9110, If-Modified-Since is ignored
+    when If-None-Match is present."""
+    if if_none_match := request_headers.get("if-none-match"):
+        return etag_matches(if_none_match, etag)
+    if if_modified_since := request_headers.get("if-modified-since"):
+        return not modified_since(if_modified_since, fingerprint)
+    return False
+
+
+def format_server_timing(durations_s: Mapping[str, float]) -> str:
+    """Make a Server-Timing header from durations in seconds. The header gives
+    durations in milliseconds."""
+    return ", ".join(
+        f"{name};dur={duration_s * 1000:.3f}"
+        for name, duration_s in durations_s.items()
+    )
+
+
+def parse_server_timing(server_timing: str) -> dict[str, float]:
+    """Get the duration in milliseconds of each metric in a Server-Timing header.
+    Metrics without a duration are left out."""
+    durations_ms: dict[str, float] = {}
+    for metric in server_timing.split(","):
+        name, *params = metric.split(";")
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() != "dur":
+                continue
+            try:
+                durations_ms[name.strip()] = float(value)
+            except ValueError:
+                pass
+    return durations_ms
@@ -0,0 +1,323 @@
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread, local
+from typing import Any, Protocol
+
+from pydantic import BaseModel, ValidationError
+from redis import RedisError, from_url
+
+from daq_config_server.app._cache import invalidate_file
+from daq_config_server.app._config import InvalidationBusBackend, InvalidationBusConfig
+from daq_config_server.app._metrics import INVALIDATION_LATENCY
+from daq_config_server.app._watcher import get_file_watcher
+
+LOGGER = logging.getLogger(__name__)
+
+InvalidationListener = Callable[[Path], None]
+
+_RECONNECT_INTERVAL_S = 1.0
+_STOP_CHECK_INTERVAL_S = 0.5
+# Most changes waiting to be published to Redis. More are dropped, as they would
+# only be waiting on a Redis server which can't be reached.
+_MAX_UNPUBLISHED = 1000
+
+_invalidation_bus: "InvalidationBus | None" = None
+
+
+class InvalidationMessage(BaseModel):
+    """A change to a file, or to anything below a directory, seen by one worker"""
+
+    path: Path
+    # Which bus sent the message, so that it can ignore its own messages
+    origin: str
+    # Wall clock time the message was sent, to measure how long it took to arrive
+    sent_at: float
+
+
+@dataclass
+class InvalidationStats:
+    published: int = 0
+    received: int = 0
+    total_latency_s: float = 0.0
+    max_latency_s: float = 0.0
+
+    @property
+    def mean_latency_s(self) -> float:
+        return self.total_latency_s / self.received if self.received else 0.0
+
+
+class InvalidationBus(ABC):
+    """Broadcast file changes seen by this worker to every other worker, and pass
+    on changes seen by other workers to listeners in this one. Changes received
+    from other workers are never broadcast again."""
+
+    def __init__(self):
+        self._origin = uuid.uuid4().hex
+        self._lock = Lock()
+        self._listeners: list[InvalidationListener] = []
+        self._stats = InvalidationStats()
+        self._receiving = local()
+
+    @abstractmethod
+    def start(self):
+        """Start receiving changes from other workers"""
+
+    @abstractmethod
+    def stop(self):
+        """Stop receiving changes from other workers"""
+
+    @abstractmethod
+    def _send(self, message: InvalidationMessage):
+        """Send a message to every bus, including this one"""
+
+    def add_listener(self, listener: InvalidationListener):
+        """Call ``listener`` with the path of each file or directory which another
+        worker has seen change"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def publish(self, path: Path):
+        if getattr(self._receiving, "active", False):
+            return
+        message = InvalidationMessage(
+            path=path, origin=self._origin, sent_at=time.time()
+        )
+        try:
+            self._send(message)
+        except Exception as e:
+            LOGGER.error(f"Unable to publish change to {path}: {e}")
+            return
+        with self._lock:
+            self._stats.published += 1
+
+    def receive(self, message: InvalidationMessage):
+        """Pass a message from the channel on to the listeners, unless it was sent by
+        this bus"""
+        if message.origin == self._origin:
+            return
+        latency_s = max(0.0, time.time() - message.sent_at)
+        with self._lock:
+            self._stats.received += 1
+            self._stats.total_latency_s += latency_s
+            self._stats.max_latency_s = max(self._stats.max_latency_s, latency_s)
+            listeners = list(self._listeners)
+        INVALIDATION_LATENCY.observe(latency_s)
+        LOGGER.debug(f"{message.path} changed in another worker {latency_s:.3f}s ago")
+        self._receiving.active = True
+        try:
+            for listener in listeners:
+                try:
+                    listener(message.path)
+                except Exception as e:
+                    LOGGER.error(
+                        f"Invalidation listener failed for {message.path}: {e}"
+                    )
+        finally:
+            self._receiving.active = False
+
+    def stats(self) -> InvalidationStats:
+        with self._lock:
+            return InvalidationStats(
+                published=self._stats.published,
+                received=self._stats.received,
+                total_latency_s=self._stats.total_latency_s,
+                max_latency_s=self._stats.max_latency_s,
+            )
+
+
+class InMemoryChannel:
+    """Connects in-memory buses in the same process"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._buses: list[InMemoryInvalidationBus] = []
+
+    def connect(self, bus: "InMemoryInvalidationBus"):
+        with self._lock:
+            self._buses.append(bus)
+
+    def disconnect(self, bus: "InMemoryInvalidationBus"):
+        with self._lock:
+            if bus in self._buses:
+                self._buses.remove(bus)
+
+    def send(self, message: InvalidationMessage):
+        with self._lock:
+            buses = list(self._buses)
+        for bus in buses:
+            bus.receive(message)
+
+
+class InMemoryInvalidationBus(InvalidationBus):
+    """Deliver changes straight away to every other bus connected to the same
+    channel. This is enough for a single worker, and for testing."""
+
+    def __init__(self, channel: InMemoryChannel | None = None):
+        super().__init__()
+        self._channel = channel or InMemoryChannel()
+
+    def start(self):
+        self._channel.connect(self)
+
+    def stop(self):
+        self._channel.disconnect(self)
+
+    def _send(self, message: InvalidationMessage):
+        self._channel.send(message)
+
+
+class RedisPubSub(Protocol):
+    def subscribe(self, *args: Any) -> Any: ...
+
+    def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float = 0.0
+    ) -> dict[str, Any] | None: ...
+
+    def close(self) -> None: ...
+
+
+class RedisClient(Protocol):
+    """The subset of the Redis client used by the invalidation bus"""
+
+    def publish(self, channel: str, message: str) -> Any: ...
+
+    def pubsub(self) -> RedisPubSub: ...
+
+    def close(self) -> None: ...
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Send changes to every worker, of every replica, through a Redis pub/sub
+    channel. Messages sent while a worker is disconnected from Redis are lost, so
+    each worker must still watch files for itself.
+
+    Changes are published from a background thread, so that the file watcher's
+    thread is never held up by a slow or unreachable Redis server."""
+
+    def __init__(self, client: RedisClient, channel: str):
+        super().__init__()
+        self._client = client
+        self._channel = channel
+        self._pubsub = client.pubsub()
+        self._unpublished: Queue[InvalidationMessage] = Queue(_MAX_UNPUBLISHED)
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._publish_thread = Thread(
+            target=self._publish_queued, name="invalidation-publisher", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        self._publish_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in (self._thread, self._publish_thread):
+            if thread.is_alive():
+                thread.join(timeout=1)
+        self._pubsub.close()
+        self._client.close()
+
+    def _send(self, message: InvalidationMessage):
+        try:
+            self._unpublished.put_nowait(message)
+        except Full as e:
+            raise RuntimeError(
+                f"{_MAX_UNPUBLISHED} changes are already waiting to be published"
+            ) from e
+
+    def _publish_queued(self):
+        while not self._stop.is_set():
+            try:
+                message = self._unpublished.get(timeout=_STOP_CHECK_INTERVAL_S)
+            except Empty:
+                continue
+            try:
+                self._client.publish(self._channel, message.model_dump_json())
+            except RedisError as e:
+                LOGGER.error(f"Unable to publish change to {message.path}: {e}")
+
+    def _run(self):
+        subscribed = False
+        while not self._stop.is_set():
+            try:
+                if not subscribed:
+                    self._pubsub.subscribe(self._channel)
+                    subscribed = True
+                data = self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=_STOP_CHECK_INTERVAL_S
+                )
+            except RedisError as e:
+                LOGGER.warning(f"Lost connection to invalidation bus: {e}")
+                self._stop.wait(_RECONNECT_INTERVAL_S)
+                continue
+            if data is None or data.get("type") != "message":
+                continue
+            try:
+                message = InvalidationMessage.model_validate_json(data["data"])
+            except ValidationError as e:
+                LOGGER.warning(f"Ignoring invalid invalidation message: {e}")
+                continue
+            self.receive(message)
+
+
+def _forget_changed_path(path: Path):
+    if file_watcher := get_file_watcher():
+        file_watcher.changed(path, recursive=True)
+    else:
+        invalidate_file(path)
+
+
+def _make_invalidation_bus(config: InvalidationBusConfig) -> InvalidationBus:
+    match config.backend:
+        case InvalidationBusBackend.MEMORY:
+            return InMemoryInvalidationBus()
+        case InvalidationBusBackend.REDIS:
+            client = from_url(
+                config.url,
+                socket_timeout=config.socket_timeout_s,
+                socket_connect_timeout=config.socket_timeout_s,
+            )
+            return RedisInvalidationBus(client, config.channel)
+
+
+def get_invalidation_bus() -> InvalidationBus | None:
+    return _invalidation_bus
+
+
+def init_invalidation_bus(
+    config: InvalidationBusConfig, bus: InvalidationBus | None = None
+) -> None:
+    """Connect to the invalidation bus if it is enabled, publishing every change
+    seen by the file watcher and forgetting about every change received. ``bus``
+    replaces the configured bus, for testing."""
+    global _invalidation_bus
+    if not config.enabled:
+        _invalidation_bus = None
+        return
+    _invalidation_bus = bus or _make_invalidation_bus(config)
+    _invalidation_bus.add_listener(_forget_changed_path)
+    _invalidation_bus.start()
+    if file_watcher := get_file_watcher():
+        file_watcher.add_listener(_invalidation_bus.publish)
+    LOGGER.info(f"Sharing file changes through {type(_invalidation_bus).__name__}")
+
+
+def stop_invalidation_bus() -> None:
+    global _invalidation_bus
+    if _invalidation_bus is None:
+        return
+    if file_watcher := get_file_watcher():
+        file_watcher.remove_listener(_invalidation_bus.publish)
+    _invalidation_bus.stop()
+    stats = _invalidation_bus.stats()
+    LOGGER.info(
+        f"Invalidation bus stats: {stats}, mean latency {stats.mean_latency_s:.3f}s"
+    )
+    _invalidation_bus = None
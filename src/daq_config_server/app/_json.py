@@ -0,0 +1,23 @@
+from typing import Any
+
+import pydantic_core
+
+from daq_config_server.models.base_model import ConfigModel
+
+
+class SerializedJson(bytes):
+    """The result of a converter which has already been serialized to JSON, e.g.
+    because the converter was run in another process"""
+
+
+def dump_json(contents: Any) -> bytes:
+    """Serialize the result of a converter straight to JSON bytes. Models are
+    serialized by their own pydantic serializer, as in ``model_dump_json``, so no
+    intermediate dict is built. Anything else is serialized by pydantic-core, which
+    is much faster than the standard library for large nested structures.
+    Non-finite floats are serialized as null in both cases."""
+    if isinstance(contents, SerializedJson):
+        return contents
+    if isinstance(contents, ConfigModel):
+        return contents.__pydantic_serializer__.to_json(contents)
+    return pydantic_core.to_json(contents, inf_nan_mode="null")
@@ -1,9 +1,22 @@
+import copy
 import logging
+import random
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, SocketHandler
+from queue import Empty, Full, Queue
+from threading import Thread
 from typing import Literal, TextIO
 
 from graypy import GELFTCPHandler
 from pydantic import AnyUrl, BaseModel
 
+from daq_config_server.app._metrics import LOG_RECORDS_DROPPED
+
+# Once the queue of records waiting to be sent to Graylog is this full, records
+# below WARNING are dropped so that there is still room for more important ones
+_SHED_FRACTION = 0.75
+_STOP_TIMEOUT_S = 1.0
+
 LogLevel = Literal["NOTSET", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
 
@@ -11,6 +24,11 @@ class GraylogConfig(BaseModel):
     enabled: bool = False
     level: LogLevel = "INFO"
     url: AnyUrl = AnyUrl("tcp://localhost:5555")
+    # Records waiting to be sent. If Graylog can't keep up, records are dropped
+    # rather than making the code which logged them wait.
+    queue_size: int = 10_000
+    # Most records sent to Graylog in one write
+    batch_size: int = 100
 
 
 class StreamLogConfig(BaseModel):
@@ -18,9 +36,128 @@ class StreamLogConfig(BaseModel):
     level: LogLevel = "DEBUG"
 
 
+class AccessLogConfig(BaseModel):
+    # Fraction of requests whose details are logged at DEBUG
+    sample_rate: float = 1.0
+
+
 class LoggingConfig(BaseModel):
     graylog: GraylogConfig = GraylogConfig()
     stream_log: StreamLogConfig = StreamLogConfig()
+    access_log: AccessLogConfig = AccessLogConfig()
+
+
+_access_log_config = AccessLogConfig()
+
+# ID of the request being handled, if any
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the ``request_id`` of the request being handled to every record, so that
+    all the records logged while handling a request can be found together"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class BatchingGELFHandler(QueueHandler):
+    """Send records to Graylog from a background thread, so that logging never waits
+    for the network. Records are queued and then sent in batches of up to
+    ``batch_size``, with everything queued while one batch is being sent going in
+    the next. If Graylog can't keep up, records below WARNING are dropped once the
+    queue is mostly full, and every record once it is full. Dropped records are
+    counted, and a warning saying how many were dropped is sent with the next batch.
+    """
+
+    def __init__(self, gelf_handler: GELFTCPHandler, queue_size: int, batch_size: int):
+        # None tells the shipping thread to stop
+        self._records: Queue[logging.LogRecord | None] = Queue(max(queue_size, 1))
+        super().__init__(self._records)
+        # Typed as its base class, which graypy doesn't annotate
+        self._gelf_handler: SocketHandler = gelf_handler
+        self._batch_size = max(batch_size, 1)
+        self._shed_size = int(queue_size * _SHED_FRACTION)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._thread = Thread(target=self._ship, name="graylog-shipper", daemon=True)
+        self._thread.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue a copy of the record with its arguments merged into its message, as
+        they may change before it is sent, but with its exception info intact. The
+        queue never leaves this process, so graypy can still make its traceback the
+        ``full_message`` of the GELF message."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if (
+            record.levelno < logging.WARNING
+            and self._records.qsize() >= self._shed_size
+        ):
+            self._drop()
+            return
+        try:
+            self._records.put_nowait(record)
+        except Full:
+            self._drop()
+
+    def _drop(self):
+        self.dropped += 1
+        LOG_RECORDS_DROPPED.inc()
+
+    def _ship(self):
+        stopping = False
+        while not stopping:
+            batch = [self._records.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._records.get_nowait())
+                except Empty:
+                    break
+            stopping = None in batch
+            records = [record for record in batch if record is not None]
+            if (dropped := self.dropped - self._reported_dropped) > 0:
+                self._reported_dropped += dropped
+                records.append(_dropped_records_warning(dropped))
+            if records:
+                self._send(records)
+
+    def _send(self, records: list[logging.LogRecord]):
+        messages: list[bytes] = []
+        for record in records:
+            try:
+                messages.append(self._gelf_handler.makePickle(record))
+            except Exception:
+                self._gelf_handler.handleError(record)
+        # GELF messages sent over TCP are null terminated, so can simply be joined
+        self._gelf_handler.send(b"".join(messages))
+
+    def close(self):
+        """Send any records still queued, then stop"""
+        if self._thread.is_alive():
+            try:
+                self._records.put(None, timeout=_STOP_TIMEOUT_S)
+            except Full:
+                pass
+            self._thread.join(timeout=_STOP_TIMEOUT_S)
+        self._gelf_handler.close()
+        super().close()
+
+
+def _dropped_records_warning(dropped: int) -> logging.LogRecord:
+    return logging.makeLogRecord(
+        {
+            "name": __name__,
+            "levelno": logging.WARNING,
+            "levelname": logging.getLevelName(logging.WARNING),
+            "msg": f"Dropped {dropped} log records as Graylog couldn't keep up",
+        }
+    )
 
 
 def set_up_stream_handler(
@@ -34,6 +171,7 @@ def set_up_stream_handler(
     """
     stream_handler = logging.StreamHandler()
     stream_handler.setLevel(logging_config.stream_log.level)
+    stream_handler.addFilter(RequestIdFilter())
 
     logger.addHandler(stream_handler)
     return stream_handler
@@ -41,8 +179,9 @@ def set_up_stream_handler(
 
 def set_up_graylog_handler(
     logger: logging.Logger, logging_config: LoggingConfig
-) -> GELFTCPHandler:
-    """Creates and configures GELFTCPHandler, then attaches to logger.
+) -> BatchingGELFHandler:
+    """Creates and configures a GELFTCPHandler, then attaches it to logger through a
+    BatchingGELFHandler.
 
     Args:
         logger: Logger to attach handler to
@@ -54,16 +193,23 @@ def set_up_graylog_handler(
         logging_config.graylog.url.host,
         logging_config.graylog.url.port,
     )
-    graylog_handler.setLevel(logging_config.graylog.level)
-
     prefix_formatter = logging.Formatter(
         "[CONFIG-SERVER] %(asctime)s - %(levelname)s - %(message)s"
     )
 
     graylog_handler.setFormatter(prefix_formatter)
 
-    logger.addHandler(graylog_handler)
-    return graylog_handler
+    batching_handler = BatchingGELFHandler(
+        graylog_handler,
+        logging_config.graylog.queue_size,
+        logging_config.graylog.batch_size,
+    )
+    batching_handler.setLevel(logging_config.graylog.level)
+    # Added before queueing, while the request's context is still current. Graylog
+    # gets the ID as a field of its own.
+    batching_handler.addFilter(RequestIdFilter())
+    logger.addHandler(batching_handler)
+    return batching_handler
 
 
 def set_up_logging(logging_config: LoggingConfig) -> None:
@@ -83,3 +229,14 @@ def set_up_logging(logging_config: LoggingConfig) -> None:
 
     if logging_config.graylog.enabled:
         set_up_graylog_handler(logger, logging_config)
+
+
+def init_access_log(logging_config: LoggingConfig) -> None:
+    global _access_log_config
+    _access_log_config = logging_config.access_log
+
+
+def should_log_access() -> bool:
+    """Whether to log the details of a request, sampling them at the configured rate"""
+    sample_rate = _access_log_config.sample_rate
+    return sample_rate >= 1 or random.random() < sample_rate
@@ -0,0 +1,190 @@
+import logging
+import os
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOGGER = logging.getLogger(__name__)
+
+# Must be set before prometheus_client is first imported for metrics to be written
+# to files in this directory, from which they are summed over every worker
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Accept headers sent by the ConfigClient. Anything else is counted as "other", so
+# that clients can't create any number of time series.
+_ACCEPT_LABELS = frozenset(
+    {"application/json", "text/plain", "application/octet-stream"}
+)
+_UNMATCHED_ROUTE = "unmatched"
+
+_SIZE_BUCKETS = tuple(float(4**i) for i in range(4, 13))
+
+REQUEST_DURATION = Histogram(
+    "daq_config_server_request_duration_seconds",
+    "Time taken to send the whole response to a request",
+    ["method", "route", "status", "accept"],
+)
+RESPONSE_SIZE = Histogram(
+    "daq_config_server_response_size_bytes",
+    "Size of response bodies, after compression",
+    ["method", "route", "status", "accept"],
+    buckets=_SIZE_BUCKETS,
+)
+CONVERSION_DURATION = Histogram(
+    "daq_config_server_conversion_duration_seconds",
+    "Time taken by converters from the converter map, including any time spent "
+    "waiting for a conversion process",
+    ["converter", "executor", "outcome"],
+)
+CACHE_LOOKUPS = Counter(
+    "daq_config_server_cache_lookups",
+    "Lookups in each cache, by whether they found an up to date entry",
+    ["cache", "result"],
+)
+COALESCED_CALLS = Counter(
+    "daq_config_server_coalesced_calls",
+    "Calls which waited for the same work already in progress in another thread",
+    ["flight"],
+)
+WHITELIST_RELOAD_DURATION = Histogram(
+    "daq_config_server_whitelist_reload_duration_seconds",
+    "Time taken to read and parse the whitelist",
+    ["outcome"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "daq_config_server_log_records_dropped",
+    "Log records dropped because Graylog couldn't keep up",
+)
+INVALIDATION_LATENCY = Histogram(
+    "daq_config_server_invalidation_latency_seconds",
+    "Time from another worker seeing a file change to this worker hearing about it",
+)
+
+
+def cache_lookup_counters(cache: str) -> tuple[Counter, Counter]:
+    """The counters of hits and misses for a cache"""
+    return CACHE_LOOKUPS.labels(cache, "hit"), CACHE_LOOKUPS.labels(cache, "miss")
+
+
+@contextmanager
+def time_conversion(converter: str, executor: str) -> Generator[None, None, None]:
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except TimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        CONVERSION_DURATION.labels(converter, executor, outcome).observe(
+            time.perf_counter() - start
+        )
+
+
+@contextmanager
+def time_whitelist_reload() -> Generator[None, None, None]:
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        WHITELIST_RELOAD_DURATION.labels(outcome).observe(time.perf_counter() - start)
+
+
+def _accept_label(scope: Scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"accept":
+            accept = value.decode("latin-1")
+            return accept if accept in _ACCEPT_LABELS else "other"
+    return "other"
+
+
+def _route_label(scope: Scope) -> str:
+    """The path template of the route which handled a request, rather than its path,
+    so that each route is a single time series"""
+    route = scope.get("route")
+    return getattr(route, "path", _UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """Record the duration and size of every HTTP response. Durations include
+    sending the body, so streamed responses are timed until they finish."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_and_measure(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            labels = (
+                scope["method"],
+                _route_label(scope),
+                str(status_code),
+                _accept_label(scope),
+            )
+            REQUEST_DURATION.labels(*labels).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(*labels).observe(size)
+
+
+def is_multiprocess() -> bool:
+    return MULTIPROCESS_DIR_ENV in os.environ
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Every metric in the Prometheus text format, along with its content type. In
+    multiprocess mode, metrics are summed over every worker rather than only
+    including those of the worker handling the request."""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def prepare_multiprocess_dir(default_dir: str) -> None:
+    """Use multiprocess mode for workers started after this is called, keeping their
+    metrics in ``default_dir`` unless the environment already names a directory.
+    Files left there by a previous run are removed, as they would otherwise be
+    added to the metrics of this one, so this must only be called before any worker
+    has started."""
+    directory = Path(os.environ.setdefault(MULTIPROCESS_DIR_ENV, default_dir))
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink()
+    LOGGER.info(f"Collecting metrics from every worker in {directory}")
@@ -0,0 +1,100 @@
+import logging
+import re
+import time
+import uuid
+
+from starlette.datastructures import URL, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from daq_config_server.app._log import request_id_var, should_log_access
+
+LOGGER = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Longest request body included in the access log
+MAX_LOGGED_BODY_SIZE = 4096
+
+# Request IDs sent by clients are only used if they can't mess up the logs
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+class RequestIdMiddleware:
+    """Give every request an ID, taken from its X-Request-ID header if it has a
+    valid one, and send it back in the X-Request-ID header of the response"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id_from(scope) or uuid.uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def _request_id_from(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            request_id = value.decode("latin-1")
+            return request_id if _VALID_REQUEST_ID.fullmatch(request_id) else None
+    return None
+
+
+class AccessLogMiddleware:
+    """Log the method, URL, body, status and duration of a sample of requests at
+    DEBUG. Requests which aren't logged pass straight through, and nothing is
+    formatted unless it is logged."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not LOGGER.isEnabledFor(logging.DEBUG)
+            or not should_log_access()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        body = bytearray()
+
+        async def receive_and_capture() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and len(body) < MAX_LOGGED_BODY_SIZE:
+                body.extend(
+                    message.get("body", b"")[: MAX_LOGGED_BODY_SIZE - len(body)]
+                )
+            return message
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_capture, send_and_capture)
+        finally:
+            LOGGER.debug(
+                "method: %s url: %s body: %r status: %d duration: %.1f ms",
+                scope["method"],
+                URL(scope=scope),
+                bytes(body),
+                status_code,
+                (time.perf_counter() - start) * 1000,
+            )
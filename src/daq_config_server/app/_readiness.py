@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class WarmupStatus:
+    total: int = 0
+    warmed: int = 0
+    failed: int = 0
+    # Only set once every file has been warmed up or has failed
+    duration_s: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.duration_s is not None
+
+
+_config_loaded = False
+_warmup_status: WarmupStatus | None = None
+
+
+def init_readiness(warmup_enabled: bool) -> None:
+    """Record that the whitelist and converter map have been loaded. If warm-up is
+    enabled, the server isn't ready until it has finished."""
+    global _config_loaded, _warmup_status
+    _config_loaded = True
+    _warmup_status = WarmupStatus() if warmup_enabled else None
+
+
+def clear_readiness() -> None:
+    """Stop reporting ready, e.g. while shutting down"""
+    global _config_loaded
+    _config_loaded = False
+
+
+def is_ready() -> bool:
+    return _config_loaded and (_warmup_status is None or _warmup_status.finished)
+
+
+def get_warmup_status() -> WarmupStatus | None:
+    """The progress of the current warm-up, or None if warm-up is disabled"""
+    return _warmup_status
+
+
+def set_warmup_status(status: WarmupStatus) -> None:
+    global _warmup_status
+    _warmup_status = status
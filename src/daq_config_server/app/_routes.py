@@ -1,38 +1,224 @@
+import base64
+import codecs
 import json
 import os
+import stat
+import time
+from collections.abc import AsyncGenerator
 from dataclasses import dataclass
+from datetime import UTC, datetime
 from enum import StrEnum
 from pathlib import Path
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from starlette import status
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
 
 from daq_config_server.models.base_model import ConfigModel
 
-from ._file_converter_map import get_converter
+from ._cache import (
+    ConversionFailure,
+    EncodedBody,
+    FileFingerprint,
+    get_conversion_cache,
+    get_conversion_failure_cache,
+    get_conversion_flight,
+    get_max_body_size,
+    get_negative_cache,
+    get_response_body_cache,
+    get_response_body_flight,
+    get_utf8_check_cache,
+)
+from ._compression import ContentEncoding, compress, negotiate_encoding, should_compress
+from ._conversion_pool import convert_in_thread, convert_out_of_process
+from ._events import ChangeSubscription, get_events_config
+from ._file_converter_map import (
+    ConverterExecutor,
+    get_converter,
+    get_converter_config,
+    get_converter_executor,
+    get_converter_timeout,
+)
+from ._http import (
+    encoded_etag,
+    etag_matches,
+    format_last_modified,
+    format_server_timing,
+    is_not_modified,
+    make_etag,
+)
+from ._json import SerializedJson, dump_json
+from ._metrics import render_metrics, time_conversion
+from ._readiness import WarmupStatus, get_warmup_status, is_ready
+from ._shared_cache import get_shared_cache
+from ._timing import record_server_timing, timed
+from ._watcher import get_file_watcher, stat_file
 from ._whitelist import path_is_whitelisted
 
+UTF8_CHECK_CHUNK_SIZE = 1024 * 1024
+MAX_BATCH_ITEMS = 256
+
 
 class ConverterParseError(Exception): ...
 
 
-def get_converted_file_contents(file_path: Path) -> dict[str, Any]:
-    with file_path.open("r", encoding="utf-8") as f:
+class ConverterTimeoutError(ConverterParseError): ...
+
+
+def get_converted_file_contents(
+    file_path: Path, fingerprint: FileFingerprint | None = None
+) -> dict[str, Any]:
+    """Read and convert a file to a dict, reusing the previous conversion if the file
+    hasn't changed since it was last converted."""
+    contents = _get_converter_result(file_path, fingerprint)
+    if isinstance(contents, ConfigModel):
+        return contents.model_dump()
+    if isinstance(contents, SerializedJson):
+        return json.loads(contents)
+    return contents
+
+
+def get_converted_file_json(
+    file_path: Path, fingerprint: FileFingerprint | None = None
+) -> bytes:
+    """Read and convert a file to JSON, reusing the previous conversion if the file
+    hasn't changed since it was last converted, by this worker or, through the shared
+    cache, by any other."""
+    cache = get_conversion_cache()
+    fingerprint = fingerprint or FileFingerprint.from_path(file_path)
+    if (contents := cache.get(file_path, fingerprint)) is not None:
+        with timed("serialize"):
+            return dump_json(contents)
+    shared_cache = get_shared_cache()
+    if shared_cache:
+        with timed("shared_cache"):
+            body = shared_cache.get(fingerprint, _converter_name(file_path))
+        if body:
+            return body
+    contents, body = _convert_once(file_path, fingerprint)
+    if body:
+        return body
+    with timed("serialize"):
+        return dump_json(contents)
+
+
+def _get_converter_result(
+    file_path: Path, fingerprint: FileFingerprint | None
+) -> ConfigModel | Any:
+    cache = get_conversion_cache()
+    fingerprint = fingerprint or FileFingerprint.from_path(file_path)
+    if (contents := cache.get(file_path, fingerprint)) is not None:
+        return contents
+    shared_cache = get_shared_cache()
+    if shared_cache and (
+        body := shared_cache.get(fingerprint, _converter_name(file_path))
+    ):
+        contents = json.loads(body)
+        cache.put(file_path, fingerprint, contents)
+        return contents
+    contents, _ = _convert_once(file_path, fingerprint)
+    return contents
+
+
+def _convert_once(
+    file_path: Path, fingerprint: FileFingerprint
+) -> tuple[ConfigModel | Any, bytes | None]:
+    """Convert a file and cache the result, waiting for the result instead if the
+    same version of the file is already being converted. Also returns the JSON of
+    the result if it was serialized for the shared cache.
+
+    If the same version of the file recently failed to convert, the same error is
+    raised again straight away, so that a broken file can't tie up the server."""
+    failure_cache = get_conversion_failure_cache()
+    if (failure := failure_cache.get(file_path, fingerprint)) is not None:
+        if time.monotonic() < failure.expires_at:
+            raise ConverterParseError(failure.message)
+        failure_cache.invalidate(file_path)
+
+    def convert() -> tuple[ConfigModel | Any, bytes | None]:
+        try:
+            contents = _convert_file_contents(file_path)
+        except ConverterParseError as e:
+            config = get_converter_config()
+            failure_ttl_s = (
+                config.timeout_failure_ttl_s
+                if isinstance(e, ConverterTimeoutError)
+                else config.failure_ttl_s
+            )
+            failure_cache.put(
+                file_path,
+                fingerprint,
+                ConversionFailure(str(e), time.monotonic() + failure_ttl_s),
+            )
+            raise
+        get_conversion_cache().put(file_path, fingerprint, contents)
+        if (shared_cache := get_shared_cache()) is None:
+            return contents, None
+        with timed("serialize"):
+            body = dump_json(contents)
+        with timed("shared_cache"):
+            shared_cache.put(fingerprint, _converter_name(file_path), body)
+        return contents, body
+
+    return get_conversion_flight().do((file_path, fingerprint), convert)
+
+
+def _converter_name(file_path: Path) -> str:
+    converter = get_converter(file_path)
+    return getattr(converter, "__qualname__", repr(converter))
+
+
+def _convert_file_contents(file_path: Path) -> ConfigModel | Any:
+    with timed("read"), file_path.open("r", encoding="utf-8") as f:
         raw_contents = f.read()
     if converter := get_converter(file_path):
+        timeout_s = get_converter_timeout(file_path)
+        executor = get_converter_executor(file_path)
         try:
-            contents = converter(raw_contents)
-            if isinstance(contents, ConfigModel):
-                return contents.model_dump()
-            return contents
+            with (
+                timed("convert"),
+                time_conversion(_converter_name(file_path), executor),
+            ):
+                if executor == ConverterExecutor.PROCESS:
+                    return convert_out_of_process(converter, raw_contents, timeout_s)
+                return convert_in_thread(converter, raw_contents, timeout_s)
+        except TimeoutError as e:
+            raise ConverterTimeoutError(
+                f"Unable to parse {str(file_path)} within {timeout_s}s"
+            ) from e
         except Exception as e:
             raise ConverterParseError(
                 f"Unable to parse {str(file_path)} due to the following exception: \
                 {type(e).__name__}: {e}"
             ) from e
-    return json.loads(raw_contents)
+    with timed("convert"):
+        return json.loads(raw_contents)
+
+
+def file_is_valid_utf8(
+    file_path: Path, fingerprint: FileFingerprint | None = None
+) -> bool:
+    """Check that a file can be decoded as UTF-8, reading it in chunks. The result is
+    cached until the file changes."""
+    cache = get_utf8_check_cache()
+    fingerprint = fingerprint or FileFingerprint.from_path(file_path)
+    if (is_valid := cache.get(file_path, fingerprint)) is not None:
+        return is_valid
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with file_path.open("rb") as f:
+            while chunk := f.read(UTF8_CHECK_CHUNK_SIZE):
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+        is_valid = True
+    except UnicodeDecodeError:
+        is_valid = False
+    cache.put(file_path, fingerprint, is_valid)
+    return is_valid
 
 
 router = APIRouter()
@@ -44,44 +230,150 @@ class ValidAcceptHeaders(StrEnum):
     RAW_BYTES = "application/octet-stream"
 
 
-@dataclass(frozen=True)
-class ENDPOINTS:
-    CONFIG = "/config"
-    HEALTH = "/healthz"
+def _response_media_type(accept: str) -> ValidAcceptHeaders:
+    if accept in (ValidAcceptHeaders.JSON, ValidAcceptHeaders.PLAIN_TEXT):
+        return ValidAcceptHeaders(accept)
+    return ValidAcceptHeaders.RAW_BYTES
 
 
-@router.get(
-    ENDPOINTS.CONFIG + "/{file_path:path}",
-    responses={
-        200: {
-            "description": "Returns JSON, plain text, or binary file.",
-            "content": {
-                "application/json": {
-                    "schema": {
-                        "type": "object",
-                        "additionalProperties": True,
-                        "example": {
-                            "key": "value",
-                            "list": [1, 2, 3],
-                            "nested": {"a": 1},
-                        },
-                    }
-                },
-                "text/plain": {
-                    "schema": {
-                        "type": "string",
-                        "example": "This is a plain text response",
-                    }
-                },
-                "application/octet-stream": {
-                    "schema": {"type": "string", "format": "binary"},
-                },
-            },
+def _stat_file(file_path: Path, memoized: bool = True) -> os.stat_result:
+    """Stat a regular file, using the file watcher's memoized stat if ``memoized``,
+    raising a 404 HTTPException if it doesn't exist"""
+    try:
+        stat_result = stat_file(file_path) if memoized else os.stat(file_path)
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"File {file_path} cannot be found",
+        )
+    return stat_result
+
+
+def _make_representation_etag(
+    fingerprint: FileFingerprint, media_type: ValidAcceptHeaders
+) -> str:
+    if media_type != ValidAcceptHeaders.JSON:
+        return make_etag(fingerprint, media_type)
+    return make_etag(fingerprint, media_type, _converter_name(fingerprint.path))
+
+
+class _EncodedResponse(Response):
+    """Response sent from a cached body and headers without rendering either again"""
+
+    def __init__(self, encoded: EncodedBody):
+        self.status_code = status.HTTP_200_OK
+        self.background = None
+        self.body = encoded.body
+        # Copied, as middleware may modify the headers of a response in place
+        self.raw_headers = list(encoded.raw_headers)
+
+
+def _encode_response(
+    file_path: Path,
+    fingerprint: FileFingerprint,
+    media_type: ValidAcceptHeaders,
+    encoding: ContentEncoding,
+    headers: dict[str, str],
+) -> EncodedBody:
+    """Read, convert and compress a file into the exact body and headers of its
+    response. Bodies are only compressed if they are large enough."""
+    if media_type == ValidAcceptHeaders.JSON:
+        body = get_converted_file_json(file_path, fingerprint)
+    else:
+        with timed("read"):
+            body = file_path.read_bytes()
+            if media_type == ValidAcceptHeaders.PLAIN_TEXT:
+                body.decode("utf-8")
+        headers = {**headers, "Accept-Ranges": "bytes"}
+    if encoding != ContentEncoding.IDENTITY and should_compress(body):
+        with timed("compress"):
+            body = compress(body, encoding)
+        headers = {
+            **headers,
+            "ETag": encoded_etag(headers["ETag"], encoding),
+            "Content-Encoding": encoding,
+        }
+    response = Response(body, media_type=media_type, headers=headers)
+    return EncodedBody(body, response.raw_headers)
+
+
+def _cached_response(
+    file_path: Path,
+    fingerprint: FileFingerprint,
+    media_type: ValidAcceptHeaders,
+    encoding: ContentEncoding,
+    headers: dict[str, str],
+) -> Response:
+    """Make a response from its cached body and headers, encoding it first if the
+    file has changed since it was last encoded"""
+    cache = get_response_body_cache()
+    cache_key = (file_path, media_type, encoding)
+    if (encoded := cache.get(cache_key, fingerprint)) is None:
+
+        def encode() -> EncodedBody:
+            encoded = _encode_response(
+                file_path, fingerprint, media_type, encoding, headers
+            )
+            cache.put(cache_key, fingerprint, encoded)
+            return encoded
+
+        encoded = get_response_body_flight().do((*cache_key, fingerprint), encode)
+    return _EncodedResponse(encoded)
+
+
+def _can_cache_body(request_headers: Headers, fingerprint: FileFingerprint) -> bool:
+    """Whether a plain text or raw file is small enough to be sent from memory. Range
+    requests are always served from disk."""
+    return "range" not in request_headers and fingerprint.size <= get_max_body_size()
+
+
+def _restat_for_streaming(
+    fingerprint: FileFingerprint,
+    media_type: ValidAcceptHeaders,
+    headers: dict[str, str],
+) -> tuple[os.stat_result, FileFingerprint, dict[str, str]]:
+    """Stat a file which is about to be streamed from disk again, as the file
+    watcher's memoized stat may be out of date and the Content-Length must match
+    the file which is sent. If the file has changed, the watcher is told and the
+    headers describe the new version."""
+    file_path = fingerprint.path
+    stat_result = _stat_file(file_path, memoized=False)
+    current = FileFingerprint.from_stat(file_path, stat_result)
+    if current == fingerprint:
+        return stat_result, fingerprint, headers
+    if file_watcher := get_file_watcher():
+        file_watcher.changed(file_path)
+    return (
+        stat_result,
+        current,
+        {
+            **headers,
+            "ETag": _make_representation_etag(current, media_type),
+            "Last-Modified": format_last_modified(current),
         },
-    },
-    response_class=Response,
-)
-def get_configuration(file_path: Path, request: Request):
+    )
+
+
+def _check_file_request(file_path: Path) -> os.stat_result:
+    """Check that a requested file may be read and exists, raising the appropriate
+    HTTPException if not. Files which aren't whitelisted or don't exist are
+    remembered for a short time, so that repeated requests for them are cheap."""
+    negative_cache = get_negative_cache()
+    if (cached := negative_cache.get(file_path)) is not None:
+        status_code, detail = cached
+        raise HTTPException(status_code=status_code, detail=detail)
+    try:
+        _check_file_path(file_path)
+        return _stat_file(file_path)
+    except HTTPException as e:
+        if e.status_code in (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND):
+            negative_cache.put(file_path, e.status_code, e.detail)
+        raise
+
+
+def _check_file_path(file_path: Path):
     if not file_path.is_absolute():
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
@@ -94,42 +386,372 @@ def get_configuration(file_path: Path, request: Request):
             detail=f"{file_path} is not a whitelisted file.",
         )
 
-    if not file_path.is_file():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"File {file_path} cannot be found",
+
+def _conversion_failed(file_path: Path, accept: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail=(
+            f"Failed to convert {os.path.basename(file_path)} to {accept}. "
+            "Try requesting this file as a different type."
+        ),
+    )
+
+
+@dataclass(frozen=True)
+class ENDPOINTS:
+    CONFIG = "/config"
+    CONFIG_BATCH = "/config/batch"
+    CONFIG_EVENTS = "/config/events"
+    CONFIG_WATCH = "/config/watch"
+    HEALTH = "/healthz"
+    READY = "/readyz"
+    METRICS = "/metrics"
+
+
+CONFIGURATION_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {
+        "description": "Returns JSON, plain text, or binary file.",
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "object",
+                    "additionalProperties": True,
+                    "example": {
+                        "key": "value",
+                        "list": [1, 2, 3],
+                        "nested": {"a": 1},
+                    },
+                }
+            },
+            "text/plain": {
+                "schema": {
+                    "type": "string",
+                    "example": "This is a plain text response",
+                }
+            },
+            "application/octet-stream": {
+                "schema": {"type": "string", "format": "binary"},
+            },
+        },
+    },
+}
+
+
+class BatchRequestItem(BaseModel):
+    file_path: Path
+    accept: ValidAcceptHeaders = ValidAcceptHeaders.PLAIN_TEXT
+    if_none_match: str | None = None
+
+
+class BatchRequest(BaseModel):
+    items: list[BatchRequestItem] = Field(max_length=MAX_BATCH_ITEMS)
+
+
+class BatchResponseItem(BaseModel):
+    """Result of reading one file in a batch. ``status_code`` is what a request to
+    the /config endpoint for this file would have returned. ``content`` is the
+    converted JSON, the text of the file, or the base64 encoded bytes of the file,
+    depending on ``content_type``."""
+
+    file_path: Path
+    status_code: int
+    content_type: ValidAcceptHeaders | None = None
+    content: Any = None
+    etag: str | None = None
+    detail: str | None = None
+
+
+class BatchResponse(BaseModel):
+    items: list[BatchResponseItem]
+
+
+def _get_batch_item(item: BatchRequestItem) -> BatchResponseItem:
+    file_path = item.file_path
+    try:
+        fingerprint = FileFingerprint.from_stat(
+            file_path, _check_file_request(file_path)
         )
+        etag = _make_representation_etag(fingerprint, item.accept)
+        if etag_matches(item.if_none_match, etag):
+            return BatchResponseItem(
+                file_path=file_path,
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                etag=etag,
+            )
+        try:
+            match item.accept:
+                case ValidAcceptHeaders.JSON:
+                    content = get_converted_file_contents(file_path, fingerprint)
+                case ValidAcceptHeaders.PLAIN_TEXT:
+                    content = file_path.read_bytes().decode("utf-8")
+                case ValidAcceptHeaders.RAW_BYTES:
+                    content = base64.b64encode(file_path.read_bytes()).decode()
+        except Exception as e:
+            raise _conversion_failed(file_path, item.accept) from e
+    except HTTPException as e:
+        return BatchResponseItem(
+            file_path=file_path, status_code=e.status_code, detail=e.detail
+        )
+    return BatchResponseItem(
+        file_path=file_path,
+        status_code=status.HTTP_200_OK,
+        content_type=item.accept,
+        content=content,
+        etag=etag,
+    )
+
+
+@router.post(ENDPOINTS.CONFIG_BATCH)
+def get_configuration_batch(batch: BatchRequest) -> BatchResponse:
+    """Read several files in one request. Failures are reported per file rather than
+    failing the whole request."""
+    return BatchResponse(items=[_get_batch_item(item) for item in batch.items])
+
 
-    file_name = os.path.basename(file_path)
-    accept = request.headers.get("accept", ValidAcceptHeaders.PLAIN_TEXT)
+class FileChangeEvent(BaseModel):
+    """Sent by the /config/events endpoint for each file when the stream starts, and
+    whenever a file changes. ``etag`` is the ETag which the /config endpoint would now
+    give for the file, or None if it can't be read."""
 
+    file_path: Path
+    etag: str | None
+    timestamp: datetime
+
+
+def _current_etag(file_path: Path, media_type: ValidAcceptHeaders) -> str | None:
     try:
-        match accept:
+        stat_result = _stat_file(file_path)
+    except HTTPException:
+        return None
+    # The file may have been created since a request for it was answered with a 404
+    get_negative_cache().invalidate(file_path)
+    fingerprint = FileFingerprint.from_stat(file_path, stat_result)
+    return _make_representation_etag(fingerprint, media_type)
+
+
+async def _change_events(
+    file_paths: list[Path], media_type: ValidAcceptHeaders
+) -> AsyncGenerator[str, None]:
+    """Server-sent events for changes to the ETags of some files, with a comment sent
+    if there has been nothing else to send for a while to keep the connection open"""
+    config = get_events_config()
+    etags: dict[Path, str | None] = {}
+    with ChangeSubscription(file_paths) as subscription:
+        last_sent = time.monotonic()
+        while True:
+            for file_path in file_paths:
+                etag = await run_in_threadpool(_current_etag, file_path, media_type)
+                if file_path in etags and etags[file_path] == etag:
+                    continue
+                etags[file_path] = etag
+                event = FileChangeEvent(
+                    file_path=file_path, etag=etag, timestamp=datetime.now(UTC)
+                )
+                yield f"event: change\ndata: {event.model_dump_json()}\n\n"
+                last_sent = time.monotonic()
+
+            if time.monotonic() - last_sent >= config.keepalive_interval_s:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await subscription.wait(
+                config.keepalive_interval_s - (time.monotonic() - last_sent),
+                poll=None in etags.values(),
+            )
+
+
+@router.get(
+    ENDPOINTS.CONFIG_EVENTS,
+    responses={
+        200: {
+            "description": "Stream of server-sent change events.",
+            "content": {"text/event-stream": {"schema": {"type": "string"}}},
+        },
+    },
+    response_class=StreamingResponse,
+)
+async def get_configuration_events(
+    file_path: Annotated[list[Path], Query(max_length=MAX_BATCH_ITEMS)],
+    accept: ValidAcceptHeaders = ValidAcceptHeaders.PLAIN_TEXT,
+):
+    """Stream a server-sent ``change`` event, with a FileChangeEvent as its data, for
+    each of the given files when the stream starts and then whenever one of them
+    changes. ETags are those of the files when requested as ``accept``."""
+    for path in file_path:
+        _check_file_path(path)
+    return StreamingResponse(
+        _change_events(list(dict.fromkeys(file_path)), accept),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    ENDPOINTS.CONFIG_WATCH + "/{file_path:path}",
+    responses=CONFIGURATION_RESPONSES,
+    response_class=Response,
+)
+async def watch_configuration(
+    file_path: Path,
+    request: Request,
+    since: str | None = None,
+    timeout: Annotated[float, Query(ge=0)] = 30,
+):
+    """Wait until a file's ETag no longer matches ``since``, then respond as the
+    /config endpoint would. If the file hasn't changed after ``timeout`` seconds,
+    respond 304 Not Modified. Without ``since``, respond immediately."""
+    _check_file_path(file_path)
+    media_type = _response_media_type(
+        request.headers.get("accept", ValidAcceptHeaders.PLAIN_TEXT)
+    )
+    deadline = time.monotonic() + min(timeout, get_events_config().max_watch_timeout_s)
+    with ChangeSubscription([file_path]) as subscription:
+        while (
+            etag := await run_in_threadpool(_current_etag, file_path, media_type)
+        ) is None or etag_matches(since, etag):
+            if (remaining_s := deadline - time.monotonic()) <= 0:
+                break
+            await subscription.wait(remaining_s, poll=etag is None)
+
+    request_headers = MutableHeaders(raw=list(request.headers.raw))
+    if since is not None:
+        request_headers["If-None-Match"] = since
+    return await run_in_threadpool(
+        _timed_configuration_response, file_path, request_headers
+    )
+
+
+@router.get(
+    ENDPOINTS.CONFIG + "/{file_path:path}",
+    responses=CONFIGURATION_RESPONSES,
+    response_class=Response,
+)
+def get_configuration(file_path: Path, request: Request):
+    return _timed_configuration_response(file_path, request.headers)
+
+
+def _timed_configuration_response(
+    file_path: Path, request_headers: Headers
+) -> Response:
+    """Respond as ``_configuration_response`` does, adding a Server-Timing header if
+    it is enabled"""
+    with record_server_timing() as durations_s:
+        response = _configuration_response(file_path, request_headers)
+    if durations_s is not None:
+        response.headers["Server-Timing"] = format_server_timing(durations_s)
+    return response
+
+
+def _configuration_response(file_path: Path, request_headers: Headers) -> Response:
+    with timed("check"):
+        stat_result = _check_file_request(file_path)
+    fingerprint = FileFingerprint.from_stat(file_path, stat_result)
+    accept = request_headers.get("accept", ValidAcceptHeaders.PLAIN_TEXT)
+    media_type = _response_media_type(accept)
+    # Only converted files are compressed, as other files may be streamed from disk
+    encoding = (
+        negotiate_encoding(request_headers.get("accept-encoding"))
+        if media_type == ValidAcceptHeaders.JSON
+        else ContentEncoding.IDENTITY
+    )
+    headers = {
+        "ETag": _make_representation_etag(fingerprint, media_type),
+        "Last-Modified": format_last_modified(fingerprint),
+        "Vary": "Accept, Accept-Encoding",
+    }
+
+    if is_not_modified(request_headers, headers["ETag"], fingerprint):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        match media_type:
             case ValidAcceptHeaders.JSON:
-                content = get_converted_file_contents(file_path)
-                return JSONResponse(content=content)
+                return _cached_response(
+                    file_path, fingerprint, media_type, encoding, headers
+                )
+
+            case _ if _can_cache_body(request_headers, fingerprint):
+                return _cached_response(
+                    file_path, fingerprint, media_type, encoding, headers
+                )
 
             case ValidAcceptHeaders.PLAIN_TEXT:
-                with file_path.open("r", encoding="utf-8") as f:
-                    return Response(f.read(), media_type=accept)
+                stat_result, fingerprint, headers = _restat_for_streaming(
+                    fingerprint, media_type, headers
+                )
+                with timed("read"):
+                    is_valid_utf8 = file_is_valid_utf8(file_path, fingerprint)
+                if not is_valid_utf8:
+                    raise UnicodeError(f"{file_path} is not valid UTF-8")
+                return FileResponse(
+                    file_path,
+                    media_type=media_type,
+                    headers=headers,
+                    stat_result=stat_result,
+                )
 
             case _:
-                with file_path.open("rb") as f:
-                    return Response(
-                        f.read(),
-                        media_type=ValidAcceptHeaders.RAW_BYTES,
-                    )
+                stat_result, _, headers = _restat_for_streaming(
+                    fingerprint, media_type, headers
+                )
+                return FileResponse(
+                    file_path,
+                    media_type=media_type,
+                    headers=headers,
+                    stat_result=stat_result,
+                )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail=(
-                f"Failed to convert {file_name} to {accept}. "
-                "Try requesting this file as a different type."
-            ),
-        ) from e
+        raise _conversion_failed(file_path, accept) from e
+
+
+def warm_up_file(file_path: Path, media_type: ValidAcceptHeaders):
+    """Fill the caches for a file in the same way as a request for it from the
+    ConfigClient would, raising an HTTPException if that request would fail"""
+    _configuration_response(
+        file_path,
+        Headers({"accept": media_type, "accept-encoding": "zstd, gzip"}),
+    )
 
 
 @router.get("/healthz")
 def health_check():
     return Response()
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    cached_conversions: int
+    cached_response_bodies: int
+    # None if warm-up is disabled
+    warmup: WarmupStatus | None
+
+
+@router.get(
+    ENDPOINTS.READY,
+    responses={503: {"model": ReadinessResponse, "description": "Not ready"}},
+)
+def readiness_check(response: Response) -> ReadinessResponse:
+    """Ready once the whitelist and converter map have been loaded, and warm-up has
+    finished if it is enabled"""
+    ready = is_ready()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReadinessResponse(
+        ready=ready,
+        cached_conversions=len(get_conversion_cache()),
+        cached_response_bodies=len(get_response_body_cache()),
+        warmup=get_warmup_status(),
+    )
+
+
+@router.get(
+    ENDPOINTS.METRICS,
+    responses={200: {"content": {"text/plain": {"schema": {"type": "string"}}}}},
+    response_class=Response,
+)
+def get_metrics():
+    """Metrics of every worker in the Prometheus text format"""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
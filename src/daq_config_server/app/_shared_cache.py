@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Protocol
+
+from redis import RedisError, from_url
+
+from daq_config_server.app._cache import FileFingerprint
+from daq_config_server.app._config import SharedCacheConfig
+from daq_config_server.app._metrics import CACHE_LOOKUPS
+
+LOGGER = logging.getLogger(__name__)
+
+# Shortest time between warnings that the shared cache is unavailable
+_WARNING_INTERVAL_S = 60.0
+
+
+class SharedCacheClient(Protocol):
+    """The subset of the Redis client used by the shared cache"""
+
+    def get(self, name: str) -> Any: ...
+
+    def set(self, name: str, value: bytes, ex: int | None = None) -> Any: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass
+class SharedCacheStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    # Lookups and writes skipped because the shared cache recently failed
+    skipped: int = 0
+
+
+class SharedCache:
+    """Converted JSON shared by every worker of every replica, so that each file is
+    only converted once however many processes serve it. Entries are keyed by the
+    fingerprint of the file and the converter which converted it, so are never out
+    of date and don't need to be invalidated; they simply expire once unused.
+
+    The shared cache is only an optimisation, so if it can't be reached then each
+    worker converts files itself. After an error, it isn't used at all for
+    ``backoff_s`` seconds, so that an outage doesn't make every request wait for it
+    to time out."""
+
+    def __init__(
+        self,
+        client: SharedCacheClient,
+        key_prefix: str,
+        ttl_s: int,
+        backoff_s: float = 0.0,
+    ):
+        self._client = client
+        self._key_prefix = key_prefix
+        self._ttl_s = ttl_s
+        self._backoff_s = backoff_s
+        self._lock = Lock()
+        self._stats = SharedCacheStats()
+        # time.monotonic() timestamps
+        self._skip_until = 0.0
+        self._next_warning_at = 0.0
+        self._unwarned_errors = 0
+        self._failing = False
+        self._hit_counter = CACHE_LOOKUPS.labels("shared", "hit")
+        self._miss_counter = CACHE_LOOKUPS.labels("shared", "miss")
+        self._error_counter = CACHE_LOOKUPS.labels("shared", "error")
+        self._skipped_counter = CACHE_LOOKUPS.labels("shared", "skipped")
+
+    def _key(self, fingerprint: FileFingerprint, converter_name: str) -> str:
+        digest = hashlib.sha256(
+            f"{fingerprint.path}\0{fingerprint.inode}\0{fingerprint.mtime_ns}\0"
+            f"{fingerprint.size}\0{converter_name}".encode()
+        ).hexdigest()
+        return f"{self._key_prefix}:json:{digest}"
+
+    def get(self, fingerprint: FileFingerprint, converter_name: str) -> bytes | None:
+        if not self._is_available():
+            return None
+        try:
+            body = self._client.get(self._key(fingerprint, converter_name))
+        except RedisError as e:
+            self._count_error(f"Unable to read {fingerprint.path} from cache: {e}")
+            return None
+        self._count_success()
+        with self._lock:
+            if body is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        (self._miss_counter if body is None else self._hit_counter).inc()
+        return body
+
+    def put(self, fingerprint: FileFingerprint, converter_name: str, body: bytes):
+        if not self._is_available():
+            return
+        try:
+            self._client.set(
+                self._key(fingerprint, converter_name), body, ex=self._ttl_s
+            )
+        except RedisError as e:
+            self._count_error(f"Unable to write {fingerprint.path} to cache: {e}")
+            return
+        self._count_success()
+
+    def _is_available(self) -> bool:
+        with self._lock:
+            if time.monotonic() >= self._skip_until:
+                return True
+            self._stats.skipped += 1
+        self._skipped_counter.inc()
+        return False
+
+    def _count_success(self):
+        with self._lock:
+            recovered, self._failing = self._failing, False
+        if recovered:
+            LOGGER.info("Shared cache is available again")
+
+    def _count_error(self, message: str):
+        now = time.monotonic()
+        with self._lock:
+            self._stats.errors += 1
+            self._failing = True
+            self._skip_until = now + self._backoff_s
+            unwarned_errors = 0
+            should_warn = now >= self._next_warning_at
+            if should_warn:
+                self._next_warning_at = now + _WARNING_INTERVAL_S
+                unwarned_errors, self._unwarned_errors = self._unwarned_errors, 0
+            else:
+                self._unwarned_errors += 1
+        self._error_counter.inc()
+        if should_warn:
+            LOGGER.warning(
+                f"Shared cache unavailable, not using it for {self._backoff_s}s: "
+                f"{message}"
+                + (
+                    f" ({unwarned_errors} more errors since the last warning)"
+                    if unwarned_errors
+                    else ""
+                )
+            )
+
+    def stats(self) -> SharedCacheStats:
+        with self._lock:
+            return SharedCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                errors=self._stats.errors,
+                skipped=self._stats.skipped,
+            )
+
+    def close(self):
+        self._client.close()
+
+
+_shared_cache: SharedCache | None = None
+
+
+def get_shared_cache() -> SharedCache | None:
+    return _shared_cache
+
+
+def init_shared_cache(
+    config: SharedCacheConfig, client: SharedCacheClient | None = None
+) -> None:
+    """Connect to the shared cache if it is enabled. ``client`` replaces the Redis
+    client, for testing."""
+    global _shared_cache
+    if not config.enabled:
+        _shared_cache = None
+        return
+    if client is None:
+        client = from_url(
+            config.url,
+            socket_timeout=config.socket_timeout_s,
+            socket_connect_timeout=config.socket_timeout_s,
+        )
+    _shared_cache = SharedCache(
+        client, config.key_prefix, config.ttl_s, backoff_s=config.backoff_s
+    )
+    LOGGER.info("Sharing converted files between workers through Redis")
+
+
+def close_shared_cache() -> None:
+    global _shared_cache
+    if _shared_cache is None:
+        return
+    LOGGER.info(f"Shared cache stats: {_shared_cache.stats()}")
+    _shared_cache.close()
+    _shared_cache = None
@@ -0,0 +1,50 @@
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from daq_config_server.app._config import ServerTimingConfig
+
+_config = ServerTimingConfig()
+# Seconds spent in each phase of handling the current request, if it is being timed
+_durations_s: ContextVar[dict[str, float] | None] = ContextVar(
+    "server_timing_durations_s", default=None
+)
+
+
+def init_server_timing(config: ServerTimingConfig) -> None:
+    global _config
+    _config = config
+
+
+@contextmanager
+def record_server_timing() -> Generator[dict[str, float] | None, None, None]:
+    """Collect the time spent in each phase timed with ``timed`` while handling a
+    request, along with the ``total`` time, if Server-Timing is enabled. Phases
+    which were skipped because their result was cached don't appear at all."""
+    if not _config.enabled:
+        yield None
+        return
+    durations_s: dict[str, float] = {}
+    token = _durations_s.set(durations_s)
+    start = time.perf_counter()
+    try:
+        yield durations_s
+    finally:
+        durations_s["total"] = time.perf_counter() - start
+        _durations_s.reset(token)
+
+
+@contextmanager
+def timed(phase: str) -> Generator[None, None, None]:
+    """Add the time taken by the body of the block to ``phase`` of the request being
+    timed, if any"""
+    durations_s = _durations_s.get()
+    if durations_s is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations_s[phase] = durations_s.get(phase, 0.0) + (time.perf_counter() - start)
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from daq_config_server.app._config import WarmupConfig
+from daq_config_server.app._file_converter_map import get_converter_map_paths
+from daq_config_server.app._readiness import WarmupStatus, set_warmup_status
+from daq_config_server.app._routes import ValidAcceptHeaders, warm_up_file
+from daq_config_server.app._whitelist import get_whitelist, path_is_whitelisted
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _files_to_warm_up(config: WarmupConfig) -> dict[Path, ValidAcceptHeaders]:
+    files: dict[Path, ValidAcceptHeaders] = {}
+    for file_path in get_converter_map_paths():
+        if path_is_whitelisted(file_path):
+            files[file_path] = ValidAcceptHeaders.JSON
+        else:
+            LOGGER.debug(f"Not warming up {file_path} as it isn't whitelisted")
+    if config.include_whitelisted_files:
+        for file_path in sorted(get_whitelist().whitelist_files):
+            files.setdefault(file_path, ValidAcceptHeaders.PLAIN_TEXT)
+    return files
+
+
+async def warm_up_cache(config: WarmupConfig) -> WarmupStatus:
+    """Read and convert every file in the converter map, and optionally every
+    whitelisted file, so that the first requests for them are served from the cache.
+    Files are warmed up concurrently in a dedicated thread pool, so that requests
+    can still be handled in the meantime."""
+    files = _files_to_warm_up(config)
+    status = WarmupStatus(total=len(files))
+    set_warmup_status(status)
+    log_every = max(1, status.total // 10)
+    LOGGER.info(f"Warming up cache with {status.total} files")
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(
+        max_workers=config.max_concurrency, thread_name_prefix="cache-warmup"
+    )
+    start = time.monotonic()
+
+    async def warm_up(file_path: Path, media_type: ValidAcceptHeaders):
+        try:
+            await loop.run_in_executor(executor, warm_up_file, file_path, media_type)
+            status.warmed += 1
+            LOGGER.debug(f"Warmed up {file_path}")
+        except Exception as e:
+            status.failed += 1
+            LOGGER.warning(f"Failed to warm up {file_path}: {e}")
+        done = status.warmed + status.failed
+        if done % log_every == 0 and done < status.total:
+            LOGGER.info(f"Warmed up {done}/{status.total} files")
+
+    try:
+        await asyncio.gather(*(warm_up(path, media) for path, media in files.items()))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    status.duration_s = time.monotonic() - start
+    LOGGER.info(
+        f"Warmed up {status.warmed}/{status.total} files in {status.duration_s:.2f}s, "
+        f"{status.failed} failed"
+    )
+    return status
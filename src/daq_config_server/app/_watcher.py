@@ -0,0 +1,408 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import math
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from daq_config_server.app._cache import (
+    FileFingerprint,
+    get_negative_cache,
+    invalidate_file,
+)
+from daq_config_server.app._config import FileWatcherBackend, FileWatcherConfig
+
+LOGGER = logging.getLogger(__name__)
+
+ChangeListener = Callable[[Path], None]
+
+_file_watcher: "FileWatcher | None" = None
+
+
+@dataclass(eq=False)
+class _PendingStat:
+    path: Path
+    changed: bool = False
+
+
+class FileWatcher(ABC):
+    """Memoize the ``os.stat`` of each requested file, and watch the filesystem in a
+    background thread so that a file's memoized stat and everything cached from it
+    are dropped as soon as it changes. Requests for unchanged files then need no
+    syscalls at all.
+
+    Files are watched from the first time they are stat-ed, which only happens once
+    they have passed the whitelist check."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats: dict[Path, os.stat_result] = {}
+        self._pending: set[_PendingStat] = set()
+        self._listeners: list[ChangeListener] = []
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def stat(self, path: Path) -> os.stat_result:
+        if self._stop.is_set():
+            return os.stat(path)
+        with self._lock:
+            if (stat_result := self._stats.get(path)) is not None:
+                return stat_result
+            pending = _PendingStat(path)
+            self._pending.add(pending)
+        try:
+            # Watch before the stat, so that no change after the stat can be missed
+            is_watched = self._watch(path.parent)
+            stat_result = os.stat(path)
+        finally:
+            with self._lock:
+                self._pending.discard(pending)
+        with self._lock:
+            if is_watched and not pending.changed:
+                self._stats[path] = stat_result
+        return stat_result
+
+    def add_listener(self, listener: ChangeListener):
+        """Call ``listener`` from the watcher's thread as soon as a file in a watched
+        directory changes, with the path of the file, or of a directory if anything
+        below it may have changed"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: ChangeListener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def watched_paths(self) -> set[Path]:
+        with self._lock:
+            return set(self._stats)
+
+    def changed(self, path: Path, recursive: bool = False):
+        """Forget about a file, or every file below a directory if ``recursive``,
+        which has been seen to change by other means, such as by another worker"""
+        self._changed(path, recursive)
+
+    def _changed(self, path: Path, recursive: bool = False):
+        """Forget about a file, or every file below a directory if ``recursive``"""
+
+        def is_affected(other: Path) -> bool:
+            return other.is_relative_to(path) if recursive else other == path
+
+        with self._lock:
+            for pending in self._pending:
+                pending.changed = pending.changed or is_affected(pending.path)
+            changed_paths = [p for p in self._stats if is_affected(p)]
+            for changed_path in changed_paths:
+                del self._stats[changed_path]
+            listeners = list(self._listeners)
+
+        for changed_path in changed_paths:
+            LOGGER.debug(f"{changed_path} changed")
+            invalidate_file(changed_path)
+        # The file may have been created, or moved into a whitelisted directory
+        get_negative_cache().invalidate(path, recursive)
+        for listener in listeners:
+            try:
+                listener(path)
+            except Exception as e:
+                LOGGER.error(f"File change listener failed for {path}: {e}")
+
+    def _restat(self, include: Callable[[Path], bool]):
+        """Stat each memoized file for which ``include`` is true again, forgetting
+        those which have changed"""
+        with self._lock:
+            stats = {path: stat for path, stat in self._stats.items() if include(path)}
+        for path, old_stat in stats.items():
+            try:
+                new_stat = os.stat(path)
+            except OSError:
+                new_stat = None
+            if new_stat is None or FileFingerprint.from_stat(
+                path, new_stat
+            ) != FileFingerprint.from_stat(path, old_stat):
+                self._changed(path)
+
+    @abstractmethod
+    def _watch(self, directory: Path) -> bool:
+        """Start watching a directory for changes to the files in it, returning
+        whether it is being watched"""
+
+    @abstractmethod
+    def _run(self):
+        """Watch for changes until stopped"""
+
+
+class PollingFileWatcher(FileWatcher):
+    """Re-stat every memoized file periodically. This sees changes which inotify
+    does not, such as those made from other hosts on network filesystems."""
+
+    def __init__(self, interval_s: float):
+        super().__init__()
+        self._interval_s = interval_s
+
+    def _watch(self, directory: Path) -> bool:
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self._interval_s):
+            self.poll()
+
+    def poll(self):
+        self._restat(lambda _: True)
+
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+# struct inotify_event, which is followed by a null padded name of length len
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+_STOP_CHECK_INTERVAL_S = 0.5
+
+# f_type of struct statfs for filesystems on which inotify doesn't see changes made
+# from other hosts
+_NETWORK_FILESYSTEM_MAGIC = frozenset(
+    {
+        0x6969,  # NFS
+        0x517B,  # SMB
+        0xFF534D42,  # CIFS
+        0xFE534D42,  # SMB2
+        0x0BD00BD0,  # Lustre
+        0x47504653,  # GPFS
+        0x00C36400,  # Ceph
+        0x5346414F,  # AFS
+        0x01021997,  # 9P
+        0x65735546,  # FUSE, e.g. sshfs
+    }
+)
+# Larger than struct statfs on any Linux platform, which starts with f_type
+_STATFS_BUFFER_SIZE = 256
+
+
+def _load_libc() -> ctypes.CDLL:
+    if not sys.platform.startswith("linux"):
+        raise OSError(f"inotify is not available on {sys.platform}")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not available in this C library")
+    return libc
+
+
+def _is_network_filesystem(libc: ctypes.CDLL, directory: Path) -> bool:
+    buffer = ctypes.create_string_buffer(_STATFS_BUFFER_SIZE)
+    if libc.statfs(os.fsencode(directory), buffer) != 0:
+        return False
+    f_type = ctypes.c_long.from_buffer(buffer).value & 0xFFFFFFFF
+    return f_type in _NETWORK_FILESYSTEM_MAGIC
+
+
+class InotifyFileWatcher(FileWatcher):
+    """Watch the parent directory of every memoized file, and every directory above
+    it, with inotify. Watching directories rather than files means that files which
+    are replaced by renaming a new file over them, or which are under a directory
+    which is renamed, are also seen to change.
+
+    If ``poll_interval_s`` is given, files in directories on network filesystems,
+    where inotify doesn't see changes made from other hosts, are instead re-stat-ed
+    that often, as ``PollingFileWatcher`` does."""
+
+    def __init__(self, poll_interval_s: float | None = None):
+        super().__init__()
+        self._libc = _load_libc()
+        self._poll_interval_s = poll_interval_s
+        self._polled_dirs: set[Path] = set()
+        fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        self._fd: int = fd
+        self._watches: dict[int, Path] = {}
+        self._watched_dirs: dict[Path, int] = {}
+        self._unwatchable_dirs: set[Path] = set()
+
+    def stop(self):
+        super().stop()
+        self._close()
+
+    def _close(self):
+        with self._lock:
+            fd, self._fd = self._fd, -1
+        if fd >= 0:
+            os.close(fd)
+
+    def _watch(self, directory: Path) -> bool:
+        if self._is_polled(directory):
+            return True
+        return all(self._watch_one(d) for d in (directory, *directory.parents))
+
+    def _is_polled(self, directory: Path) -> bool:
+        if self._poll_interval_s is None:
+            return False
+        with self._lock:
+            if directory in self._polled_dirs:
+                return True
+            if directory in self._watched_dirs:
+                return False
+        if not _is_network_filesystem(self._libc, directory):
+            return False
+        with self._lock:
+            self._polled_dirs.add(directory)
+        LOGGER.info(f"Polling for changes in {directory}, on a network filesystem")
+        return True
+
+    def _poll(self):
+        with self._lock:
+            polled_dirs = set(self._polled_dirs)
+        if polled_dirs:
+            self._restat(lambda path: path.parent in polled_dirs)
+
+    def _watch_one(self, directory: Path) -> bool:
+        with self._lock:
+            if directory in self._watched_dirs:
+                return True
+            if directory in self._unwatchable_dirs:
+                return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        with self._lock:
+            if wd >= 0:
+                self._watches[wd] = directory
+                self._watched_dirs[directory] = wd
+                return True
+            error = ctypes.get_errno()
+            # The directory may yet be created, so try again next time
+            if error != errno.ENOENT:
+                self._unwatchable_dirs.add(directory)
+                LOGGER.warning(f"Unable to watch {directory}: {os.strerror(error)}")
+            return False
+
+    def _run(self):
+        poll_interval_s = self._poll_interval_s or math.inf
+        next_poll = time.monotonic() + poll_interval_s
+        try:
+            while not self._stop.is_set():
+                if (now := time.monotonic()) >= next_poll:
+                    self._poll()
+                    next_poll = now + poll_interval_s
+                readable, _, _ = select.select(
+                    [self._fd],
+                    [],
+                    [],
+                    min(_STOP_CHECK_INTERVAL_S, max(next_poll - now, 0)),
+                )
+                if not readable:
+                    continue
+                try:
+                    data = os.read(self._fd, _READ_SIZE)
+                except BlockingIOError:
+                    continue
+                self._handle_events(data)
+        except Exception as e:
+            LOGGER.error(f"Inotify file watcher failed, no longer memoizing: {e}")
+            self._stop.set()
+            self._changed(Path("/"), recursive=True)
+        finally:
+            self._close()
+
+    def _handle_events(self, data: bytes):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            self._handle_event(wd, mask, os.fsdecode(name))
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & _IN_Q_OVERFLOW:
+            LOGGER.warning("Inotify event queue overflowed, forgetting all files")
+            self._changed(Path("/"), recursive=True)
+            return
+        with self._lock:
+            directory = self._watches.get(wd)
+            if directory is not None and mask & (_IN_IGNORED | _IN_MOVE_SELF):
+                del self._watches[wd]
+                del self._watched_dirs[directory]
+        if directory is None:
+            return
+        if mask & _IN_MOVE_SELF:
+            # The watch follows the directory to its new path, so is no use any more
+            self._libc.inotify_rm_watch(self._fd, wd)
+        if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+            self._changed(directory, recursive=True)
+        elif name:
+            self._changed(directory / name, recursive=bool(mask & _IN_ISDIR))
+
+
+def _make_file_watcher(config: FileWatcherConfig) -> FileWatcher:
+    match config.backend:
+        case FileWatcherBackend.INOTIFY:
+            return InotifyFileWatcher()
+        case FileWatcherBackend.POLLING:
+            return PollingFileWatcher(config.poll_interval_s)
+        case FileWatcherBackend.AUTO:
+            try:
+                return InotifyFileWatcher(poll_interval_s=config.poll_interval_s)
+            except OSError as e:
+                LOGGER.warning(f"Falling back to polling for file changes: {e}")
+                return PollingFileWatcher(config.poll_interval_s)
+
+
+def get_file_watcher() -> FileWatcher | None:
+    return _file_watcher
+
+
+def init_file_watcher(config: FileWatcherConfig) -> None:
+    global _file_watcher
+    if not config.enabled:
+        _file_watcher = None
+        return
+    _file_watcher = _make_file_watcher(config)
+    _file_watcher.start()
+    LOGGER.info(f"Watching files for changes with {type(_file_watcher).__name__}")
+
+
+def stat_file(path: Path) -> os.stat_result:
+    """``os.stat`` a file, using the file watcher's memoized result if it has one"""
+    if _file_watcher is None:
+        return os.stat(path)
+    return _file_watcher.stat(path)
@@ -1,12 +1,15 @@
 import atexit
 import logging
 import time
+from collections.abc import Iterable
 from pathlib import Path
 from threading import Event, Thread
 
 import yaml
 
+from daq_config_server.app._cache import get_negative_cache
 from daq_config_server.app._config import WhitelistConfig
+from daq_config_server.app._metrics import time_whitelist_reload
 
 LOGGER = logging.getLogger(__name__)
 
@@ -16,6 +19,45 @@ WHITELIST_REFRESH_RATE_S = 300
 _whitelist: "FilesystemWhitelist"
 
 
+class _DirectoryTrieNode:
+    __slots__ = ("children", "whitelisted")
+
+    def __init__(self):
+        self.children: dict[str, _DirectoryTrieNode] = {}
+        self.whitelisted = False
+
+
+class WhitelistIndex:
+    """The whitelisted files and directories, indexed so that checking a path takes
+    time proportional to its depth rather than to the number of whitelisted
+    directories. Directories are kept in a trie of their path components, in which
+    the components of a path are followed until they reach a whitelisted directory
+    or leave the trie. Indexes aren't changed once built, so a new one is built on
+    every reload and swapped in whole."""
+
+    def __init__(self, files: Iterable[Path], dirs: Iterable[Path]):
+        self.files = frozenset(files)
+        self.dirs = frozenset(dirs)
+        self._root = _DirectoryTrieNode()
+        for directory in self.dirs:
+            node = self._root
+            for part in directory.parts:
+                node = node.children.setdefault(part, _DirectoryTrieNode())
+            node.whitelisted = True
+
+    def __contains__(self, file_path: Path) -> bool:
+        if file_path in self.files:
+            return True
+        node: _DirectoryTrieNode | None = self._root
+        for part in file_path.parts:
+            if node.whitelisted:
+                return True
+            node = node.children.get(part)
+            if node is None:
+                return False
+        return node.whitelisted
+
+
 class FilesystemWhitelist:
     """Read the whitelist from a configuration file, and check for
     updates every 5 minutes. This lets the deployed server see updates to the whitelist
@@ -39,10 +81,15 @@ class FilesystemWhitelist:
             return f.read()
 
     def _fetch_and_update(self):
-        text = self._fetch()
-        data = yaml.safe_load(text)
-        self.whitelist_files = {Path(p) for p in data.get("whitelist_files")}
-        self.whitelist_dirs = {Path(p) for p in data.get("whitelist_dirs")}
+        with time_whitelist_reload():
+            text = self._fetch()
+            data = yaml.safe_load(text)
+            self.index = WhitelistIndex(
+                files=(Path(p) for p in data.get("whitelist_files")),
+                dirs=(Path(p) for p in data.get("whitelist_dirs")),
+            )
+        # Files which were forbidden may have been whitelisted
+        get_negative_cache().clear()
 
     def _initial_load(self):
         try:
@@ -61,6 +108,14 @@ class FilesystemWhitelist:
             except Exception as e:
                 LOGGER.error(f"Failed to update whitelist: {e}")
 
+    @property
+    def whitelist_files(self) -> frozenset[Path]:
+        return self.index.files
+
+    @property
+    def whitelist_dirs(self) -> frozenset[Path]:
+        return self.index.dirs
+
     def stop(self):
         self._stop.set()
         self.update_in_background_thread.join(timeout=1)
@@ -77,7 +132,4 @@ def init_whitelist(config: WhitelistConfig) -> None:
 
 
 def path_is_whitelisted(file_path: Path) -> bool:
-    whitelist = get_whitelist()
-    return file_path in whitelist.whitelist_files or any(
-        file_path.is_relative_to(dir) for dir in whitelist.whitelist_dirs
-    )
+    return file_path in get_whitelist().index
@@ -1,38 +1,62 @@
-import logging
-from collections.abc import Awaitable, Callable
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
 
+from ._cache import init_cache, log_cache_stats
+from ._compression import init_compression
 from ._config import load_config
+from ._conversion_pool import init_conversion_pool, shutdown_conversion_pool
+from ._events import init_events
 from ._file_converter_map import init_converter_map
-from ._log import set_up_logging
+from ._invalidation import init_invalidation_bus, stop_invalidation_bus
+from ._log import init_access_log, set_up_logging
+from ._metrics import MetricsMiddleware, prepare_multiprocess_dir
+from ._middleware import AccessLogMiddleware, RequestIdMiddleware
+from ._readiness import clear_readiness, init_readiness
 from ._routes import router
+from ._shared_cache import close_shared_cache, init_shared_cache
+from ._timing import init_server_timing
+from ._warmup import warm_up_cache
+from ._watcher import get_file_watcher, init_file_watcher
 from ._whitelist import get_whitelist, init_whitelist
 
-LOGGER = logging.getLogger(__name__)
-
-
-async def log_request_details(
-    request: Request,
-    call_next: Callable[[Request], Awaitable[Response]],
-) -> Response:
-    LOGGER.debug(
-        f"method: {request.method} url: {request.url} body: {await request.body()}"
-    )
-    return await call_next(request)
-
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     config = load_config()
+    init_access_log(config.logging)
     init_whitelist(config.whitelist)
     init_converter_map(config.converter_map)
+    init_conversion_pool(config.conversion_pool)
+    init_cache(config.cache)
+    init_shared_cache(config.shared_cache)
+    init_compression(config.compression)
+    init_file_watcher(config.file_watcher)
+    init_invalidation_bus(config.invalidation_bus)
+    init_events(config.events)
+    init_server_timing(config.server_timing)
+    init_readiness(warmup_enabled=config.warmup.enabled)
+    warmup = (
+        asyncio.create_task(warm_up_cache(config.warmup))
+        if config.warmup.enabled
+        else None
+    )
     yield
+    clear_readiness()
+    if warmup is not None:
+        warmup.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup
     get_whitelist().stop()
+    stop_invalidation_bus()
+    shutdown_conversion_pool()
+    if file_watcher := get_file_watcher():
+        file_watcher.stop()
+    log_cache_stats()
+    close_shared_cache()
 
 
 app = FastAPI(
@@ -41,7 +65,7 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-app.middleware("http")(log_request_details)
+app.add_middleware(AccessLogMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +75,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(router)
 
 
@@ -58,6 +86,8 @@ def main():
     config = load_config()
 
     set_up_logging(config.logging)
+    if config.uvicorn.workers > 1:
+        prepare_multiprocess_dir(config.metrics.multiprocess_dir)
 
     uvicorn.run(
         "daq_config_server.app.api:app",
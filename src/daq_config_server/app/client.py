@@ -1,20 +1,33 @@
+import base64
+import io
+import json
 import logging
 import operator
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from logging import Logger, getLogger
 from pathlib import Path
 from threading import RLock
 from typing import Any, TypeVar, get_origin, overload
 
 import requests
-from cachetools import TTLCache, cachedmethod
+from cachetools import LRUCache, TTLCache, cachedmethod
 from pydantic import TypeAdapter
 from requests import Response
 from requests.exceptions import HTTPError
 
 from daq_config_server.models.base_model import ConfigModel
 
-from ._routes import ENDPOINTS, ValidAcceptHeaders
+from ._http import etag_matches, parse_server_timing
+from ._routes import (
+    ENDPOINTS,
+    BatchRequest,
+    BatchRequestItem,
+    BatchResponse,
+    BatchResponseItem,
+    FileChangeEvent,
+    ValidAcceptHeaders,
+)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -40,6 +53,38 @@ def _get_mime_type(
     return ValidAcceptHeaders.PLAIN_TEXT
 
 
+def _response_from_batch_item(url: str, item: BatchResponseItem) -> Response:
+    """Build the response that requesting a single file would have given, so that
+    batched results can be cached and decoded in the same way"""
+    match item.content_type:
+        case ValidAcceptHeaders.JSON:
+            body = json.dumps(item.content).encode()
+        case ValidAcceptHeaders.PLAIN_TEXT:
+            body = item.content.encode()
+        case _:
+            body = base64.b64decode(item.content)
+    r = Response()
+    r.status_code = item.status_code
+    r.url = url
+    r.raw = io.BytesIO(body)
+    r.encoding = "utf-8"
+    r.headers["content-type"] = str(item.content_type)
+    if item.etag:
+        r.headers["etag"] = item.etag
+    return r
+
+
+def _iter_server_sent_data(lines: Iterable[bytes]) -> Iterator[str]:
+    """Get the data of each event in a stream of server-sent events"""
+    data: list[str] = []
+    for line in map(bytes.decode, lines):
+        if line.startswith("data:"):
+            data.append(line.removeprefix("data:").removeprefix(" "))
+        elif not line and data:
+            yield "\n".join(data)
+            data = []
+
+
 class ConfigClient:
     """Client to communicate with a deployed config service with a configurable cache
     and logger"""
@@ -63,6 +108,11 @@ class ConfigClient:
         self._cache: TTLCache[tuple[str, str, Path], Response] = TTLCache(
             maxsize=cache_size, ttl=cache_lifetime_s
         )
+        # Responses are kept here after they expire from the TTL cache so that they
+        # can be revalidated with their ETag rather than downloaded again
+        self._revalidation_cache: LRUCache[tuple[str, str, Path], Response] = LRUCache(
+            maxsize=cache_size
+        )
         self._lock = RLock()
 
     @cachedmethod(
@@ -75,7 +125,9 @@ class ConfigClient:
         file_path: Path,
     ) -> Response:
         """
-        Get data from the config server and cache it.
+        Get data from the config server and cache it. If a previous response for the
+        same request has expired from the cache, ask the server to revalidate it using
+        its ETag, and reuse it if the server responds 304 Not Modified.
 
         Args:
             endpoint: API endpoint.
@@ -87,7 +139,43 @@ class ConfigClient:
         """
 
         request_url = self._url + endpoint + (f"/{file_path}")
-        r = requests.get(request_url, headers={"Accept": accept_header})
+        headers: dict[str, str] = {"Accept": accept_header}
+        with self._lock:
+            previous = self._revalidation_cache.get(
+                (endpoint, accept_header, file_path)
+            )
+        if previous is not None and (etag := previous.headers.get("etag")):
+            headers["If-None-Match"] = etag
+
+        start = time.perf_counter()
+        r = requests.get(request_url, headers=headers)
+        self._log_timing(request_url, r, time.perf_counter() - start)
+        if previous is not None and r.status_code == requests.codes.not_modified:
+            self._log.debug(f"Cached response for {request_url} is still valid.")
+            return previous
+
+        self._raise_for_status(r)
+        if r.headers.get("etag"):
+            with self._lock:
+                self._revalidation_cache[(endpoint, accept_header, file_path)] = r
+        self._log.debug(f"Cache set for {request_url}.")
+        return r
+
+    def _log_timing(self, request_url: str, r: Response, duration_s: float):
+        """Log how long a request took, along with the breakdown of the time spent
+        by the server if it sent a Server-Timing header"""
+        if not self._log.isEnabledFor(logging.DEBUG):
+            return
+        message = f"GET {request_url} took {duration_s * 1000:.1f} ms"
+        if server_timing := r.headers.get("server-timing"):
+            phases = ", ".join(
+                f"{name} {duration_ms:.1f} ms"
+                for name, duration_ms in parse_server_timing(server_timing).items()
+            )
+            message += f", server timing: {phases}"
+        self._log.debug(message)
+
+    def _raise_for_status(self, r: Response):
         # Intercept http exceptions from server so that the client
         # can include the response `detail` sent by the server
         try:
@@ -101,9 +189,6 @@ class ConfigClient:
                 self._log.error("Response raised HTTP error but no details provided")
                 raise HTTPError from err
 
-        self._log.debug(f"Cache set for {request_url}.")
-        return r
-
     def _get(
         self,
         endpoint: str,
@@ -123,7 +208,9 @@ class ConfigClient:
                     del self._cache[cache_key]
 
         r = self._cached_get(*cache_key)
+        return self._decode_response(r, accept_header)
 
+    def _decode_response(self, r: Response, accept_header: ValidAcceptHeaders) -> Any:
         content_type = r.headers["content-type"].split(";")[0].strip()
 
         if content_type != accept_header:
@@ -147,9 +234,50 @@ class ConfigClient:
 
         return content
 
+    def _batch_get(self, items: list[BatchRequestItem]) -> dict[Path, Response]:
+        """
+        Get several files from the config server in one request, and cache each of
+        the responses as if they had been requested individually.
+        """
+        request_url = self._url + ENDPOINTS.CONFIG_BATCH
+        r = requests.post(
+            request_url, json=BatchRequest(items=items).model_dump(mode="json")
+        )
+        self._raise_for_status(r)
+        batch = BatchResponse.model_validate(r.json())
+
+        responses: dict[Path, Response] = {}
+        errors: list[str] = []
+        for item, result in zip(items, batch.items, strict=True):
+            cache_key = (ENDPOINTS.CONFIG, item.accept, item.file_path)
+            file_url = self._url + ENDPOINTS.CONFIG + f"/{item.file_path}"
+            if result.status_code == requests.codes.not_modified:
+                with self._lock:
+                    response = self._revalidation_cache.get(cache_key)
+                if response is None:
+                    # Evicted since the batch was sent, so fetch it again on its own
+                    response = self._cached_get(*cache_key)
+            elif result.status_code == requests.codes.ok:
+                response = _response_from_batch_item(file_url, result)
+            else:
+                self._log.error(result.detail)
+                errors.append(f"{item.file_path}: {result.detail}")
+                continue
+            with self._lock:
+                self._cache[cache_key] = response
+                if response.headers.get("etag"):
+                    self._revalidation_cache[cache_key] = response
+            self._log.debug(f"Cache set for {file_url}.")
+            responses[item.file_path] = response
+
+        if errors:
+            raise HTTPError("; ".join(errors))
+        return responses
+
     def reset_cache(self):
         with self._lock:
             self._cache.clear()
+            self._revalidation_cache.clear()
 
     @overload
     def get_file_contents(
@@ -223,3 +351,198 @@ class ConfigClient:
             result = force_parser(result)
 
         return TypeAdapter(desired_return_type).validate_python(result)
+
+    def get_file_range(
+        self, file_path: str | Path, start: int, end: int | None = None
+    ) -> bytes:
+        """
+        Get part of a file from the config server as bytes, using an HTTP Range
+        request so that only the requested bytes are downloaded. The result is the
+        same as ``get_file_contents(file_path, bytes)[start:end]``, but is never
+        cached.
+
+        Args:
+            file_path: Path to the file.
+            start: Offset of the first byte to read. If negative, and end is not
+                given, read this many bytes from the end of the file.
+            end: Offset one past the last byte to read. Defaults to the end of
+                the file.
+        Returns:
+            The requested bytes of the file.
+        """
+        if start < 0 and end is not None:
+            raise ValueError("end cannot be given when reading from the end of a file")
+        if end is not None and end < 0:
+            raise ValueError("end cannot be negative")
+        if end is not None and end <= start:
+            return b""
+
+        if start < 0:
+            byte_range = f"bytes={start}"
+        else:
+            byte_range = f"bytes={start}-{'' if end is None else end - 1}"
+
+        request_url = self._url + ENDPOINTS.CONFIG + f"/{Path(file_path)}"
+        r = requests.get(
+            request_url,
+            headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": byte_range},
+        )
+        if r.status_code == requests.codes.requested_range_not_satisfiable:
+            return b""
+        self._raise_for_status(r)
+        if r.status_code == requests.codes.partial_content:
+            return r.content
+        # The server sent the whole file, so take the range from it here
+        return r.content[start:end]
+
+    def get_many_file_contents(
+        self,
+        files: Mapping[str | Path, type[Any]],
+        reset_cached_result: bool = False,
+    ) -> dict[Path, Any]:
+        """
+        Get the contents of several files from the config server in a single request,
+        each in the format specified. Files which are already cached are not requested
+        again, and the others are added to the cache as if they had been requested
+        with get_file_contents.
+
+        Args:
+            files: Mapping of each file path to the desired return type for that file.
+            reset_cached_result: If true, request every file and store the responses
+                in the cache, otherwise look for cached responses before making a new
+                request
+        Returns:
+            Mapping of each file path to its contents, in the format specified.
+        Raises:
+            HTTPError: If any of the files could not be read. Files which could be
+                read are still cached.
+        """
+        requested = {
+            Path(file_path): (_get_mime_type(desired_return_type), desired_return_type)
+            for file_path, desired_return_type in files.items()
+        }
+        responses: dict[Path, Response] = {}
+        to_fetch: list[BatchRequestItem] = []
+        with self._lock:
+            for file_path, (accept_header, _) in requested.items():
+                cache_key = (ENDPOINTS.CONFIG, accept_header, file_path)
+                if reset_cached_result:
+                    self._cache.pop(cache_key, None)
+                if (r := self._cache.get(cache_key)) is not None:
+                    responses[file_path] = r
+                    continue
+                previous = self._revalidation_cache.get(cache_key)
+                to_fetch.append(
+                    BatchRequestItem(
+                        file_path=file_path,
+                        accept=accept_header,
+                        if_none_match=previous.headers.get("etag")
+                        if previous is not None
+                        else None,
+                    )
+                )
+
+        if to_fetch:
+            responses |= self._batch_get(to_fetch)
+
+        return {
+            file_path: TypeAdapter(desired_return_type).validate_python(
+                self._decode_response(responses[file_path], accept_header)
+            )
+            for file_path, (accept_header, desired_return_type) in requested.items()
+        }
+
+    def wait_for_file_change(
+        self,
+        file_path: str | Path,
+        desired_return_type: type[Any] = str,
+        timeout_s: float = 30,
+    ) -> Any:
+        """
+        Wait until a file differs from its cached contents, then get and cache its
+        new contents in the format specified. The server is asked to hold the request
+        open until the file changes, so changes are seen as soon as they happen
+        without polling. If the file isn't cached, its contents are returned straight
+        away.
+
+        Args:
+            file_path: Path to the file.
+            desired_return_type: Specify how to parse the response.
+            timeout_s: The longest time to wait for the file to change, after which
+                the cached contents are returned.
+        Returns:
+            The file contents, in the format specified.
+        """
+        file_path = Path(file_path)
+        accept_header = _get_mime_type(desired_return_type)
+        cache_key = (ENDPOINTS.CONFIG, accept_header, file_path)
+        with self._lock:
+            previous = self._cache.get(cache_key) or self._revalidation_cache.get(
+                cache_key
+            )
+        params: dict[str, str | float] = {"timeout": timeout_s}
+        if previous is not None and (etag := previous.headers.get("etag")):
+            params["since"] = etag
+
+        request_url = self._url + ENDPOINTS.CONFIG_WATCH + f"/{file_path}"
+        r = requests.get(request_url, params=params, headers={"Accept": accept_header})
+        if previous is not None and r.status_code == requests.codes.not_modified:
+            self._log.debug(f"{file_path} didn't change within {timeout_s}s.")
+            r = previous
+        else:
+            self._raise_for_status(r)
+        with self._lock:
+            self._cache[cache_key] = r
+            if r.headers.get("etag"):
+                self._revalidation_cache[cache_key] = r
+        self._log.debug(f"Cache set for {request_url}.")
+        return TypeAdapter(desired_return_type).validate_python(
+            self._decode_response(r, accept_header)
+        )
+
+    def watch_for_changes(
+        self,
+        file_paths: Iterable[str | Path],
+        desired_return_type: type[Any] = str,
+    ) -> Iterator[FileChangeEvent]:
+        """
+        Subscribe to the config server's notifications of changes to some files.
+        Whenever the server reports that a file has changed, its cached results are
+        dropped so that the next request for it gets the new contents. This means a
+        long cache lifetime can safely be used for these files. Iterating blocks until
+        the next change, so this is usually done in a background thread.
+
+        Args:
+            file_paths: Paths to the files to watch.
+            desired_return_type: The type that these files are requested as, which
+                determines the ETags that the server sends.
+        Yields:
+            An event for each file when the subscription starts, and then whenever one
+            of the files changes.
+        """
+        accept_header = _get_mime_type(desired_return_type)
+        r = requests.get(
+            self._url + ENDPOINTS.CONFIG_EVENTS,
+            params={
+                "file_path": [str(Path(file_path)) for file_path in file_paths],
+                "accept": accept_header,
+            },
+            headers={"Accept": "text/event-stream"},
+            stream=True,
+        )
+        self._raise_for_status(r)
+        with r:
+            for data in _iter_server_sent_data(r.iter_lines()):
+                event = FileChangeEvent.model_validate_json(data)
+                self._drop_if_changed(event, accept_header)
+                yield event
+
+    def _drop_if_changed(self, event: FileChangeEvent, accept_header: str):
+        with self._lock:
+            cached = self._cache.get((ENDPOINTS.CONFIG, accept_header, event.file_path))
+            cached_etag = cached.headers.get("etag") if cached is not None else None
+            if cached_etag and event.etag and etag_matches(cached_etag, event.etag):
+                return
+            for cache_key in [key for key in self._cache if key[2] == event.file_path]:
+                del self._cache[cache_key]
+        self._log.debug(f"Cache cleared for {event.file_path}.")
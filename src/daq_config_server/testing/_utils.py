@@ -12,11 +12,12 @@ def make_test_response(
     raise_exc: type[RequestException] | None = None,
     json_value: str | None = None,
     content_type: ValidAcceptHeaders = ValidAcceptHeaders.PLAIN_TEXT,
+    headers: dict[str, str] | None = None,
 ):
     r = Response(
         json=json_value,
         status_code=status_code,
-        headers={"content-type": content_type},
+        headers={"content-type": content_type, **(headers or {})},
         content=content,
     )
     r.raise_for_status = MagicMock()
@@ -0,0 +1,50 @@
+"""Compare serializing a large lookup table via ``model_dump`` and ``JSONResponse``
+with serializing it straight to JSON bytes.
+
+Run with ``python -m tests.benchmarks.json_serialization``.
+"""
+
+import json
+import random
+import timeit
+
+from fastapi.responses import JSONResponse
+
+from daq_config_server.app._json import dump_json
+from daq_config_server.models.lookup_tables import GenericLookupTable
+
+N_ROWS = 20_000
+N_COLUMNS = 8
+REPEATS = 20
+
+
+def make_large_lookup_table() -> GenericLookupTable:
+    rng = random.Random(0)
+    return GenericLookupTable(
+        column_names=[f"column_{i}" for i in range(N_COLUMNS)],
+        rows=[
+            [rng.randint(0, 100_000)] + [rng.random() for _ in range(N_COLUMNS - 1)]
+            for _ in range(N_ROWS)
+        ],
+    )
+
+
+def main():
+    lut = make_large_lookup_table()
+    # Small floats may be formatted differently, but must parse to the same values
+    assert json.loads(dump_json(lut)) == json.loads(
+        bytes(JSONResponse(lut.model_dump()).body)
+    )
+
+    cases = {
+        "model_dump + JSONResponse": lambda: JSONResponse(lut.model_dump()).body,
+        "dump_json": lambda: dump_json(lut),
+    }
+    print(f"Serializing a {N_ROWS}x{N_COLUMNS} lookup table, best of {REPEATS}:")
+    for name, serialize in cases.items():
+        best = min(timeit.repeat(serialize, number=1, repeat=REPEATS))
+        print(f"  {name:<28}{best * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare the latency of small conversions while large lookup tables are converted
+in other threads, with the large conversions run in those threads or in the
+conversion process pool.
+
+Run with ``python -m tests.benchmarks.process_pool_conversions``.
+"""
+
+import statistics
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from typing import Any
+
+import xmltodict
+
+from daq_config_server.app._config import ConversionPoolConfig
+from daq_config_server.app._conversion_pool import (
+    convert_out_of_process,
+    init_conversion_pool,
+    shutdown_conversion_pool,
+)
+from daq_config_server.models.lookup_tables import BeamlinePitchLookupTable
+
+N_ROWS = 200_000
+N_LARGE_CONVERSION_THREADS = 2
+N_SMALL_CONVERSIONS = 500
+SMALL_XML = "<levels>" + "<level><name>1.0x</name><x>1</x></level>" * 10 + "</levels>"
+
+
+def make_large_lookup_table() -> str:
+    rows = "".join(f"{i * 0.001:.4f}\t{i * 0.5:.3f}\n" for i in range(N_ROWS))
+    return f"Units Deg mrad\n{rows}"
+
+
+def small_conversion_latencies_ms(convert_large: Callable[[], Any]) -> list[float]:
+    stop = Event()
+
+    def convert_large_until_stopped():
+        while not stop.is_set():
+            convert_large()
+
+    latencies: list[float] = []
+    with ThreadPoolExecutor(max_workers=N_LARGE_CONVERSION_THREADS) as executor:
+        futures = [
+            executor.submit(convert_large_until_stopped)
+            for _ in range(N_LARGE_CONVERSION_THREADS)
+        ]
+        time.sleep(0.5)
+        for _ in range(N_SMALL_CONVERSIONS):
+            start = time.perf_counter()
+            xmltodict.parse(SMALL_XML)
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.001)
+        stop.set()
+        for future in futures:
+            future.result()
+    return latencies
+
+
+def main():
+    large_lut = make_large_lookup_table()
+    convert = BeamlinePitchLookupTable.from_contents
+    init_conversion_pool(ConversionPoolConfig(max_workers=N_LARGE_CONVERSION_THREADS))
+    # Start the pool processes before timing anything
+    convert_out_of_process(xmltodict.parse, SMALL_XML)
+
+    cases = {
+        "in thread": lambda: convert(large_lut),
+        "in process pool": lambda: convert_out_of_process(convert, large_lut),
+    }
+    print(
+        f"Latency of small conversions while {N_LARGE_CONVERSION_THREADS} threads "
+        f"convert {N_ROWS} row lookup tables:"
+    )
+    try:
+        for name, convert_large in cases.items():
+            latencies = small_conversion_latencies_ms(convert_large)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"  {name:<18}p50 {quantiles[49]:8.2f} ms   "
+                f"p99 {quantiles[98]:8.2f} ms   max {max(latencies):8.2f} ms"
+            )
+    finally:
+        shutdown_conversion_pool()
+
+
+if __name__ == "__main__":
+    main()
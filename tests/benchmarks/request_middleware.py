@@ -0,0 +1,104 @@
+"""Compare the time spent handling a request with no middleware, with the
+``BaseHTTPMiddleware`` which used to log every request, and with the request ID
+and access log middleware which replaced it, with DEBUG logging off as it is in
+production.
+
+Run with ``python -m tests.benchmarks.request_middleware``.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message
+
+from daq_config_server.app._middleware import AccessLogMiddleware, RequestIdMiddleware
+
+N_REQUESTS = 20_000
+LOGGER = logging.getLogger(__name__)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/config")
+    def get_config() -> Response:
+        return PlainTextResponse("contents")
+
+    return app
+
+
+async def log_request_details(
+    request: Request,
+    call_next: Callable[[Request], Awaitable[Response]],
+) -> Response:
+    LOGGER.debug(
+        f"method: {request.method} url: {request.url} body: {await request.body()}"
+    )
+    return await call_next(request)
+
+
+def make_base_http_middleware_app() -> FastAPI:
+    app = make_app()
+    app.middleware("http")(log_request_details)
+    return app
+
+
+def make_asgi_middleware_app() -> FastAPI:
+    app = make_app()
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+async def mean_request_time_us(app: ASGIApp) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/config",
+        "raw_path": b"/config",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"text/plain")],
+        "server": ("localhost", 8555),
+        "client": ("127.0.0.1", 50000),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        pass
+
+    # Build the middleware stack before timing anything
+    await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(N_REQUESTS):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / N_REQUESTS * 1e6
+
+
+async def run():
+    logging.getLogger().setLevel(logging.INFO)
+    cases = {
+        "no middleware": make_app(),
+        "BaseHTTPMiddleware": make_base_http_middleware_app(),
+        "ASGI middleware": make_asgi_middleware_app(),
+    }
+    print(f"Mean time to handle {N_REQUESTS} requests with DEBUG logging off:")
+    for name, app in cases.items():
+        print(f"  {name:<22}{await mean_request_time_us(app):8.1f} us")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the time taken to check paths against a whitelist of thousands of
+directories by checking every directory in turn, as was done before, and with the
+trie in ``WhitelistIndex``.
+
+Run with ``python -m tests.benchmarks.whitelist_index``.
+"""
+
+import random
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from daq_config_server.app._whitelist import WhitelistIndex
+
+N_BEAMLINES = 50
+N_DIRS_PER_BEAMLINE = 100
+N_FILES = 1_000
+N_CHECKS = 1_000
+
+
+def make_whitelist() -> tuple[list[Path], list[Path]]:
+    dirs = [
+        Path(f"/dls_sw/i{beamline:02d}/software/daq_configuration/dir_{i}")
+        for beamline in range(N_BEAMLINES)
+        for i in range(N_DIRS_PER_BEAMLINE)
+    ]
+    files = [Path(f"/dls_sw/files/config_{i}.txt") for i in range(N_FILES)]
+    return files, dirs
+
+
+def make_paths_to_check(dirs: list[Path]) -> list[Path]:
+    rng = random.Random(0)
+    whitelisted = [
+        rng.choice(dirs) / "lookup" / f"table_{i}.txt" for i in range(N_CHECKS // 2)
+    ]
+    # The worst case for checking every directory in turn
+    forbidden = [
+        Path(f"/dls_sw/i{rng.randrange(N_BEAMLINES):02d}/other/file_{i}.txt")
+        for i in range(N_CHECKS // 2)
+    ]
+    return whitelisted + forbidden
+
+
+def mean_check_time_us(
+    is_whitelisted: Callable[[Path], bool], paths: list[Path]
+) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        is_whitelisted(path)
+    return (time.perf_counter() - start) / len(paths) * 1e6
+
+
+def main():
+    files, dirs = make_whitelist()
+    paths = make_paths_to_check(dirs)
+    file_set, dir_set = set(files), set(dirs)
+
+    def check_every_dir(file_path: Path) -> bool:
+        return file_path in file_set or any(
+            file_path.is_relative_to(dir) for dir in dir_set
+        )
+
+    start = time.perf_counter()
+    index = WhitelistIndex(files, dirs)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"Mean time to check {len(paths)} paths against {len(dirs)} whitelisted "
+        f"directories and {len(files)} files:"
+    )
+    for name, is_whitelisted in {
+        "every directory": check_every_dir,
+        "trie": index.__contains__,
+    }.items():
+        print(f"  {name:<18}{mean_check_time_us(is_whitelisted, paths):10.2f} us")
+    print(f"Building the trie took {build_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
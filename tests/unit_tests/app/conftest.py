@@ -0,0 +1,16 @@
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+from daq_config_server.app._watcher import PollingFileWatcher
+
+
+@pytest.fixture
+def polling_watcher() -> Generator[PollingFileWatcher, None, None]:
+    """A polling file watcher installed as the server's watcher, which won't poll
+    during a test unless ``poll`` is called"""
+    watcher = PollingFileWatcher(interval_s=60)
+    with patch("daq_config_server.app._watcher._file_watcher", watcher):
+        yield watcher
+    watcher.stop()
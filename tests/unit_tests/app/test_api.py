@@ -3,13 +3,18 @@ import sys
 from unittest.mock import MagicMock, patch
 
 import pytest
-from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from daq_config_server.__main__ import __version__, main
 from daq_config_server.app import main as main_app
-from daq_config_server.app._config import ConverterConfig, WhitelistConfig
-from daq_config_server.app.api import app, lifespan, log_request_details
+from daq_config_server.app._config import (
+    AppConfig,
+    ConverterConfig,
+    MetricsConfig,
+    UvicornConfig,
+    WhitelistConfig,
+)
+from daq_config_server.app.api import app, lifespan
 from tests.constants import TEST_CONFIG_PATH
 
 
@@ -24,22 +29,15 @@ def mock_init_whitelist():
         yield patched_fn
 
 
-async def test_log_request_details():
-    with patch("daq_config_server.app.api.LOGGER") as logger:
-        app = FastAPI()
-        app.middleware("http")(log_request_details)
-
-        @app.get("/")
-        async def root():  # type: ignore
-            return {"message": "Hello World"}
+@pytest.fixture(autouse=True)
+def mock_prepare_multiprocess_dir():
+    with patch("daq_config_server.app.api.prepare_multiprocess_dir") as patched_fn:
+        yield patched_fn
 
-        client = TestClient(app)
-        response = client.get("/")
 
-        assert response.status_code == 200
-        logger.debug.assert_called_once_with(
-            "method: GET url: http://testserver/ body: b''"
-        )
+def test_app_gives_every_response_a_request_id(mock_app: TestClient):
+    response = mock_app.get("/healthz")
+    assert response.headers["x-request-id"]
 
 
 def test_cli_version():
@@ -57,6 +55,26 @@ def test_logging_with_mounted_config(
     mock_graylog_setup.assert_called_once()
 
 
+@patch("daq_config_server.app.api.uvicorn.run")
+@patch("daq_config_server.app.api.set_up_logging")
+@patch("daq_config_server.app.api.load_config")
+def test_metrics_are_collected_from_every_worker_if_there_are_several(
+    mock_load_config: MagicMock,
+    mock_set_up_logging: MagicMock,
+    mock_run: MagicMock,
+    mock_prepare_multiprocess_dir: MagicMock,
+):
+    mock_load_config.return_value = AppConfig(uvicorn=UvicornConfig(workers=1))
+    main_app()
+    mock_prepare_multiprocess_dir.assert_not_called()
+
+    mock_load_config.return_value = AppConfig(uvicorn=UvicornConfig(workers=4))
+    main_app()
+    mock_prepare_multiprocess_dir.assert_called_once_with(
+        MetricsConfig().multiprocess_dir
+    )
+
+
 @patch("daq_config_server.__main__.main_app")
 @patch("daq_config_server.__main__.ArgumentParser.parse_args")
 def test_main(mock_parse_args: MagicMock, mock_main: MagicMock):
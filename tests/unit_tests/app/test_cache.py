@@ -0,0 +1,234 @@
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Timer
+from unittest.mock import MagicMock, patch
+
+from daq_config_server.app._cache import (
+    EncodedBody,
+    FileCache,
+    FileFingerprint,
+    NegativeCache,
+    SingleFlight,
+    SingleFlightStats,
+    get_conversion_cache,
+    get_conversion_flight,
+    get_response_body_cache,
+    init_cache,
+)
+from daq_config_server.app._config import CacheConfig
+from daq_config_server.app._routes import get_converted_file_contents
+
+
+def _fingerprint(path: Path, mtime_ns: int = 0) -> FileFingerprint:
+    return FileFingerprint(path, inode=1, mtime_ns=mtime_ns, size=10)
+
+
+def test_file_fingerprint_changes_when_file_is_modified(tmp_path: Path):
+    file = tmp_path / "file.txt"
+    file.write_text("a")
+    before = FileFingerprint.from_path(file)
+    assert FileFingerprint.from_path(file) == before
+
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert FileFingerprint.from_path(file) != before
+
+
+def test_cache_hit_requires_matching_fingerprint():
+    cache: FileCache[Path, str] = FileCache(max_entries=2)
+    path = Path("/a")
+    cache.put(path, _fingerprint(path), "value")
+
+    assert cache.get(path, _fingerprint(path)) == "value"
+    assert cache.get(path, _fingerprint(path, mtime_ns=1)) is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache: FileCache[Path, str] = FileCache(max_entries=2)
+    a, b, c = Path("/a"), Path("/b"), Path("/c")
+    cache.put(a, _fingerprint(a), "a")
+    cache.put(b, _fingerprint(b), "b")
+    cache.get(a, _fingerprint(a))
+    cache.put(c, _fingerprint(c), "c")
+
+    assert cache.get(b, _fingerprint(b)) is None
+    assert cache.get(a, _fingerprint(a)) == "a"
+    assert cache.stats().evictions == 1
+    assert len(cache) == 2
+
+
+def test_cache_bounded_in_bytes_evicts_until_values_fit():
+    cache: FileCache[Path, str] = FileCache(
+        max_entries=10, max_size_bytes=10, sizeof=len
+    )
+    a, b, c = Path("/a"), Path("/b"), Path("/c")
+    cache.put(a, _fingerprint(a), "aaaa")
+    cache.put(b, _fingerprint(b), "bbbb")
+    cache.put(c, _fingerprint(c), "cccc")
+
+    assert cache.get(a, _fingerprint(a)) is None
+    assert cache.get(c, _fingerprint(c)) == "cccc"
+    stats = cache.stats()
+    assert (stats.entries, stats.size_bytes, stats.max_size_bytes) == (2, 8, 10)
+
+
+def test_cache_bounded_in_bytes_is_still_bounded_in_entries():
+    cache: FileCache[Path, str] = FileCache(
+        max_entries=2, max_size_bytes=100, sizeof=len
+    )
+    for name in "abc":
+        cache.put(Path(name), _fingerprint(Path(name)), name)
+    assert len(cache) == 2
+    assert cache.stats().evictions == 1
+
+
+def test_value_larger_than_cache_is_not_cached():
+    cache: FileCache[Path, str] = FileCache(
+        max_entries=10, max_size_bytes=10, sizeof=len
+    )
+    a, b = Path("/a"), Path("/b")
+    cache.put(a, _fingerprint(a), "a")
+    cache.put(b, _fingerprint(b), "old")
+    cache.put(b, _fingerprint(b, mtime_ns=1), "b" * 11)
+
+    assert cache.get(b, _fingerprint(b, mtime_ns=1)) is None
+    assert cache.get(a, _fingerprint(a)) == "a"
+    assert len(cache) == 1
+
+
+def test_response_body_cache_is_bounded_by_configured_size():
+    init_cache(CacheConfig(max_response_body_bytes=200))
+    cache = get_response_body_cache()
+    path = Path("/a")
+    body = EncodedBody(b"x" * 90, [(b"content-length", b"90")])
+    cache.put((path, "application/json", "gzip"), _fingerprint(path), body)
+    cache.put((path, "application/json", "zstd"), _fingerprint(path), body)
+    assert len(cache) == 1
+    assert cache.stats().size_bytes == body.size == 106
+
+
+def test_cache_invalidate_and_clear():
+    cache: FileCache[Path, str] = FileCache(max_entries=2)
+    a, b = Path("/a"), Path("/b")
+    cache.put(a, _fingerprint(a), "a")
+    cache.put(b, _fingerprint(b), "b")
+    cache.invalidate(a)
+    assert cache.get(a, _fingerprint(a)) is None
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_disabled_cache_never_stores():
+    init_cache(CacheConfig(enabled=False))
+    cache = get_conversion_cache()
+    path = Path("/a")
+    cache.put(path, _fingerprint(path), "a")
+    assert cache.get(path, _fingerprint(path)) is None
+    assert len(cache) == 0
+
+
+def _blocking_work(started: Event, release: Event, error: Exception | None = None):
+    def work() -> str:
+        started.set()
+        release.wait(timeout=5)
+        if error:
+            raise error
+        return "value"
+
+    return MagicMock(side_effect=work)
+
+
+def _call_concurrently(
+    flight: SingleFlight[str, str], work: Callable[[], str], started: Event
+) -> "list[Future[str]]":
+    """Call ``work`` for a key, then call it for the same key again while the first
+    call is still in progress, and finally let ``work`` finish"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flight.do, "key", work)]
+        assert started.wait(timeout=5)
+        futures.append(executor.submit(flight.do, "key", work))
+        while flight.stats().calls < 2:
+            time.sleep(0.001)
+    return futures
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight: SingleFlight[str, str] = SingleFlight()
+    started, release = Event(), Event()
+    work = _blocking_work(started, release)
+    Timer(0.1, release.set).start()
+
+    futures = _call_concurrently(flight, work, started)
+
+    assert [future.result() for future in futures] == ["value", "value"]
+    work.assert_called_once()
+    assert flight.stats() == SingleFlightStats(calls=2, coalesced=1)
+    assert flight.do("key", lambda: "new value") == "new value"
+
+
+def test_single_flight_shares_exception():
+    flight: SingleFlight[str, str] = SingleFlight()
+    started, release = Event(), Event()
+    work = _blocking_work(started, release, error=ValueError("Bad file"))
+    Timer(0.1, release.set).start()
+
+    futures = _call_concurrently(flight, work, started)
+
+    assert all(isinstance(future.exception(), ValueError) for future in futures)
+    work.assert_called_once()
+
+
+def test_concurrent_requests_for_changed_file_convert_it_once(tmp_path: Path):
+    file_path = tmp_path / "settings.json"
+    file_path.write_text('{"a": 1}')
+    started, release = Event(), Event()
+
+    def slow_convert(_: Path) -> dict[str, int]:
+        started.set()
+        release.wait(timeout=5)
+        return {}
+
+    convert = MagicMock(side_effect=slow_convert)
+    Timer(0.1, release.set).start()
+
+    with (
+        patch("daq_config_server.app._routes._convert_file_contents", convert),
+        ThreadPoolExecutor(max_workers=2) as executor,
+    ):
+        futures = [executor.submit(get_converted_file_contents, file_path)]
+        assert started.wait(timeout=5)
+        futures.append(executor.submit(get_converted_file_contents, file_path))
+        while get_conversion_flight().stats().calls < 2:
+            time.sleep(0.001)
+
+    assert [future.result() for future in futures] == [{}, {}]
+    convert.assert_called_once()
+    assert get_conversion_flight().stats().coalesced == 1
+
+
+def test_negative_cache_entries_expire():
+    cache = NegativeCache(max_entries=2, ttl_s=0.05)
+    path = Path("/a")
+    cache.put(path, 404, "Not found")
+    assert cache.get(path) == (404, "Not found")
+    time.sleep(0.1)
+    assert cache.get(path) is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_negative_cache_invalidates_directory_recursively():
+    cache = NegativeCache(max_entries=4, ttl_s=60)
+    for path in ("/a/b/c", "/a/d", "/e"):
+        cache.put(Path(path), 404, "Not found")
+    cache.invalidate(Path("/a/d"))
+    assert len(cache) == 2
+    cache.invalidate(Path("/a"), recursive=True)
+    assert cache.get(Path("/a/b/c")) is None
+    assert cache.get(Path("/e")) == (404, "Not found")
@@ -1,3 +1,7 @@
+import json
+import logging
+from collections.abc import Generator
+from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 from unittest.mock import MagicMock, patch
@@ -6,9 +10,15 @@ import pydantic
 import pytest
 import requests
 from fastapi import status
+from fastapi.testclient import TestClient
 from httpx import Response
 
-from daq_config_server.app._routes import ENDPOINTS, ValidAcceptHeaders
+from daq_config_server.app._routes import (
+    ENDPOINTS,
+    FileChangeEvent,
+    ValidAcceptHeaders,
+)
+from daq_config_server.app.api import app
 from daq_config_server.app.client import (
     ConfigClient,
     TModel,
@@ -25,6 +35,7 @@ from daq_config_server.models.lookup_tables.insertion_device import (
     UndulatorEnergyGapLookupTable,
 )
 from daq_config_server.testing import make_test_response
+from tests.constants import TestDataPaths
 
 test_path = Path("test")
 
@@ -50,6 +61,25 @@ def test_config_client_get_file_contents_default_header(
     )
 
 
+@patch("daq_config_server.app.client.requests.get")
+def test_config_client_logs_request_and_server_timing_at_debug_level(
+    mock_request: MagicMock, client: ConfigClient, caplog: pytest.LogCaptureFixture
+):
+    mock_request.return_value = make_test_response(
+        "test", headers={"server-timing": "read;dur=1.5, total;dur=2"}
+    )
+    with caplog.at_level(logging.DEBUG, logger="daq_config_server.client"):
+        client.get_file_contents(test_path)
+    assert any(
+        record.levelno == logging.DEBUG
+        and record.getMessage().startswith(f"GET url{ENDPOINTS.CONFIG}/test took ")
+        and record.getMessage().endswith(
+            " ms, server timing: read 1.5 ms, total 2.0 ms"
+        )
+        for record in caplog.records
+    )
+
+
 @patch("daq_config_server.app.client.requests.get")
 def test_config_client_get_file_contents_with_bytes(
     mock_request: MagicMock, client: ConfigClient
@@ -252,3 +282,291 @@ def test_reset_cache(
         str,
     )
     assert result != new_result
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_expired_cache_entry_is_revalidated_with_etag(
+    mock_request: MagicMock, client: ConfigClient
+):
+    etag = '"abc"'
+    mock_request.side_effect = [
+        make_test_response("1st_read", headers={"etag": etag}),
+        make_test_response("", status.HTTP_304_NOT_MODIFIED),
+    ]
+    assert client.get_file_contents(test_path) == "1st_read"
+    client._cache.clear()
+    assert client.get_file_contents(test_path) == "1st_read"
+
+    assert mock_request.call_args_list[1].kwargs["headers"] == {
+        "Accept": ValidAcceptHeaders.PLAIN_TEXT,
+        "If-None-Match": etag,
+    }
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_changed_file_is_downloaded_again_on_revalidation(
+    mock_request: MagicMock, client: ConfigClient
+):
+    mock_request.side_effect = [
+        make_test_response("1st_read", headers={"etag": '"abc"'}),
+        make_test_response("2nd_read", headers={"etag": '"def"'}),
+    ]
+    assert client.get_file_contents(test_path) == "1st_read"
+    assert client.get_file_contents(test_path, reset_cached_result=True) == "2nd_read"
+    assert (
+        client._revalidation_cache[
+            (ENDPOINTS.CONFIG, ValidAcceptHeaders.PLAIN_TEXT, test_path)
+        ].headers["etag"]
+        == '"def"'
+    )
+
+
+@pytest.mark.parametrize(
+    "start, end, expected_range",
+    [(0, 10, "bytes=0-9"), (5, None, "bytes=5-"), (-8, None, "bytes=-8")],
+)
+@patch("daq_config_server.app.client.requests.get")
+def test_get_file_range_sends_range_header(
+    mock_request: MagicMock,
+    client: ConfigClient,
+    start: int,
+    end: int | None,
+    expected_range: str,
+):
+    mock_request.return_value = make_test_response(
+        "part",
+        status.HTTP_206_PARTIAL_CONTENT,
+        content_type=ValidAcceptHeaders.RAW_BYTES,
+    )
+    assert client.get_file_range(test_path, start, end) == b"part"
+    mock_request.assert_called_once_with(
+        client._url + ENDPOINTS.CONFIG + "/" + str(test_path),
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": expected_range},
+    )
+
+
+@pytest.mark.parametrize(
+    "start, end, expected", [(2, 5, b"234"), (-3, None, b"789"), (8, None, b"89")]
+)
+@patch("daq_config_server.app.client.requests.get")
+def test_get_file_range_slices_full_response_if_range_ignored(
+    mock_request: MagicMock,
+    client: ConfigClient,
+    start: int,
+    end: int | None,
+    expected: bytes,
+):
+    mock_request.return_value = make_test_response(
+        "0123456789", content_type=ValidAcceptHeaders.RAW_BYTES
+    )
+    assert client.get_file_range(test_path, start, end) == expected
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_get_file_range_past_end_of_file_is_empty(
+    mock_request: MagicMock, client: ConfigClient
+):
+    mock_request.return_value = make_test_response(
+        "", status.HTTP_416_RANGE_NOT_SATISFIABLE
+    )
+    assert client.get_file_range(test_path, 100) == b""
+    assert client.get_file_range(test_path, 5, 5) == b""
+    mock_request.assert_called_once()
+
+
+@pytest.mark.parametrize("start, end", [(-3, 5), (0, -1)])
+def test_get_file_range_rejects_invalid_ranges(
+    client: ConfigClient, start: int, end: int
+):
+    with pytest.raises(ValueError):
+        client.get_file_range(test_path, start, end)
+
+
+@pytest.fixture
+def client_using_test_server(client: ConfigClient) -> Generator[ConfigClient]:
+    """Route the client's batch requests to the app, so responses are realistic."""
+    test_client = TestClient(app)
+
+    def post(url: str, json: Any):
+        return test_client.post(url.removeprefix(client._url), json=json)
+
+    with patch("daq_config_server.app.client.requests.post", side_effect=post):
+        yield client
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_get_many_file_contents_reads_all_files_in_one_request_and_caches_them(
+    mock_get: MagicMock, client_using_test_server: ConfigClient
+):
+    client = client_using_test_server
+    files: dict[str | Path, type[Any]] = {
+        TestDataPaths.TEST_GOOD_JSON_PATH: dict,
+        TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH: str,
+        str(TestDataPaths.TEST_FILE_IN_GOOD_DIR): bytes,
+    }
+    results = client.get_many_file_contents(files)
+
+    assert results == {
+        TestDataPaths.TEST_GOOD_JSON_PATH: json.loads(
+            TestDataPaths.TEST_GOOD_JSON_PATH.read_text()
+        ),
+        TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH: (
+            TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH.read_text()
+        ),
+        TestDataPaths.TEST_FILE_IN_GOOD_DIR: (
+            TestDataPaths.TEST_FILE_IN_GOOD_DIR.read_bytes()
+        ),
+    }
+    for file_path, desired_return_type in files.items():
+        assert (
+            client.get_file_contents(file_path, desired_return_type)
+            == results[Path(file_path)]
+        )
+    mock_get.assert_not_called()
+
+
+def test_get_many_file_contents_only_requests_uncached_files(
+    client_using_test_server: ConfigClient,
+):
+    client = client_using_test_server
+    client.get_many_file_contents({TestDataPaths.TEST_GOOD_JSON_PATH: str})
+    with patch(
+        "daq_config_server.app.client.requests.post", side_effect=AssertionError
+    ):
+        client.get_many_file_contents({TestDataPaths.TEST_GOOD_JSON_PATH: str})
+
+
+def test_get_many_file_contents_revalidates_expired_files(
+    client_using_test_server: ConfigClient,
+):
+    client = client_using_test_server
+    file_path = TestDataPaths.TEST_GOOD_JSON_PATH
+    first = client.get_many_file_contents({file_path: str})
+    client._cache.clear()
+    with patch(
+        "daq_config_server.app.client._response_from_batch_item",
+        side_effect=AssertionError,
+    ):
+        assert client.get_many_file_contents({file_path: str}) == first
+    assert len(client._cache) == 1
+
+
+def test_get_many_file_contents_raises_after_caching_readable_files(
+    client_using_test_server: ConfigClient,
+):
+    client = client_using_test_server
+    client._log.error = MagicMock()
+    with pytest.raises(requests.exceptions.HTTPError, match="not a whitelisted file"):
+        client.get_many_file_contents(
+            {
+                TestDataPaths.TEST_FILE_NOT_ON_WHITELIST_PATH: str,
+                TestDataPaths.TEST_GOOD_JSON_PATH: str,
+            }
+        )
+    client._log.error.assert_called_once()
+    assert len(client._cache) == 1
+
+
+def test_client_advertises_compressed_encodings_supported_by_server():
+    accept_encoding = requests.utils.default_headers()["Accept-Encoding"]
+    assert "gzip" in accept_encoding
+    assert "zstd" in accept_encoding
+
+
+def _make_event_stream(*events: FileChangeEvent) -> MagicMock:
+    stream = MagicMock()
+    stream.iter_lines.return_value = [
+        line
+        for event in events
+        for line in (b"event: change", f"data: {event.model_dump_json()}".encode(), b"")
+    ] + [b": keepalive", b""]
+    return stream
+
+
+def _make_event(etag: str | None) -> FileChangeEvent:
+    return FileChangeEvent(file_path=test_path, etag=etag, timestamp=datetime.now(UTC))
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_watch_for_changes_subscribes_to_files_as_desired_type(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = _make_event_stream(_make_event('"1"'))
+    events = list(client.watch_for_changes([test_path, "/other"], dict))
+    assert [event.etag for event in events] == ['"1"']
+    mock_get.assert_called_once_with(
+        client._url + ENDPOINTS.CONFIG_EVENTS,
+        params={
+            "file_path": [str(test_path), "/other"],
+            "accept": ValidAcceptHeaders.JSON,
+        },
+        headers={"Accept": "text/event-stream"},
+        stream=True,
+    )
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_watch_for_changes_drops_cached_result_only_when_etag_changes(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = make_test_response("old", headers={"etag": '"1"'})
+    assert client.get_file_contents(test_path) == "old"
+
+    mock_get.return_value = _make_event_stream(_make_event('"1"'), _make_event('"2"'))
+    events = client.watch_for_changes([test_path])
+    assert next(events).etag == '"1"'
+    mock_get.return_value = make_test_response("new", headers={"etag": '"2"'})
+    assert client.get_file_contents(test_path) == "old"
+    assert next(events).etag == '"2"'
+    assert client.get_file_contents(test_path) == "new"
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_watch_for_changes_drops_cached_result_when_file_is_removed(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = make_test_response("old", headers={"etag": '"1"'})
+    client.get_file_contents(test_path)
+    mock_get.return_value = _make_event_stream(_make_event(None))
+    list(client.watch_for_changes([test_path]))
+    mock_get.return_value = make_test_response("new")
+    assert client.get_file_contents(test_path) == "new"
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_wait_for_file_change_sends_cached_etag(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = make_test_response("old", headers={"etag": '"1"'})
+    client.get_file_contents(test_path)
+    mock_get.return_value = make_test_response("new", headers={"etag": '"2"'})
+
+    assert client.wait_for_file_change(test_path, timeout_s=10) == "new"
+    mock_get.assert_called_with(
+        client._url + ENDPOINTS.CONFIG_WATCH + "/" + str(test_path),
+        params={"timeout": 10, "since": '"1"'},
+        headers={"Accept": ValidAcceptHeaders.PLAIN_TEXT},
+    )
+    assert client.get_file_contents(test_path) == "new"
+    assert mock_get.call_count == 2
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_wait_for_file_change_returns_cached_contents_on_timeout(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = make_test_response("old", headers={"etag": '"1"'})
+    client.get_file_contents(test_path)
+    mock_get.return_value = make_test_response(
+        "", status_code=status.HTTP_304_NOT_MODIFIED
+    )
+    assert client.wait_for_file_change(test_path) == "old"
+
+
+@patch("daq_config_server.app.client.requests.get")
+def test_wait_for_file_change_without_cached_result_does_not_wait(
+    mock_get: MagicMock, client: ConfigClient
+):
+    mock_get.return_value = make_test_response("contents")
+    assert client.wait_for_file_change(test_path) == "contents"
+    assert "since" not in mock_get.call_args.kwargs["params"]
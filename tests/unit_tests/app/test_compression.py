@@ -0,0 +1,70 @@
+import gzip
+
+import pytest
+
+from daq_config_server.app._compression import (
+    ContentEncoding,
+    compress,
+    init_compression,
+    negotiate_encoding,
+    should_compress,
+    zstd,
+)
+from daq_config_server.app._config import CompressionConfig
+
+
+@pytest.fixture(autouse=True)
+def default_compression_config():
+    init_compression(CompressionConfig())
+    yield
+    init_compression(CompressionConfig())
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, ContentEncoding.IDENTITY),
+        ("", ContentEncoding.IDENTITY),
+        ("identity", ContentEncoding.IDENTITY),
+        ("br, deflate", ContentEncoding.IDENTITY),
+        ("gzip", ContentEncoding.GZIP),
+        ("gzip, deflate, zstd", ContentEncoding.ZSTD),
+        ("GZIP;q=0.9, zstd;q=0.5", ContentEncoding.GZIP),
+        ("zstd;q=0, gzip", ContentEncoding.GZIP),
+        ("gzip;q=bad", ContentEncoding.IDENTITY),
+        ("*", ContentEncoding.ZSTD),
+        ("*;q=0.5, zstd;q=0", ContentEncoding.GZIP),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str | None, expected: ContentEncoding):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_negotiate_encoding_when_compression_disabled():
+    init_compression(CompressionConfig(enabled=False))
+    assert negotiate_encoding("gzip, zstd") == ContentEncoding.IDENTITY
+
+
+def test_compress_round_trips():
+    body = b'{"key": "value"}' * 100
+    assert gzip.decompress(compress(body, ContentEncoding.GZIP)) == body
+    assert zstd.decompress(compress(body, ContentEncoding.ZSTD)) == body
+    assert compress(body, ContentEncoding.IDENTITY) == body
+
+
+def test_gzip_output_is_deterministic():
+    body = b"a" * 2000
+    assert compress(body, ContentEncoding.GZIP) == compress(body, ContentEncoding.GZIP)
+
+
+def test_compression_level_is_configurable():
+    body = bytes(range(256)) * 64 + b"a" * 20000
+    fast = compress(body, ContentEncoding.GZIP)
+    init_compression(CompressionConfig(gzip_level=0))
+    assert len(compress(body, ContentEncoding.GZIP)) > len(fast)
+
+
+def test_should_compress_uses_minimum_size():
+    init_compression(CompressionConfig(minimum_size=10))
+    assert not should_compress(b"a" * 9)
+    assert should_compress(b"a" * 10)
@@ -0,0 +1,158 @@
+import json
+import multiprocessing
+import time
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+from xml.parsers.expat import ExpatError
+
+import pytest
+import xmltodict
+
+from daq_config_server.app._config import ConversionPoolConfig
+from daq_config_server.app._conversion_pool import (
+    convert_in_thread,
+    convert_out_of_process,
+    init_conversion_pool,
+    shutdown_conversion_pool,
+)
+from daq_config_server.app._file_converter_map import ConverterExecutor
+from daq_config_server.app._json import SerializedJson, dump_json
+from daq_config_server.app._routes import (
+    ConverterParseError,
+    get_converted_file_contents,
+    get_converted_file_json,
+)
+from daq_config_server.models.lookup_tables.insertion_device import (
+    UndulatorEnergyGapLookupTable,
+)
+from tests.constants import TestDataPaths
+
+
+@pytest.fixture
+def conversion_pool() -> Generator[None, None, None]:
+    init_conversion_pool(ConversionPoolConfig(max_workers=1))
+    yield
+    init_conversion_pool(ConversionPoolConfig())
+
+
+def _sleep(contents: str):
+    time.sleep(float(contents))
+
+
+def _run_out_of_process(*file_paths: Path):
+    return patch(
+        "daq_config_server.app._file_converter_map._converter_executors",
+        dict.fromkeys(file_paths, ConverterExecutor.PROCESS),
+    )
+
+
+def test_converter_is_run_in_pool_and_result_serialized(conversion_pool: None):
+    contents = TestDataPaths.TEST_GOOD_LUT_PATH.read_text()
+    converter = UndulatorEnergyGapLookupTable.from_contents
+
+    with patch(
+        "daq_config_server.app._conversion_pool.dump_json", side_effect=dump_json
+    ) as mock_dump_json:
+        result = convert_out_of_process(converter, contents)
+        mock_dump_json.assert_not_called()
+
+    assert isinstance(result, SerializedJson)
+    assert result == dump_json(converter(contents))
+
+
+def test_converter_error_is_raised_from_pool(conversion_pool: None):
+    with pytest.raises(ExpatError):
+        convert_out_of_process(xmltodict.parse, "<not xml")
+
+
+def test_converter_is_run_in_thread_when_pool_is_disabled():
+    init_conversion_pool(ConversionPoolConfig(max_workers=0))
+    try:
+        assert convert_out_of_process(xmltodict.parse, "<a>1</a>") == {"a": "1"}
+    finally:
+        shutdown_conversion_pool()
+
+
+def test_file_converted_out_of_process_is_returned_as_if_converted_in_thread(
+    conversion_pool: None, mock_file_converter_map: dict[str, Any]
+):
+    file_path = TestDataPaths.TEST_GOOD_XML_PATH
+    expected_contents = get_converted_file_contents(file_path)
+    expected_json = get_converted_file_json(file_path)
+
+    with (
+        _run_out_of_process(file_path),
+        patch("daq_config_server.app._routes.get_conversion_cache") as mock_cache,
+    ):
+        mock_cache.return_value.get.return_value = None
+        assert get_converted_file_json(file_path) == expected_json
+        assert get_converted_file_contents(file_path) == expected_contents
+
+
+def test_file_which_fails_to_convert_out_of_process_raises_parse_error(
+    conversion_pool: None, tmp_path: Path, mock_file_converter_map: dict[str, Any]
+):
+    file_path = tmp_path / "bad.xml"
+    file_path.write_text("<not xml")
+    mock_file_converter_map[str(file_path)] = xmltodict.parse
+
+    with _run_out_of_process(file_path), pytest.raises(ConverterParseError):
+        get_converted_file_contents(file_path)
+
+
+def test_serialized_json_is_not_serialized_again():
+    body = SerializedJson(json.dumps({"a": 1}).encode())
+    assert dump_json(body) is body
+
+
+def test_converter_in_thread_times_out():
+    with pytest.raises(TimeoutError):
+        convert_in_thread(_sleep, "1", timeout_s=0.01)
+
+
+def test_converter_in_pool_times_out_and_pool_is_restarted(conversion_pool: None):
+    with pytest.raises(TimeoutError):
+        convert_out_of_process(_sleep, "1", timeout_s=0.01)
+    assert convert_out_of_process(xmltodict.parse, "<a>1</a>") == b'{"a":"1"}'
+
+
+def test_time_waiting_for_free_pool_process_does_not_count_towards_timeout(
+    conversion_pool: None,
+):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(convert_out_of_process, _sleep, delay_s, timeout_s=1.4)
+            for delay_s in ("1.0", "0.8")
+        ]
+        assert [future.result() for future in futures] == [b"null", b"null"]
+
+
+def _wait_for_no_child_processes():
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children():
+        assert time.monotonic() < deadline, "Pool processes are still running"
+        time.sleep(0.05)
+
+
+def test_process_running_timed_out_conversion_is_killed(conversion_pool: None):
+    with pytest.raises(TimeoutError):
+        convert_out_of_process(_sleep, "30", timeout_s=0.5)
+    _wait_for_no_child_processes()
+
+
+def test_conversion_in_pool_broken_by_killing_another_conversion_is_retried():
+    init_conversion_pool(ConversionPoolConfig(max_workers=2))
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stuck = executor.submit(convert_out_of_process, _sleep, "30", 0.5)
+            # Give the stuck conversion a head start, so that both are in one pool
+            time.sleep(0.1)
+            retried = executor.submit(convert_out_of_process, _sleep, "1")
+            with pytest.raises(TimeoutError):
+                stuck.result()
+            assert retried.result() == b"null"
+    finally:
+        init_conversion_pool(ConversionPoolConfig())
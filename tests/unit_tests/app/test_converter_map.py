@@ -4,8 +4,11 @@ import pytest
 
 from daq_config_server.app._config import ConverterConfig
 from daq_config_server.app._file_converter_map import (
+    ConverterExecutor,
     ConverterMap,
     get_converter,
+    get_converter_executor,
+    get_converter_map_paths,
     init_converter_map,
     load_converter_map_from_config_file,
 )
@@ -78,3 +81,25 @@ def test_init_converter_map_updates_converter():
     )
     new_conversion = get_converter(Path("tests/test_data/test_xml.xml"))
     assert callable(new_conversion)
+
+
+def test_init_converter_map_updates_converter_map_paths():
+    init_converter_map(
+        ConverterConfig(config_file="tests/test_data/test_converter_map.yaml")
+    )
+    assert Path("tests/test_data/test_xml.xml") in get_converter_map_paths()
+
+
+def test_init_converter_map_reads_converter_executors(tmp_path: Path):
+    config_file = tmp_path / "converter_map.yaml"
+    config_file.write_text(
+        '- path: "/a.xml"\n'
+        "  converter: Xml\n"
+        "  executor: process\n"
+        '- path: "/b.xml"\n'
+        "  converter: Xml\n"
+    )
+    init_converter_map(ConverterConfig(config_file=str(config_file)))
+    assert get_converter_executor(Path("/a.xml")) == ConverterExecutor.PROCESS
+    assert get_converter_executor(Path("/b.xml")) == ConverterExecutor.THREAD
+    assert get_converter_executor(Path("/c.xml")) == ConverterExecutor.THREAD
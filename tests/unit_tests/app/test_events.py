@@ -0,0 +1,109 @@
+import asyncio
+import json
+from collections.abc import Generator
+from pathlib import Path
+from threading import Timer
+from unittest.mock import patch
+
+import pytest
+
+from daq_config_server.app._config import EventsConfig
+from daq_config_server.app._events import ChangeSubscription, init_events
+from daq_config_server.app._routes import ValidAcceptHeaders, _change_events
+from daq_config_server.app._watcher import PollingFileWatcher
+
+FAST_EVENTS_CONFIG = EventsConfig(poll_interval_s=0.01, keepalive_interval_s=0.5)
+
+
+@pytest.fixture(autouse=True)
+def fast_events() -> Generator[None, None, None]:
+    init_events(FAST_EVENTS_CONFIG)
+    yield
+    init_events(EventsConfig())
+
+
+@pytest.fixture
+def watched_file(tmp_path: Path) -> Generator[Path, None, None]:
+    file_path = tmp_path / "settings.json"
+    file_path.write_text('{"a": 1}')
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        yield file_path
+
+
+async def test_subscription_is_woken_by_change_to_subscribed_file(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    with ChangeSubscription([watched_file]) as subscription:
+        Timer(0.05, polling_watcher._changed, [watched_file]).start()
+        assert await subscription.wait(5)
+
+
+async def test_subscription_is_woken_by_change_to_parent_directory(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    with ChangeSubscription([watched_file]) as subscription:
+        Timer(0.05, polling_watcher._changed, [watched_file.parent, True]).start()
+        assert await subscription.wait(5)
+
+
+async def test_subscription_ignores_changes_to_other_files(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    with ChangeSubscription([watched_file]) as subscription:
+        polling_watcher._changed(watched_file.with_name("other.json"))
+        assert not await subscription.wait(0.05)
+
+
+async def test_subscription_stops_listening_on_exit(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    with ChangeSubscription([watched_file]):
+        pass
+    assert polling_watcher._listeners == []
+
+
+async def test_subscription_without_watcher_waits_for_poll_interval(
+    watched_file: Path,
+):
+    with ChangeSubscription([watched_file]) as subscription:
+        assert not await asyncio.wait_for(subscription.wait(60), timeout=5)
+
+
+def _parse_event(event: str) -> dict[str, str]:
+    assert event.startswith("event: change\ndata: ")
+    assert event.endswith("\n\n")
+    return json.loads(event.removeprefix("event: change\ndata: "))
+
+
+async def test_change_events_sends_current_etag_then_changes(watched_file: Path):
+    events = _change_events([watched_file], ValidAcceptHeaders.PLAIN_TEXT)
+    first = _parse_event(await anext(events))
+    assert first["file_path"] == str(watched_file)
+    assert first["etag"]
+
+    watched_file.write_text('{"a": 22}')
+    second = _parse_event(await asyncio.wait_for(anext(events), timeout=5))
+    assert second["etag"] and second["etag"] != first["etag"]
+    await events.aclose()
+
+
+async def test_change_events_sends_null_etag_for_missing_file(watched_file: Path):
+    events = _change_events([watched_file], ValidAcceptHeaders.PLAIN_TEXT)
+    await anext(events)
+    watched_file.unlink()
+    event = _parse_event(await asyncio.wait_for(anext(events), timeout=5))
+    assert event["etag"] is None
+
+    watched_file.write_text("{}")
+    event = _parse_event(await asyncio.wait_for(anext(events), timeout=5))
+    assert event["etag"] is not None
+    await events.aclose()
+
+
+async def test_change_events_sends_keepalive_when_nothing_changes(
+    watched_file: Path,
+):
+    events = _change_events([watched_file], ValidAcceptHeaders.PLAIN_TEXT)
+    await anext(events)
+    assert await asyncio.wait_for(anext(events), timeout=5) == ": keepalive\n\n"
+    await events.aclose()
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pytest
+from starlette.datastructures import Headers
+
+from daq_config_server.app._cache import FileFingerprint
+from daq_config_server.app._compression import ContentEncoding
+from daq_config_server.app._http import (
+    encoded_etag,
+    etag_matches,
+    format_last_modified,
+    format_server_timing,
+    is_not_modified,
+    make_etag,
+    modified_since,
+    parse_server_timing,
+)
+
+FINGERPRINT = FileFingerprint(
+    Path("/a"), inode=1, mtime_ns=1_700_000_000_500_000_000, size=10
+)
+ETAG = make_etag(FINGERPRINT, "text/plain")
+
+
+def test_make_etag_is_quoted_and_depends_on_fingerprint_and_variant():
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+    assert make_etag(FINGERPRINT, "text/plain") == ETAG
+    assert make_etag(FINGERPRINT, "application/json") != ETAG
+    assert make_etag(FINGERPRINT._replace(size=11), "text/plain") != ETAG
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        (ETAG, True),
+        (f"W/{ETAG}", True),
+        (f'"other", {ETAG}', True),
+        ('"other"', False),
+    ],
+)
+def test_etag_matches(if_none_match: str | None, expected: bool):
+    assert etag_matches(if_none_match, ETAG) == expected
+
+
+def test_encoded_etag_matches_uncompressed_etag():
+    gzip_etag = encoded_etag(ETAG, ContentEncoding.GZIP)
+    assert gzip_etag != ETAG
+    assert gzip_etag.endswith('-gzip"')
+    assert encoded_etag(ETAG, ContentEncoding.IDENTITY) == ETAG
+    assert etag_matches(ETAG, gzip_etag)
+    assert etag_matches(gzip_etag, ETAG)
+    assert etag_matches(encoded_etag(ETAG, ContentEncoding.ZSTD), gzip_etag)
+    assert not etag_matches('"other-gzip"', gzip_etag)
+
+
+@pytest.mark.parametrize(
+    "if_modified_since, expected",
+    [
+        (None, True),
+        ("not a date", True),
+        ("Tue, 14 Nov 2023 22:13:19 GMT", True),
+        ("Tue, 14 Nov 2023 22:13:20 GMT", False),
+        ("Tue, 14 Nov 2023 22:13:21 GMT", False),
+    ],
+)
+def test_modified_since(if_modified_since: str | None, expected: bool):
+    assert modified_since(if_modified_since, FINGERPRINT) == expected
+
+
+def test_format_last_modified_can_be_compared_with_itself():
+    last_modified = format_last_modified(FINGERPRINT)
+    assert last_modified == "Tue, 14 Nov 2023 22:13:20 GMT"
+    assert not modified_since(last_modified, FINGERPRINT)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    headers = Headers(
+        {
+            "if-none-match": '"other"',
+            "if-modified-since": format_last_modified(FINGERPRINT),
+        }
+    )
+    assert not is_not_modified(headers, ETAG, FINGERPRINT)
+    assert is_not_modified(
+        Headers({"if-modified-since": format_last_modified(FINGERPRINT)}),
+        ETAG,
+        FINGERPRINT,
+    )
+
+
+def test_server_timing_is_formatted_in_milliseconds_and_parsed_back():
+    header = format_server_timing({"read": 0.0015, "convert": 0.25})
+    assert header == "read;dur=1.500, convert;dur=250.000"
+    assert parse_server_timing(header) == {"read": 1.5, "convert": 250.0}
+
+
+def test_parse_server_timing_skips_metrics_without_valid_durations():
+    assert parse_server_timing(
+        'cache;desc="hit", db;dur=x, total;desc="All";dur=3.2'
+    ) == {"total": 3.2}
@@ -0,0 +1,255 @@
+import time
+from collections.abc import Generator
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Event
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from redis import ConnectionError as RedisConnectionError
+
+from daq_config_server.app._cache import FileFingerprint, get_conversion_cache
+from daq_config_server.app._config import (
+    InvalidationBusBackend,
+    InvalidationBusConfig,
+)
+from daq_config_server.app._invalidation import (
+    InMemoryChannel,
+    InMemoryInvalidationBus,
+    InvalidationMessage,
+    RedisInvalidationBus,
+    get_invalidation_bus,
+    init_invalidation_bus,
+    stop_invalidation_bus,
+)
+from daq_config_server.app._watcher import PollingFileWatcher
+
+EVENT_TIMEOUT_S = 5
+
+
+class FakePubSub:
+    def __init__(self, server: "FakeRedis"):
+        self._server = server
+        self.messages: Queue[dict[str, Any]] = Queue()
+        self.failures = 0
+
+    def subscribe(self, *args: Any) -> Any:
+        self._server.subscribers.append(self)
+
+    def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float = 0.0
+    ) -> dict[str, Any] | None:
+        if self.failures:
+            self.failures -= 1
+            raise RedisConnectionError("Connection reset")
+        try:
+            return self.messages.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self) -> None:
+        pass
+
+
+class FakeRedis:
+    """In-process stand-in for the Redis server shared by every worker"""
+
+    def __init__(self):
+        self.subscribers: list[FakePubSub] = []
+
+    def publish(self, channel: str, message: str) -> Any:
+        for subscriber in self.subscribers:
+            subscriber.messages.put(
+                {"type": "message", "channel": channel, "data": message}
+            )
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    def close(self) -> None:
+        pass
+
+
+def _listen(bus: InMemoryInvalidationBus | RedisInvalidationBus) -> "Queue[Path]":
+    changes: Queue[Path] = Queue()
+    bus.add_listener(changes.put)
+    return changes
+
+
+@pytest.fixture
+def channel() -> InMemoryChannel:
+    return InMemoryChannel()
+
+
+@pytest.fixture
+def other_worker(
+    channel: InMemoryChannel,
+) -> Generator[InMemoryInvalidationBus, None, None]:
+    bus = InMemoryInvalidationBus(channel)
+    bus.start()
+    yield bus
+    bus.stop()
+
+
+def test_change_is_delivered_to_other_workers_only(
+    channel: InMemoryChannel, other_worker: InMemoryInvalidationBus
+):
+    bus = InMemoryInvalidationBus(channel)
+    bus.start()
+    changes, other_changes = _listen(bus), _listen(other_worker)
+    bus.publish(Path("/a"))
+
+    assert other_changes.get_nowait() == Path("/a")
+    assert changes.empty()
+    assert bus.stats().published == 1
+    stats = other_worker.stats()
+    assert stats.received == 1
+    assert 0 <= stats.max_latency_s == stats.mean_latency_s < EVENT_TIMEOUT_S
+
+
+def test_received_change_is_not_published_again(
+    channel: InMemoryChannel, other_worker: InMemoryInvalidationBus
+):
+    bus = InMemoryInvalidationBus(channel)
+    bus.add_listener(bus.publish)
+    bus.start()
+    other_worker.publish(Path("/a"))
+    assert bus.stats().published == 0
+    assert other_worker.stats().received == 0
+
+
+def test_latency_is_measured_from_when_change_was_sent(
+    other_worker: InMemoryInvalidationBus,
+):
+    with patch("daq_config_server.app._invalidation.time.time", return_value=12.5):
+        other_worker.receive(
+            InvalidationMessage(path=Path("/a"), origin="other", sent_at=10.0)
+        )
+    assert other_worker.stats().max_latency_s == 2.5
+
+
+def test_invalidation_bus_is_disabled_by_default():
+    init_invalidation_bus(InvalidationBusConfig())
+    assert get_invalidation_bus() is None
+
+
+def test_watched_changes_are_shared_with_other_workers(
+    channel: InMemoryChannel,
+    other_worker: InMemoryInvalidationBus,
+    polling_watcher: PollingFileWatcher,
+    tmp_path: Path,
+):
+    init_invalidation_bus(
+        InvalidationBusConfig(enabled=True), bus=InMemoryInvalidationBus(channel)
+    )
+    try:
+        other_changes = _listen(other_worker)
+        seen_here, seen_elsewhere = tmp_path / "here.json", tmp_path / "elsewhere"
+        polling_watcher.changed(seen_here)
+        assert other_changes.get_nowait() == seen_here
+
+        file_path = seen_elsewhere / "settings.json"
+        file_path.parent.mkdir()
+        file_path.write_text("{}")
+        fingerprint = FileFingerprint.from_stat(
+            file_path, polling_watcher.stat(file_path)
+        )
+        get_conversion_cache().put(file_path, fingerprint, {})
+        other_worker.publish(seen_elsewhere)
+        assert polling_watcher.watched_paths() == set()
+        assert len(get_conversion_cache()) == 0
+
+        bus = get_invalidation_bus()
+        assert bus and bus.stats().published == 1
+    finally:
+        stop_invalidation_bus()
+    assert get_invalidation_bus() is None
+
+
+def test_redis_bus_shares_changes_between_workers():
+    server = FakeRedis()
+    bus = RedisInvalidationBus(server, "invalidate")
+    other_worker = RedisInvalidationBus(server, "invalidate")
+    other_changes = _listen(other_worker)
+    for b in (bus, other_worker):
+        b.start()
+    try:
+        while len(server.subscribers) < 2:
+            pass
+        bus.publish(Path("/a"))
+        assert other_changes.get(timeout=EVENT_TIMEOUT_S) == Path("/a")
+    finally:
+        for b in (bus, other_worker):
+            b.stop()
+
+
+def test_redis_bus_ignores_invalid_messages_and_survives_lost_connection():
+    server = FakeRedis()
+    bus = RedisInvalidationBus(server, "invalidate")
+    changes = _listen(bus)
+    bus.start()
+    try:
+        while not server.subscribers:
+            pass
+        pubsub = server.subscribers[0]
+        pubsub.failures = 1
+        server.publish("invalidate", "not json")
+        server.publish(
+            "invalidate",
+            InvalidationMessage(
+                path=Path("/a"), origin="other", sent_at=0
+            ).model_dump_json(),
+        )
+        assert changes.get(timeout=EVENT_TIMEOUT_S) == Path("/a")
+        assert bus.stats().received == 1
+    finally:
+        bus.stop()
+
+
+class HangingRedis(FakeRedis):
+    """A Redis server which stops responding, as during a network partition"""
+
+    def __init__(self):
+        super().__init__()
+        self.responding = Event()
+
+    def publish(self, channel: str, message: str) -> Any:
+        assert self.responding.wait(EVENT_TIMEOUT_S)
+        super().publish(channel, message)
+
+
+def test_redis_bus_publishes_without_waiting_for_redis():
+    server = HangingRedis()
+    bus = RedisInvalidationBus(server, "invalidate")
+    other_worker = RedisInvalidationBus(server, "invalidate")
+    other_changes = _listen(other_worker)
+    for b in (bus, other_worker):
+        b.start()
+    try:
+        while len(server.subscribers) < 2:
+            pass
+        start = time.monotonic()
+        bus.publish(Path("/a"))
+        assert time.monotonic() - start < 0.5
+        assert other_changes.empty()
+
+        server.responding.set()
+        assert other_changes.get(timeout=EVENT_TIMEOUT_S) == Path("/a")
+    finally:
+        server.responding.set()
+        for b in (bus, other_worker):
+            b.stop()
+
+
+def test_redis_bus_connects_with_socket_timeouts():
+    config = InvalidationBusConfig(
+        enabled=True, backend=InvalidationBusBackend.REDIS, socket_timeout_s=0.2
+    )
+    with patch("daq_config_server.app._invalidation.from_url") as mock_from_url:
+        mock_from_url.return_value = FakeRedis()
+        init_invalidation_bus(config)
+        stop_invalidation_bus()
+    mock_from_url.assert_called_once_with(
+        config.url, socket_timeout=0.2, socket_connect_timeout=0.2
+    )
@@ -0,0 +1,31 @@
+import json
+import math
+
+from fastapi.responses import JSONResponse
+
+from daq_config_server.app._json import dump_json
+from daq_config_server.models.lookup_tables import GenericLookupTable
+
+
+def test_dump_json_on_model_matches_json_response_of_model_dump():
+    model = GenericLookupTable(
+        column_names=["energy_eV", "gap"], rows=[[1, 2.5], [2, 3.5]]
+    )
+    assert dump_json(model) == JSONResponse(model.model_dump()).body
+
+
+def test_dump_json_on_dict_matches_json_response():
+    contents = {"a": [1, 2.5, "three"], "nested": {"b": None, "c": True}}
+    assert dump_json(contents) == JSONResponse(contents).body
+
+
+def test_dump_json_serializes_non_utf8_ascii_text_unescaped():
+    assert json.loads(dump_json({"unit": "µm"})) == {"unit": "µm"}
+    assert "µm".encode() in dump_json({"unit": "µm"})
+
+
+def test_dump_json_gives_null_for_non_finite_floats():
+    assert json.loads(dump_json({"a": math.nan, "b": math.inf})) == {
+        "a": None,
+        "b": None,
+    }
@@ -1,27 +1,162 @@
+import json
 import logging
+from collections.abc import Generator
+from threading import Event
+from typing import Any
 from unittest.mock import MagicMock, patch
 
 import pytest
+from graypy import GELFTCPHandler
 
-from daq_config_server.app._log import GraylogConfig, LoggingConfig, set_up_logging
+from daq_config_server.app._log import (
+    AccessLogConfig,
+    BatchingGELFHandler,
+    GraylogConfig,
+    LoggingConfig,
+    init_access_log,
+    set_up_logging,
+    should_log_access,
+)
+
+EVENT_TIMEOUT_S = 5
 
 
 @pytest.fixture
-def mock_graylog_emit():
-    with patch("daq_config_server.app._log.GELFTCPHandler.emit") as graylog_emit:
-        yield graylog_emit
+def mock_graylog_send():
+    with patch("daq_config_server.app._log.GELFTCPHandler.send") as graylog_send:
+        yield graylog_send
 
 
-def test_default_logger_does_not_emit_to_graylog(mock_graylog_emit: MagicMock):
+@pytest.fixture
+def root_logger() -> Generator[logging.Logger, None, None]:
     logger = logging.getLogger()
-    mock_graylog_emit.assert_not_called()
-    logger.info("FOO")
-    mock_graylog_emit.assert_not_called()
+    handlers = list(logger.handlers)
+    yield logger
+    for handler in logger.handlers:
+        if handler not in handlers:
+            logger.removeHandler(handler)
+            handler.close()
 
 
-def test_graylog_logger_does_emit_to_graylog(mock_graylog_emit: MagicMock):
-    set_up_logging(LoggingConfig(graylog=GraylogConfig(enabled=True)))
+class BlockingSend:
+    """Stands in for sending to Graylog, blocking until unblocked"""
+
+    def __init__(self):
+        self.started = Event()
+        self.unblocked = Event()
+        self.sent: list[bytes] = []
+
+    def __call__(self, data: bytes) -> Any:
+        self.started.set()
+        assert self.unblocked.wait(EVENT_TIMEOUT_S)
+        self.sent.append(data)
+
+
+@pytest.fixture
+def send() -> Generator[BlockingSend, None, None]:
+    send = BlockingSend()
+    with patch("daq_config_server.app._log.GELFTCPHandler.send", new=send):
+        yield send
+
+
+def _record(level: int, msg: str) -> logging.LogRecord:
+    return logging.makeLogRecord({"levelno": level, "msg": msg})
+
+
+def _make_handler(queue_size: int = 100) -> BatchingGELFHandler:
+    return BatchingGELFHandler(
+        GELFTCPHandler("localhost", 5555), queue_size, batch_size=100
+    )
+
+
+def test_default_logger_does_not_emit_to_graylog(mock_graylog_send: MagicMock):
     logger = logging.getLogger()
-    mock_graylog_emit.assert_not_called()
+    mock_graylog_send.assert_not_called()
     logger.info("FOO")
-    mock_graylog_emit.assert_called_once()
+    mock_graylog_send.assert_not_called()
+
+
+def test_graylog_logger_does_emit_to_graylog(
+    mock_graylog_send: MagicMock, root_logger: logging.Logger
+):
+    set_up_logging(LoggingConfig(graylog=GraylogConfig(enabled=True)))
+    mock_graylog_send.assert_not_called()
+    root_logger.info("FOO")
+    for handler in root_logger.handlers:
+        if isinstance(handler, BatchingGELFHandler):
+            handler.close()
+    mock_graylog_send.assert_called_once()
+    (data,) = mock_graylog_send.call_args.args
+    assert b"FOO" in data and data.endswith(b"\x00")
+
+
+def test_records_logged_while_sending_are_sent_in_one_batch(send: BlockingSend):
+    handler = _make_handler()
+    handler.handle(_record(logging.INFO, "first"))
+    assert send.started.wait(EVENT_TIMEOUT_S)
+    for i in range(5):
+        handler.handle(_record(logging.INFO, f"queued {i}"))
+    send.unblocked.set()
+    handler.close()
+
+    assert len(send.sent) == 2
+    assert send.sent[1].count(b"\x00") == 5
+
+
+def test_records_are_dropped_rather_than_blocking_when_graylog_is_slow(
+    send: BlockingSend,
+):
+    handler = _make_handler(queue_size=4)
+    handler.handle(_record(logging.INFO, "first"))
+    assert send.started.wait(EVENT_TIMEOUT_S)
+    for i in range(4):
+        handler.handle(_record(logging.INFO, f"info {i}"))
+    for i in range(2):
+        handler.handle(_record(logging.ERROR, f"error {i}"))
+    # Once the queue is mostly full only warnings and errors are kept, and once it
+    # is full nothing is
+    assert handler.dropped == 2
+    send.unblocked.set()
+    handler.close()
+
+    batch = b"".join(send.sent[1:])
+    assert b"info 2" in batch and b"info 3" not in batch
+    assert b"error 0" in batch and b"error 1" not in batch
+    assert b"Dropped 2 log records" in batch
+
+
+def test_access_log_is_sampled_at_configured_rate():
+    try:
+        init_access_log(LoggingConfig(access_log=AccessLogConfig(sample_rate=0.25)))
+        with patch("daq_config_server.app._log.random.random", return_value=0.2):
+            assert should_log_access()
+        with patch("daq_config_server.app._log.random.random", return_value=0.3):
+            assert not should_log_access()
+    finally:
+        init_access_log(LoggingConfig())
+    assert should_log_access()
+
+
+def test_exception_traceback_is_sent_as_full_message(send: BlockingSend):
+    handler = _make_handler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("test_exception_traceback")
+    logger.addHandler(handler)
+    # Keep the exception queued until after its arguments have changed
+    handler.handle(_record(logging.INFO, "first"))
+    assert send.started.wait(EVENT_TIMEOUT_S)
+    args = ["before"]
+    try:
+        raise ValueError("Bad value")
+    except ValueError:
+        logger.exception("Failed with %s", args)
+    finally:
+        logger.removeHandler(handler)
+    args[0] = "after"
+    send.unblocked.set()
+    handler.close()
+
+    message = json.loads(send.sent[-1].rstrip(b"\x00"))
+    assert message["short_message"].startswith("Failed with ['before']")
+    assert "Traceback" in message["full_message"]
+    assert "ValueError: Bad value" in message["full_message"]
@@ -0,0 +1,199 @@
+import os
+import subprocess
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from daq_config_server.app._metrics import (
+    MULTIPROCESS_DIR_ENV,
+    prepare_multiprocess_dir,
+    render_metrics,
+)
+from daq_config_server.app._routes import (
+    ENDPOINTS,
+    ValidAcceptHeaders,
+    get_converted_file_contents,
+)
+from daq_config_server.app._whitelist import get_whitelist
+from daq_config_server.app.api import app
+from tests.constants import TestDataPaths
+
+
+def _sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def mock_app():
+    return TestClient(app)
+
+
+def test_requests_are_recorded_by_route_template(mock_app: TestClient):
+    labels = {
+        "method": "GET",
+        "route": ENDPOINTS.CONFIG + "/{file_path:path}",
+        "status": "200",
+        "accept": ValidAcceptHeaders.JSON,
+    }
+    requests_before = _sample(
+        "daq_config_server_request_duration_seconds_count", **labels
+    )
+    bytes_before = _sample("daq_config_server_response_size_bytes_sum", **labels)
+
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}",
+        headers={"Accept": ValidAcceptHeaders.JSON, "Accept-Encoding": "identity"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    assert (
+        _sample("daq_config_server_request_duration_seconds_count", **labels)
+        == requests_before + 1
+    )
+    assert _sample("daq_config_server_response_size_bytes_sum", **labels) == (
+        bytes_before + len(response.content)
+    )
+
+
+def test_unknown_accept_headers_and_paths_share_one_time_series(
+    mock_app: TestClient,
+):
+    labels = {"method": "GET", "route": "unmatched", "status": "404"}
+    before = _sample(
+        "daq_config_server_request_duration_seconds_count", **labels, accept="other"
+    )
+    mock_app.get("/no/such/route/1", headers={"Accept": "text/html"})
+    mock_app.get("/no/such/route/2")
+    assert (
+        _sample(
+            "daq_config_server_request_duration_seconds_count",
+            **labels,
+            accept="other",
+        )
+        == before + 2
+    )
+
+
+def test_metrics_endpoint_serves_prometheus_text(mock_app: TestClient):
+    mock_app.get(ENDPOINTS.HEALTH)
+    response = mock_app.get(ENDPOINTS.METRICS)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    names = {family.name for family in text_string_to_metric_families(response.text)}
+    assert {
+        "daq_config_server_request_duration_seconds",
+        "daq_config_server_response_size_bytes",
+        "daq_config_server_cache_lookups",
+    } <= names
+
+
+def test_conversion_duration_is_recorded_per_converter_and_outcome(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    def failing_converter(contents: str) -> Any:
+        raise ValueError("Bad contents")
+
+    mock_file_converter_map[str(TestDataPaths.TEST_GOOD_JSON_PATH)] = failing_converter
+    name = "daq_config_server_conversion_duration_seconds_count"
+    successes_before = _sample(
+        name, converter="parse", executor="thread", outcome="success"
+    )
+    errors_before = _sample(
+        name,
+        converter=failing_converter.__qualname__,
+        executor="thread",
+        outcome="error",
+    )
+
+    get_converted_file_contents(TestDataPaths.TEST_GOOD_XML_PATH)
+    with pytest.raises(Exception, match="Bad contents"):
+        get_converted_file_contents(TestDataPaths.TEST_GOOD_JSON_PATH)
+
+    assert (
+        _sample(name, converter="parse", executor="thread", outcome="success")
+        == successes_before + 1
+    )
+    assert (
+        _sample(
+            name,
+            converter=failing_converter.__qualname__,
+            executor="thread",
+            outcome="error",
+        )
+        == errors_before + 1
+    )
+
+
+def test_cache_hits_and_misses_are_counted(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    name = "daq_config_server_cache_lookups_total"
+    hits_before = _sample(name, cache="conversion", result="hit")
+    misses_before = _sample(name, cache="conversion", result="miss")
+    for _ in range(3):
+        get_converted_file_contents(TestDataPaths.TEST_GOOD_XML_PATH)
+    assert _sample(name, cache="conversion", result="hit") == hits_before + 2
+    assert _sample(name, cache="conversion", result="miss") == misses_before + 1
+
+
+def test_whitelist_reload_duration_is_recorded():
+    name = "daq_config_server_whitelist_reload_duration_seconds_count"
+    before = _sample(name, outcome="success")
+    get_whitelist()._fetch_and_update()
+    assert _sample(name, outcome="success") == before + 1
+
+
+def test_metrics_are_summed_over_workers_in_multiprocess_mode(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    record_hits = (
+        "from daq_config_server.app._metrics import CACHE_LOOKUPS; "
+        "CACHE_LOOKUPS.labels('conversion', 'hit').inc(3)"
+    )
+    env = {**os.environ, MULTIPROCESS_DIR_ENV: str(tmp_path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", record_hits], env=env, check=True)
+
+    monkeypatch.setenv(MULTIPROCESS_DIR_ENV, str(tmp_path))
+    body, _ = render_metrics()
+    samples = {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(body.decode())
+        for sample in family.samples
+    }
+    key = (
+        "daq_config_server_cache_lookups_total",
+        (("cache", "conversion"), ("result", "hit")),
+    )
+    assert samples[key] == 6
+
+
+def test_prepare_multiprocess_dir_removes_metrics_of_previous_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv(MULTIPROCESS_DIR_ENV, "")
+    monkeypatch.delenv(MULTIPROCESS_DIR_ENV)
+    metrics_dir = tmp_path / "metrics"
+    metrics_dir.mkdir()
+    (metrics_dir / "counter_1234.db").write_bytes(b"stale")
+
+    prepare_multiprocess_dir(str(metrics_dir))
+
+    assert os.environ[MULTIPROCESS_DIR_ENV] == str(metrics_dir)
+    assert list(metrics_dir.iterdir()) == []
+
+
+def test_prepare_multiprocess_dir_prefers_directory_from_environment(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv(MULTIPROCESS_DIR_ENV, str(tmp_path / "from_env"))
+    prepare_multiprocess_dir(str(tmp_path / "default"))
+    assert (tmp_path / "from_env").is_dir()
+    assert not (tmp_path / "default").exists()
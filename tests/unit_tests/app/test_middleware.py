@@ -0,0 +1,126 @@
+import logging
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from daq_config_server.app._log import (
+    AccessLogConfig,
+    LoggingConfig,
+    RequestIdFilter,
+    init_access_log,
+)
+from daq_config_server.app._middleware import (
+    MAX_LOGGED_BODY_SIZE,
+    REQUEST_ID_HEADER,
+    AccessLogMiddleware,
+    RequestIdMiddleware,
+)
+
+LOGGER = logging.getLogger("test_middleware")
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records() -> Generator[list[logging.LogRecord], None, None]:
+    handler = RecordingHandler()
+    handler.addFilter(RequestIdFilter())
+    loggers = [logging.getLogger("daq_config_server.app._middleware"), LOGGER]
+    for logger in loggers:
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+    yield handler.records
+    for logger in loggers:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+    init_access_log(LoggingConfig())
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.post("/echo")
+    async def echo(request: Request) -> Any:  # type: ignore
+        LOGGER.info("Handling request")
+        return await request.json()
+
+    @app.get("/stream")
+    def stream():  # type: ignore
+        return StreamingResponse(iter([b"a", b"b", b"c"]))
+
+    return TestClient(app)
+
+
+def test_request_id_is_generated_and_added_to_records_and_response(
+    client: TestClient, records: list[logging.LogRecord]
+):
+    response = client.post("/echo", json={"a": 1})
+    assert response.json() == {"a": 1}
+    request_id = response.headers[REQUEST_ID_HEADER]
+    assert len(request_id) == 32
+    assert [record.request_id for record in records] == [request_id, request_id]  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "sent_id, is_used",
+    [("abc-123.def:4", True), ("a" * 129, False), ("bad\tid", False)],
+)
+def test_valid_request_id_from_client_is_used(
+    client: TestClient, sent_id: str, is_used: bool
+):
+    response = client.post("/echo", json={}, headers={REQUEST_ID_HEADER: sent_id})
+    assert (response.headers[REQUEST_ID_HEADER] == sent_id) == is_used
+
+
+def test_access_log_has_method_url_body_status_and_duration(
+    client: TestClient, records: list[logging.LogRecord]
+):
+    client.post("/echo", json={"a": 1})
+    message = records[-1].getMessage()
+    assert message.startswith(
+        "method: POST url: http://testserver/echo body: b'{\"a\":1}' status: 200 "
+        "duration: "
+    )
+    assert message.endswith(" ms")
+
+
+def test_access_log_body_is_truncated(
+    client: TestClient, records: list[logging.LogRecord]
+):
+    client.post("/echo", json="x" * (2 * MAX_LOGGED_BODY_SIZE))
+    assert records[-1].args
+    assert len(records[-1].args[2]) == MAX_LOGGED_BODY_SIZE  # type: ignore
+
+
+def test_streamed_responses_pass_through(
+    client: TestClient, records: list[logging.LogRecord]
+):
+    response = client.get("/stream")
+    assert response.content == b"abc"
+    assert REQUEST_ID_HEADER in response.headers
+    assert "status: 200" in records[-1].getMessage()
+
+
+def test_access_log_is_skipped_when_not_sampled_or_debug_is_off(
+    client: TestClient, records: list[logging.LogRecord]
+):
+    init_access_log(LoggingConfig(access_log=AccessLogConfig(sample_rate=0)))
+    client.post("/echo", json={})
+    init_access_log(LoggingConfig())
+    logging.getLogger("daq_config_server.app._middleware").setLevel(logging.INFO)
+    client.post("/echo", json={})
+    assert [record.getMessage() for record in records] == ["Handling request"] * 2
@@ -0,0 +1,42 @@
+from collections.abc import Generator
+
+import pytest
+
+from daq_config_server.app._readiness import (
+    WarmupStatus,
+    clear_readiness,
+    get_warmup_status,
+    init_readiness,
+    is_ready,
+    set_warmup_status,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_readiness() -> Generator[None, None, None]:
+    yield
+    clear_readiness()
+
+
+def test_not_ready_until_config_is_loaded():
+    clear_readiness()
+    assert not is_ready()
+    init_readiness(warmup_enabled=False)
+    assert is_ready()
+    assert get_warmup_status() is None
+
+
+def test_not_ready_until_warmup_finishes():
+    init_readiness(warmup_enabled=True)
+    assert not is_ready()
+    status = WarmupStatus(total=2)
+    set_warmup_status(status)
+    assert not is_ready()
+    status.warmed, status.failed, status.duration_s = 1, 1, 0.5
+    assert is_ready()
+
+
+def test_not_ready_while_shutting_down():
+    init_readiness(warmup_enabled=False)
+    clear_readiness()
+    assert not is_ready()
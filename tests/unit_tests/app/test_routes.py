@@ -1,6 +1,9 @@
+import base64
 import json
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Generator, Mapping
 from pathlib import Path
+from threading import Timer
 from typing import Any
 from unittest.mock import MagicMock, patch
 
@@ -10,12 +13,40 @@ from fastapi import status
 from fastapi.responses import JSONResponse, Response
 from fastapi.testclient import TestClient
 
+from daq_config_server.app._cache import (
+    FileFingerprint,
+    get_negative_cache,
+    get_response_body_cache,
+    init_cache,
+)
+from daq_config_server.app._compression import compress
+from daq_config_server.app._config import (
+    CacheConfig,
+    ConverterConfig,
+    EventsConfig,
+    ServerTimingConfig,
+)
+from daq_config_server.app._events import init_events
+from daq_config_server.app._readiness import (
+    WarmupStatus,
+    clear_readiness,
+    init_readiness,
+    set_warmup_status,
+)
 from daq_config_server.app._routes import (
     ENDPOINTS,
+    MAX_BATCH_ITEMS,
     ConverterParseError,
+    ConverterTimeoutError,
     ValidAcceptHeaders,
+    _encode_response,
+    file_is_valid_utf8,
     get_converted_file_contents,
+    get_converted_file_json,
 )
+from daq_config_server.app._timing import init_server_timing
+from daq_config_server.app._watcher import PollingFileWatcher
+from daq_config_server.app._whitelist import get_whitelist
 from daq_config_server.app.api import app
 from daq_config_server.models.beamline_parameters import beamline_parameters_to_dict
 from daq_config_server.models.lookup_tables import GenericLookupTable
@@ -47,6 +78,32 @@ def test_get_converted_file_contents_converts_pydantic_model_to_dict(
     mock_convert_function.assert_called_once()
 
 
+def test_get_converted_file_json_matches_converted_file_contents(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    file_to_convert = TestDataPaths.TEST_GOOD_LUT_PATH
+    model = GenericLookupTable(
+        column_names=["column1", "column2"], rows=[[1, 2.5], [2, 3.5]]
+    )
+    mock_file_converter_map[str(file_to_convert)] = MagicMock(return_value=model)
+    assert json.loads(
+        get_converted_file_json(file_to_convert)
+    ) == get_converted_file_contents(file_to_convert)
+
+
+def test_get_converted_file_json_does_not_build_a_dict_from_models(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    file_to_convert = TestDataPaths.TEST_GOOD_LUT_PATH
+    model = GenericLookupTable(column_names=["column1"], rows=[[1]])
+    mock_file_converter_map[str(file_to_convert)] = MagicMock(return_value=model)
+    with patch.object(
+        GenericLookupTable, "model_dump", side_effect=AssertionError
+    ) as mock_model_dump:
+        get_converted_file_json(file_to_convert)
+    mock_model_dump.assert_not_called()
+
+
 def test_error_is_raised_if_file_cant_be_parsed(
     mock_file_converter_map: dict[str, Callable[[str], Any]],
 ):
@@ -56,6 +113,111 @@ def test_error_is_raised_if_file_cant_be_parsed(
         get_converted_file_contents(file_to_convert)
 
 
+def _slow_converter(delay_s: float) -> MagicMock:
+    def convert(_: str) -> dict[str, Any]:
+        time.sleep(delay_s)
+        return {}
+
+    return MagicMock(side_effect=convert)
+
+
+def test_failed_conversion_is_not_retried_until_file_changes(
+    mock_file_converter_map: dict[str, Callable[[str], Any]], tmp_path: Path
+):
+    file_path = tmp_path / "beamlineParameters"
+    file_path.write_text(TestDataPaths.TEST_BAD_BEAMLINE_PARAMETERS_PATH.read_text())
+    converter = MagicMock(side_effect=beamline_parameters_to_dict)
+    mock_file_converter_map[str(file_path)] = converter
+    fingerprint = FileFingerprint.from_path(file_path)
+
+    for _ in range(2):
+        with pytest.raises(ConverterParseError):
+            get_converted_file_contents(file_path, fingerprint)
+    converter.assert_called_once()
+
+    fixed = fingerprint._replace(mtime_ns=fingerprint.mtime_ns + 1)
+    converter.side_effect = None
+    converter.return_value = {"fixed": True}
+    assert get_converted_file_contents(file_path, fixed) == {"fixed": True}
+
+
+def test_failed_conversion_is_retried_once_failure_expires(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    file_path = TestDataPaths.TEST_BAD_BEAMLINE_PARAMETERS_PATH
+    converter = MagicMock(side_effect=beamline_parameters_to_dict)
+    mock_file_converter_map[str(file_path)] = converter
+    converter_config = ConverterConfig(failure_ttl_s=0)
+
+    with patch(
+        "daq_config_server.app._routes.get_converter_config",
+        return_value=converter_config,
+    ):
+        for _ in range(2):
+            with pytest.raises(ConverterParseError):
+                get_converted_file_contents(file_path)
+    assert converter.call_count == 2
+
+
+def test_slow_conversion_times_out_and_is_not_retried(
+    mock_file_converter_map: dict[str, Callable[[str], Any]], tmp_path: Path
+):
+    file_path = tmp_path / "huge.xml"
+    file_path.write_text("<a>1</a>")
+    converter = _slow_converter(delay_s=1)
+    mock_file_converter_map[str(file_path)] = converter
+
+    with patch(
+        "daq_config_server.app._file_converter_map._converter_timeouts",
+        {file_path: 0.01},
+    ):
+        start = time.monotonic()
+        for _ in range(2):
+            with pytest.raises(ConverterParseError, match="within 0.01s"):
+                get_converted_file_contents(file_path)
+        assert time.monotonic() - start < 1
+    converter.assert_called_once()
+
+
+def test_timed_out_conversion_is_remembered_for_shorter_time(
+    mock_file_converter_map: dict[str, Callable[[str], Any]], tmp_path: Path
+):
+    file_path = tmp_path / "huge.xml"
+    file_path.write_text("<a>1</a>")
+    converter = _slow_converter(delay_s=0.1)
+    mock_file_converter_map[str(file_path)] = converter
+    converter_config = ConverterConfig(failure_ttl_s=300, timeout_failure_ttl_s=0)
+
+    with (
+        patch(
+            "daq_config_server.app._file_converter_map._converter_timeouts",
+            {file_path: 0.01},
+        ),
+        patch(
+            "daq_config_server.app._routes.get_converter_config",
+            return_value=converter_config,
+        ),
+    ):
+        for _ in range(2):
+            with pytest.raises(ConverterTimeoutError):
+                get_converted_file_contents(file_path)
+    assert converter.call_count == 2
+
+
+def test_conversion_within_timeout_succeeds(
+    mock_file_converter_map: dict[str, Callable[[str], Any]], tmp_path: Path
+):
+    file_path = tmp_path / "small.xml"
+    file_path.write_text("<a>1</a>")
+    mock_file_converter_map[str(file_path)] = _slow_converter(delay_s=0)
+
+    with patch(
+        "daq_config_server.app._file_converter_map._converter_timeouts",
+        {file_path: 5},
+    ):
+        assert get_converted_file_contents(file_path) == {}
+
+
 def test_xml_to_dict_gives_expected_result_and_can_be_jsonified():
     with open(TestDataPaths.TEST_GOOD_XML_PATH) as f:
         contents = f.read()
@@ -216,7 +378,751 @@ def test_validate_path_against_whitelist_on_file_in_invalid_dir(mock_app: TestCl
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+def test_missing_file_is_remembered_until_it_is_created(
+    mock_app: TestClient, tmp_path: Path
+):
+    file_path = tmp_path / "missing.txt"
+    endpoint = f"{ENDPOINTS.CONFIG}/{file_path}"
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        assert mock_app.get(endpoint).status_code == status.HTTP_404_NOT_FOUND
+        with patch("daq_config_server.app._routes.stat_file") as mock_stat:
+            response = mock_app.get(endpoint)
+            mock_stat.assert_not_called()
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == f"File {file_path} cannot be found"
+
+        file_path.write_text("found")
+        assert mock_app.get(endpoint).status_code == status.HTTP_404_NOT_FOUND
+        get_negative_cache().invalidate(tmp_path, recursive=True)
+        assert mock_app.get(endpoint).text == "found"
+
+
+def test_forbidden_file_is_remembered_until_whitelist_is_reloaded(
+    mock_app: TestClient,
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_FILE_NOT_ON_WHITELIST_PATH}"
+    assert mock_app.get(endpoint).status_code == status.HTTP_403_FORBIDDEN
+    with patch("daq_config_server.app._routes.path_is_whitelisted") as mock_check:
+        assert mock_app.get(endpoint).status_code == status.HTTP_403_FORBIDDEN
+        mock_check.assert_not_called()
+
+        get_whitelist()._fetch_and_update()
+        mock_app.get(endpoint)
+        mock_check.assert_called_once()
+
+
+def test_missing_file_is_not_remembered_if_disabled(
+    mock_app: TestClient, tmp_path: Path
+):
+    init_cache(CacheConfig(negative_ttl_s=0))
+    file_path = tmp_path / "missing.txt"
+    endpoint = f"{ENDPOINTS.CONFIG}/{file_path}"
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        assert mock_app.get(endpoint).status_code == status.HTTP_404_NOT_FOUND
+        file_path.write_text("found")
+        assert mock_app.get(endpoint).status_code == status.HTTP_200_OK
+
+
 def test_validate_path_against_whitelist_on_file_in_valid_dir(mock_app: TestClient):
     file_path = TestDataPaths.TEST_FILE_IN_GOOD_DIR
     response = mock_app.get(f"{ENDPOINTS.CONFIG}/{file_path}")
     assert response.status_code == status.HTTP_200_OK
+
+
+def test_get_converted_file_contents_reuses_result_while_file_unchanged(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+):
+    file_to_convert = TestDataPaths.TEST_GOOD_XML_PATH
+    mock_convert_function = MagicMock(return_value={"a": 1})
+    mock_file_converter_map[str(file_to_convert)] = mock_convert_function
+    first = get_converted_file_contents(file_to_convert)
+    second = get_converted_file_contents(file_to_convert)
+
+    assert first == second == {"a": 1}
+    mock_convert_function.assert_called_once()
+
+
+def test_get_converted_file_contents_reconverts_when_file_changes(
+    mock_file_converter_map: dict[str, Callable[[str], Any]], tmp_path: Path
+):
+    file_to_convert = tmp_path / "test.json"
+    file_to_convert.write_text('{"a": 1}')
+    assert get_converted_file_contents(file_to_convert) == {"a": 1}
+
+    file_to_convert.write_text('{"a": 22}')
+    assert get_converted_file_contents(file_to_convert) == {"a": 22}
+
+
+def test_get_configuration_returns_etag_which_varies_by_accept_type(
+    mock_app: TestClient,
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}"
+    etags = {
+        mock_app.get(endpoint, headers={"Accept": accept}).headers["etag"]
+        for accept in ValidAcceptHeaders
+    }
+    assert len(etags) == len(ValidAcceptHeaders)
+
+
+@pytest.mark.parametrize("accept", list(ValidAcceptHeaders))
+def test_get_configuration_returns_304_when_etag_matches(
+    mock_app: TestClient, accept: ValidAcceptHeaders
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}"
+    etag = mock_app.get(endpoint, headers={"Accept": accept}).headers["etag"]
+    response = mock_app.get(
+        endpoint, headers={"Accept": accept, "If-None-Match": f'"other", {etag}'}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+@patch("daq_config_server.app._routes.path_is_whitelisted")
+def test_get_configuration_etag_changes_when_file_changes(
+    mock_validate: MagicMock, mock_app: TestClient, tmp_path: Path
+):
+    file_path = tmp_path / "test.json"
+    file_path.write_text('{"a": 1}')
+    endpoint = f"{ENDPOINTS.CONFIG}/{file_path}"
+    etag = mock_app.get(endpoint, headers=ACCEPT_HEADER_DEFAULT).headers["etag"]
+
+    file_path.write_text('{"a": 22}')
+    response = mock_app.get(
+        endpoint, headers={**ACCEPT_HEADER_DEFAULT, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.text == '{"a": 22}'
+
+
+@pytest.mark.parametrize("accept", list(ValidAcceptHeaders))
+def test_get_configuration_returns_304_when_not_modified_since(
+    mock_app: TestClient, accept: ValidAcceptHeaders
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}"
+    last_modified = mock_app.get(endpoint, headers={"Accept": accept}).headers[
+        "last-modified"
+    ]
+    response = mock_app.get(
+        endpoint, headers={"Accept": accept, "If-Modified-Since": last_modified}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_get_configuration_returns_file_if_modified_since(mock_app: TestClient):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}",
+        headers={
+            **ACCEPT_HEADER_DEFAULT,
+            "If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_get_configuration_on_plain_text_file_sets_utf_8_charset(
+    mock_app: TestClient,
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH}",
+        headers=ACCEPT_HEADER_DEFAULT,
+    )
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+
+
+@pytest.mark.parametrize("accept", [ValidAcceptHeaders.PLAIN_TEXT, "*/*"])
+@patch("daq_config_server.app._routes.path_is_whitelisted")
+def test_get_configuration_streams_large_files(
+    mock_validate: MagicMock, mock_app: TestClient, tmp_path: Path, accept: str
+):
+    file_path = tmp_path / "large.txt"
+    contents = b"0123456789abcdef\n" * 100_000
+    file_path.write_bytes(contents)
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{file_path}", headers={"Accept": accept}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == contents
+    assert response.headers["content-length"] == str(len(contents))
+
+
+@pytest.mark.parametrize("accept", [ValidAcceptHeaders.PLAIN_TEXT, "*/*"])
+@patch("daq_config_server.app._routes.path_is_whitelisted")
+def test_get_configuration_streams_file_which_changed_since_it_was_watched(
+    mock_validate: MagicMock,
+    mock_app: TestClient,
+    polling_watcher: PollingFileWatcher,
+    tmp_path: Path,
+    accept: str,
+):
+    init_cache(CacheConfig(max_body_size=0))
+    file_path = tmp_path / "large.txt"
+    file_path.write_bytes(b"short\n")
+    endpoint = f"{ENDPOINTS.CONFIG}/{file_path}"
+    etag = mock_app.get(endpoint, headers={"Accept": accept}).headers["etag"]
+
+    # The watcher hasn't polled, so its memoized stat has the old size
+    contents = b"much longer contents\n" * 1000
+    file_path.write_bytes(contents)
+    response = mock_app.get(endpoint, headers={"Accept": accept})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == contents
+    assert response.headers["content-length"] == str(len(contents))
+    assert response.headers["etag"] != etag
+    assert polling_watcher.stat(file_path).st_size == len(contents)
+
+
+@pytest.mark.parametrize(
+    "contents, expected", [("abc\N{SNOWMAN}".encode(), True), (b"\x80\x81", False)]
+)
+def test_file_is_valid_utf8_result_is_cached(
+    tmp_path: Path, contents: bytes, expected: bool
+):
+    file_path = tmp_path / "file.txt"
+    file_path.write_bytes(contents)
+    assert file_is_valid_utf8(file_path) == expected
+    with patch.object(Path, "open") as mock_open:
+        assert file_is_valid_utf8(file_path) == expected
+    mock_open.assert_not_called()
+
+
+def test_file_is_valid_utf8_handles_characters_split_between_chunks(
+    tmp_path: Path,
+):
+    file_path = tmp_path / "file.txt"
+    file_path.write_bytes("a\N{SNOWMAN}".encode())
+    with patch("daq_config_server.app._routes.UTF8_CHECK_CHUNK_SIZE", new=2):
+        assert file_is_valid_utf8(file_path)
+
+
+@pytest.fixture
+def range_test_file(tmp_path: Path) -> Generator[Path, None, None]:
+    file_path = tmp_path / "calibration.bin"
+    file_path.write_bytes(bytes(range(256)) * 4)
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        yield file_path
+
+
+def test_get_configuration_returns_single_byte_range(
+    mock_app: TestClient, range_test_file: Path
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{range_test_file}",
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": "bytes=10-19"},
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == range_test_file.read_bytes()[10:20]
+
+
+def test_get_configuration_returns_suffix_byte_range(
+    mock_app: TestClient, range_test_file: Path
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{range_test_file}",
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": "bytes=-16"},
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == range_test_file.read_bytes()[-16:]
+
+
+def test_get_configuration_returns_multiple_byte_ranges(
+    mock_app: TestClient, range_test_file: Path
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{range_test_file}",
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": "bytes=0-3,100-103"},
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    contents = range_test_file.read_bytes()
+    assert contents[0:4] in response.content
+    assert b"Content-Range: bytes 100-103/1024" in response.content
+
+
+def test_get_configuration_returns_416_for_unsatisfiable_range(
+    mock_app: TestClient, range_test_file: Path
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{range_test_file}",
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": "bytes=2000-"},
+    )
+    assert response.status_code == status.HTTP_416_RANGE_NOT_SATISFIABLE
+
+
+def test_get_configuration_ignores_range_if_file_changed_since_if_range(
+    mock_app: TestClient, range_test_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{range_test_file}"
+    headers = {"Accept": ValidAcceptHeaders.RAW_BYTES}
+    etag = mock_app.get(endpoint, headers=headers).headers["etag"]
+
+    headers |= {"Range": "bytes=0-3", "If-Range": etag}
+    assert mock_app.get(endpoint, headers=headers).status_code == 206
+    range_test_file.write_bytes(b"new contents")
+    response = mock_app.get(endpoint, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"new contents"
+
+
+def test_get_configuration_batch_returns_each_file_in_requested_format(
+    mock_app: TestClient,
+):
+    items = [
+        {"file_path": str(TestDataPaths.TEST_GOOD_JSON_PATH), "accept": accept}
+        for accept in ValidAcceptHeaders
+    ]
+    response = mock_app.post(ENDPOINTS.CONFIG_BATCH, json={"items": items})
+    assert response.status_code == status.HTTP_200_OK
+    json_result, text_result, bytes_result = response.json()["items"]
+
+    expected_bytes = TestDataPaths.TEST_GOOD_JSON_PATH.read_bytes()
+    assert json_result["content"] == json.loads(expected_bytes)
+    assert text_result["content"] == expected_bytes.decode()
+    assert base64.b64decode(bytes_result["content"]) == expected_bytes
+    for result, accept in zip(
+        response.json()["items"], ValidAcceptHeaders, strict=True
+    ):
+        assert result["status_code"] == status.HTTP_200_OK
+        assert result["content_type"] == accept
+        single = mock_app.get(
+            f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}",
+            headers={"Accept": accept},
+        )
+        assert result["etag"] == single.headers["etag"]
+
+
+@patch("daq_config_server.app._routes.path_is_whitelisted")
+def test_get_configuration_batch_keeps_crlf_line_endings_in_plain_text(
+    mock_validate: MagicMock, mock_app: TestClient, tmp_path: Path
+):
+    file_path = tmp_path / "crlf.txt"
+    file_path.write_bytes(b"first line\r\nsecond line\r\n")
+    items = [{"file_path": str(file_path), "accept": ValidAcceptHeaders.PLAIN_TEXT}]
+    response = mock_app.post(ENDPOINTS.CONFIG_BATCH, json={"items": items})
+    (result,) = response.json()["items"]
+
+    single = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{file_path}", headers=ACCEPT_HEADER_DEFAULT
+    )
+    assert result["content"] == single.text == "first line\r\nsecond line\r\n"
+
+
+@pytest.mark.parametrize(
+    "file_path, accept, expected_status",
+    [
+        (
+            TestDataPaths.TEST_FILE_NOT_ON_WHITELIST_PATH,
+            ValidAcceptHeaders.PLAIN_TEXT,
+            status.HTTP_403_FORBIDDEN,
+        ),
+        (
+            TestDataPaths.TEST_INVALID_FILE_PATH,
+            ValidAcceptHeaders.PLAIN_TEXT,
+            status.HTTP_404_NOT_FOUND,
+        ),
+        (
+            "relative_path",
+            ValidAcceptHeaders.PLAIN_TEXT,
+            status.HTTP_422_UNPROCESSABLE_CONTENT,
+        ),
+        (
+            TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH,
+            ValidAcceptHeaders.JSON,
+            status.HTTP_422_UNPROCESSABLE_CONTENT,
+        ),
+    ],
+)
+def test_get_configuration_batch_reports_errors_per_item(
+    mock_app: TestClient,
+    file_path: Path | str,
+    accept: ValidAcceptHeaders,
+    expected_status: int,
+):
+    items = [
+        {"file_path": str(file_path), "accept": accept},
+        {"file_path": str(TestDataPaths.TEST_GOOD_JSON_PATH)},
+    ]
+    response = mock_app.post(ENDPOINTS.CONFIG_BATCH, json={"items": items})
+    assert response.status_code == status.HTTP_200_OK
+    failed, succeeded = response.json()["items"]
+
+    single = mock_app.get(f"{ENDPOINTS.CONFIG}/{file_path}", headers={"Accept": accept})
+    assert failed["status_code"] == single.status_code == expected_status
+    assert failed["detail"] == single.json()["detail"]
+    assert failed["content"] is None
+    assert succeeded["status_code"] == status.HTTP_200_OK
+
+
+def test_get_configuration_batch_returns_304_for_matching_etag(
+    mock_app: TestClient,
+):
+    file_path = TestDataPaths.TEST_GOOD_JSON_PATH
+    etag = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{file_path}", headers=ACCEPT_HEADER_DEFAULT
+    ).headers["etag"]
+    items = [{"file_path": str(file_path), "if_none_match": etag}]
+    response = mock_app.post(ENDPOINTS.CONFIG_BATCH, json={"items": items})
+    (result,) = response.json()["items"]
+    assert result["status_code"] == status.HTTP_304_NOT_MODIFIED
+    assert result["content"] is None
+    assert result["etag"] == etag
+
+
+def test_get_configuration_batch_rejects_too_many_items(mock_app: TestClient):
+    items = [{"file_path": str(TestDataPaths.TEST_GOOD_JSON_PATH)}] * (
+        MAX_BATCH_ITEMS + 1
+    )
+    response = mock_app.post(ENDPOINTS.CONFIG_BATCH, json={"items": items})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+@pytest.fixture
+def large_json_file(tmp_path: Path) -> Generator[Path, None, None]:
+    file_path = tmp_path / "large.json"
+    file_path.write_text(json.dumps({f"key_{i}": i for i in range(2000)}))
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        yield file_path
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_get_configuration_compresses_large_json(
+    mock_app: TestClient, large_json_file: Path, encoding: str
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{large_json_file}",
+        headers={"Accept": ValidAcceptHeaders.JSON, "Accept-Encoding": encoding},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) < large_json_file.stat().st_size
+    assert response.headers["etag"].endswith(f'-{encoding}"')
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == json.loads(large_json_file.read_text())
+
+
+def test_get_configuration_reuses_compressed_body_until_file_changes(
+    mock_app: TestClient, large_json_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{large_json_file}"
+    headers = {"Accept": ValidAcceptHeaders.JSON, "Accept-Encoding": "gzip"}
+    with patch(
+        "daq_config_server.app._routes.compress", side_effect=compress
+    ) as mock_compress:
+        first = mock_app.get(endpoint, headers=headers)
+        second = mock_app.get(endpoint, headers=headers)
+        mock_compress.assert_called_once()
+
+        large_json_file.write_text(json.dumps({"new": 1} | first.json()))
+        third = mock_app.get(endpoint, headers=headers)
+        assert mock_compress.call_count == 2
+    assert first.content == second.content
+    assert third.json()["new"] == 1
+
+
+@pytest.mark.parametrize(
+    "file_path, accept, accept_encoding",
+    [
+        (TestDataPaths.TEST_GOOD_JSON_PATH, ValidAcceptHeaders.JSON, "gzip"),
+        (TestDataPaths.TEST_GOOD_JSON_PATH, ValidAcceptHeaders.JSON, "identity"),
+        (TestDataPaths.TEST_GOOD_JSON_PATH, ValidAcceptHeaders.PLAIN_TEXT, "gzip"),
+    ],
+)
+def test_get_configuration_does_not_compress_small_json_or_raw_files(
+    mock_app: TestClient,
+    file_path: Path,
+    accept: ValidAcceptHeaders,
+    accept_encoding: str,
+):
+    response = mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{file_path}",
+        headers={"Accept": accept, "Accept-Encoding": accept_encoding},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "content-encoding" not in response.headers
+
+
+def test_uncompressed_etag_revalidates_compressed_response(
+    mock_app: TestClient, large_json_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{large_json_file}"
+    etag = mock_app.get(
+        endpoint,
+        headers={"Accept": ValidAcceptHeaders.JSON, "Accept-Encoding": "identity"},
+    ).headers["etag"]
+    response = mock_app.get(
+        endpoint,
+        headers={
+            "Accept": ValidAcceptHeaders.JSON,
+            "Accept-Encoding": "zstd",
+            "If-None-Match": etag,
+        },
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def _without_request_id(headers: Mapping[str, str]) -> dict[str, str]:
+    """Response headers other than the ID which differs between every request"""
+    return {name: value for name, value in headers.items() if name != "x-request-id"}
+
+
+@pytest.mark.parametrize(
+    "accept",
+    [
+        ValidAcceptHeaders.JSON,
+        ValidAcceptHeaders.PLAIN_TEXT,
+        ValidAcceptHeaders.RAW_BYTES,
+    ],
+)
+def test_get_configuration_reuses_encoded_response_until_file_changes(
+    mock_app: TestClient, large_json_file: Path, accept: ValidAcceptHeaders
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{large_json_file}"
+    headers = {"Accept": accept, "Accept-Encoding": "identity"}
+    with patch(
+        "daq_config_server.app._routes._encode_response", side_effect=_encode_response
+    ) as mock_encode:
+        first = mock_app.get(endpoint, headers=headers)
+        second = mock_app.get(endpoint, headers=headers)
+        mock_encode.assert_called_once()
+
+        large_json_file.write_text(json.dumps({"new": 1}))
+        third = mock_app.get(endpoint, headers=headers)
+        assert mock_encode.call_count == 2
+    assert first.content == second.content
+    assert _without_request_id(first.headers) == _without_request_id(second.headers)
+    assert first.headers["content-length"] == str(len(first.content))
+    assert third.json() == {"new": 1}
+
+
+def test_cached_text_response_matches_response_from_disk(
+    mock_app: TestClient, large_json_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{large_json_file}"
+    headers = {"Accept": ValidAcceptHeaders.PLAIN_TEXT}
+    cached = mock_app.get(endpoint, headers=headers)
+    init_cache(CacheConfig(max_body_size=0))
+    from_disk = mock_app.get(endpoint, headers=headers)
+    assert cached.content == from_disk.content
+    assert _without_request_id(cached.headers) == _without_request_id(from_disk.headers)
+
+
+def test_range_request_is_served_from_disk_when_body_is_cached(
+    mock_app: TestClient, range_test_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{range_test_file}"
+    mock_app.get(endpoint, headers={"Accept": ValidAcceptHeaders.RAW_BYTES})
+    response = mock_app.get(
+        endpoint,
+        headers={"Accept": ValidAcceptHeaders.RAW_BYTES, "Range": "bytes=10-19"},
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == range_test_file.read_bytes()[10:20]
+
+
+def test_encoded_response_headers_are_not_modified_by_middleware(
+    mock_app: TestClient, large_json_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{large_json_file}"
+    headers = {"Accept": ValidAcceptHeaders.JSON, "Origin": "http://example.com"}
+    response = mock_app.get(endpoint, headers=headers)
+    assert "access-control-allow-origin" in response.headers
+    encoded = next(iter(get_response_body_cache()._entries.values())).value
+    assert b"access-control-allow-origin" not in dict(encoded.raw_headers)
+
+
+def test_get_configuration_events_streams_change_events(mock_app: TestClient):
+    file_path = TestDataPaths.TEST_GOOD_JSON_PATH
+
+    async def one_event(file_paths: list[Path], media_type: ValidAcceptHeaders):
+        yield f"event: change\ndata: {file_paths} {media_type}\n\n"
+
+    with patch("daq_config_server.app._routes._change_events", side_effect=one_event):
+        response = mock_app.get(
+            ENDPOINTS.CONFIG_EVENTS,
+            params={
+                "file_path": [str(file_path), str(file_path)],
+                "accept": "application/json",
+            },
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == (f"event: change\ndata: {[file_path]} application/json\n\n")
+
+
+@pytest.mark.parametrize(
+    "file_path, expected_status",
+    [
+        ("relative/path", status.HTTP_422_UNPROCESSABLE_CONTENT),
+        ("/not/whitelisted", status.HTTP_403_FORBIDDEN),
+    ],
+)
+def test_get_configuration_events_checks_every_file(
+    mock_app: TestClient, file_path: str, expected_status: int
+):
+    response = mock_app.get(
+        ENDPOINTS.CONFIG_EVENTS,
+        params={"file_path": [str(TestDataPaths.TEST_GOOD_JSON_PATH), file_path]},
+    )
+    assert response.status_code == expected_status
+
+
+@pytest.fixture
+def watch_file(tmp_path: Path) -> Generator[Path, None, None]:
+    file_path = tmp_path / "feature_settings.json"
+    file_path.write_text('{"use_feature": false}')
+    init_events(EventsConfig(poll_interval_s=0.01))
+    with patch("daq_config_server.app._routes.path_is_whitelisted"):
+        yield file_path
+    init_events(EventsConfig())
+
+
+def _watch(mock_app: TestClient, file_path: Path, **params: str | float):
+    return mock_app.get(
+        f"{ENDPOINTS.CONFIG_WATCH}/{file_path}",
+        params=params,
+        headers={"Accept": ValidAcceptHeaders.JSON},
+    )
+
+
+def test_watch_configuration_without_since_responds_immediately(
+    mock_app: TestClient, watch_file: Path
+):
+    response = _watch(mock_app, watch_file, timeout=60)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"use_feature": False}
+
+
+def test_watch_configuration_responds_immediately_if_already_changed(
+    mock_app: TestClient, watch_file: Path
+):
+    etag = _watch(mock_app, watch_file).headers["etag"]
+    watch_file.write_text('{"use_feature": true}')
+    response = _watch(mock_app, watch_file, since=etag, timeout=60)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"use_feature": True}
+    assert response.headers["etag"] != etag
+
+
+def test_watch_configuration_gives_304_if_unchanged_after_timeout(
+    mock_app: TestClient, watch_file: Path
+):
+    etag = _watch(mock_app, watch_file).headers["etag"]
+    response = _watch(mock_app, watch_file, since=etag, timeout=0.05)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+
+
+def test_watch_configuration_responds_when_file_changes(
+    mock_app: TestClient, watch_file: Path
+):
+    etag = _watch(mock_app, watch_file).headers["etag"]
+    Timer(0.1, watch_file.write_text, ['{"use_feature": true}']).start()
+    response = _watch(mock_app, watch_file, since=etag, timeout=60)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"use_feature": True}
+
+
+def test_watch_configuration_timeout_is_limited(mock_app: TestClient, watch_file: Path):
+    etag = _watch(mock_app, watch_file).headers["etag"]
+    init_events(EventsConfig(max_watch_timeout_s=0))
+    response = _watch(mock_app, watch_file, since=etag, timeout=60)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.parametrize(
+    "file_path, expected_status",
+    [
+        ("relative/path", status.HTTP_422_UNPROCESSABLE_CONTENT),
+        ("/not/whitelisted", status.HTTP_403_FORBIDDEN),
+    ],
+)
+def test_watch_configuration_checks_file_path(
+    mock_app: TestClient, file_path: str, expected_status: int
+):
+    response = mock_app.get(f"{ENDPOINTS.CONFIG_WATCH}/{file_path}")
+    assert response.status_code == expected_status
+
+
+def test_readiness_check_gives_503_until_ready(mock_app: TestClient):
+    init_readiness(warmup_enabled=True)
+    set_warmup_status(WarmupStatus(total=3, warmed=1))
+    response = mock_app.get(ENDPOINTS.READY)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["ready"] is False
+    assert response.json()["warmup"] == {
+        "total": 3,
+        "warmed": 1,
+        "failed": 0,
+        "duration_s": None,
+    }
+    clear_readiness()
+
+
+def test_readiness_check_reports_cached_entries(mock_app: TestClient):
+    init_readiness(warmup_enabled=False)
+    mock_app.get(
+        f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}",
+        headers={"Accept": ValidAcceptHeaders.JSON},
+    )
+    response = mock_app.get(ENDPOINTS.READY)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "ready": True,
+        "cached_conversions": 1,
+        "cached_response_bodies": 1,
+        "warmup": None,
+    }
+    clear_readiness()
+
+
+@pytest.fixture
+def server_timing_enabled() -> Generator[None, None, None]:
+    init_server_timing(ServerTimingConfig(enabled=True))
+    yield
+    init_server_timing(ServerTimingConfig())
+
+
+def test_server_timing_is_not_sent_by_default(mock_app: TestClient):
+    response = mock_app.get(f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}")
+    assert response.status_code == status.HTTP_200_OK
+    assert "server-timing" not in response.headers
+
+
+def test_server_timing_breaks_down_conversion_and_leaves_out_cached_phases(
+    mock_app: TestClient,
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+    server_timing_enabled: None,
+):
+    def get_phases() -> list[str]:
+        response = mock_app.get(
+            f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH}",
+            headers={"Accept": ValidAcceptHeaders.JSON, "Accept-Encoding": "gzip"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        return [
+            metric.split(";")[0].strip()
+            for metric in response.headers["server-timing"].split(",")
+        ]
+
+    assert get_phases() == [
+        "check",
+        "read",
+        "convert",
+        "serialize",
+        "compress",
+        "total",
+    ]
+    assert get_phases() == ["check", "total"]
+
+
+def test_server_timing_is_sent_with_not_modified_responses(
+    mock_app: TestClient, server_timing_enabled: None
+):
+    url = f"{ENDPOINTS.CONFIG}/{TestDataPaths.TEST_GOOD_JSON_PATH}"
+    etag = mock_app.get(url).headers["etag"]
+    response = mock_app.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "total;dur=" in response.headers["server-timing"]
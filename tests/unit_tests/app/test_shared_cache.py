@@ -0,0 +1,195 @@
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis import ConnectionError as RedisConnectionError
+
+from daq_config_server.app._cache import FileFingerprint, init_cache
+from daq_config_server.app._config import CacheConfig, SharedCacheConfig
+from daq_config_server.app._routes import (
+    get_converted_file_contents,
+    get_converted_file_json,
+)
+from daq_config_server.app._shared_cache import (
+    SharedCache,
+    close_shared_cache,
+    get_shared_cache,
+    init_shared_cache,
+)
+from tests.constants import TestDataPaths
+
+
+class FakeRedis:
+    """In-process stand-in for the Redis server shared by every worker"""
+
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.expiries: dict[str, int | None] = {}
+        self.closed = False
+
+    def get(self, name: str) -> bytes | None:
+        return self.data.get(name)
+
+    def set(self, name: str, value: bytes, ex: int | None = None) -> Any:
+        self.data[name] = value
+        self.expiries[name] = ex
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class UnavailableRedis(FakeRedis):
+    def get(self, name: str) -> bytes | None:
+        raise RedisConnectionError("Connection refused")
+
+    def set(self, name: str, value: bytes, ex: int | None = None) -> Any:
+        raise RedisConnectionError("Connection refused")
+
+
+@pytest.fixture
+def fake_redis() -> Generator[FakeRedis, None, None]:
+    redis = FakeRedis()
+    init_shared_cache(SharedCacheConfig(enabled=True, ttl_s=60), client=redis)
+    yield redis
+    close_shared_cache()
+
+
+def _new_worker():
+    """Start again with an empty local cache, as another worker would"""
+    init_cache(CacheConfig())
+
+
+def _fingerprint(path: Path, mtime_ns: int = 0) -> FileFingerprint:
+    return FileFingerprint(path, inode=1, mtime_ns=mtime_ns, size=10)
+
+
+def test_shared_cache_is_disabled_by_default():
+    init_shared_cache(SharedCacheConfig())
+    assert get_shared_cache() is None
+
+
+def test_shared_cache_keys_on_fingerprint_and_converter(fake_redis: FakeRedis):
+    cache = SharedCache(fake_redis, key_prefix="test", ttl_s=60)
+    path = Path("/a")
+    cache.put(_fingerprint(path), "parse", b"{}")
+
+    assert cache.get(_fingerprint(path), "parse") == b"{}"
+    assert cache.get(_fingerprint(path, mtime_ns=1), "parse") is None
+    assert cache.get(_fingerprint(path), "other_parse") is None
+    assert all(key.startswith("test:json:") for key in fake_redis.data)
+    assert set(fake_redis.expiries.values()) == {60}
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.errors) == (1, 2, 0)
+
+
+def test_conversion_is_shared_between_workers(
+    fake_redis: FakeRedis, mock_file_converter_map: dict[str, Any]
+):
+    file_path = TestDataPaths.TEST_GOOD_LUT_PATH
+    expected = get_converted_file_json(file_path)
+    assert len(fake_redis.data) == 1
+
+    _new_worker()
+    with patch("daq_config_server.app._routes._convert_file_contents") as convert:
+        assert get_converted_file_json(file_path) == expected
+        assert get_converted_file_contents(file_path) == get_converted_file_contents(
+            file_path
+        )
+        convert.assert_not_called()
+    shared_cache = get_shared_cache()
+    assert shared_cache and shared_cache.stats().hits == 2
+
+
+def test_converted_contents_from_shared_cache_match_conversion(
+    fake_redis: FakeRedis, mock_file_converter_map: dict[str, Any]
+):
+    file_path = TestDataPaths.TEST_GOOD_XML_PATH
+    expected = get_converted_file_contents(file_path)
+
+    _new_worker()
+    assert get_converted_file_contents(file_path) == expected
+
+
+def test_changed_file_is_converted_again(
+    fake_redis: FakeRedis, mock_file_converter_map: dict[str, Any], tmp_path: Path
+):
+    file_path = tmp_path / "settings.json"
+    file_path.write_text('{"a": 1}')
+    get_converted_file_json(file_path, _fingerprint(file_path))
+
+    _new_worker()
+    file_path.write_text('{"a": 2}')
+    assert get_converted_file_json(file_path, _fingerprint(file_path, 1)) == b'{"a":2}'
+    assert len(fake_redis.data) == 2
+
+
+def test_unavailable_shared_cache_falls_back_to_converting(
+    mock_file_converter_map: dict[str, Any],
+):
+    init_shared_cache(SharedCacheConfig(enabled=True), client=UnavailableRedis())
+    try:
+        assert get_converted_file_contents(TestDataPaths.TEST_GOOD_XML_PATH)
+        shared_cache = get_shared_cache()
+        assert shared_cache
+        stats = shared_cache.stats()
+        # Writing the result is skipped as reading it failed
+        assert (stats.errors, stats.skipped) == (1, 1)
+    finally:
+        close_shared_cache()
+
+
+class CountingUnavailableRedis(UnavailableRedis):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def get(self, name: str) -> bytes | None:
+        self.calls += 1
+        return super().get(name)
+
+
+def test_unavailable_shared_cache_is_skipped_until_backoff_ends():
+    redis = CountingUnavailableRedis()
+    cache = SharedCache(redis, key_prefix="test", ttl_s=60, backoff_s=10)
+    path = Path("/a")
+    with patch("daq_config_server.app._shared_cache.time.monotonic") as mock_time:
+        mock_time.return_value = 100.0
+        for _ in range(3):
+            assert cache.get(_fingerprint(path), "parse") is None
+        assert redis.calls == 1
+
+        mock_time.return_value = 110.0
+        assert cache.get(_fingerprint(path), "parse") is None
+        assert redis.calls == 2
+    stats = cache.stats()
+    assert (stats.errors, stats.skipped) == (2, 2)
+
+
+def test_unavailable_shared_cache_warnings_are_rate_limited(
+    caplog: pytest.LogCaptureFixture,
+):
+    cache = SharedCache(UnavailableRedis(), key_prefix="test", ttl_s=60)
+    path = Path("/a")
+    with patch("daq_config_server.app._shared_cache.time.monotonic") as mock_time:
+        for now in (100.0, 101.0, 102.0, 160.0):
+            mock_time.return_value = now
+            cache.get(_fingerprint(path), "parse")
+    warnings = [r.getMessage() for r in caplog.records if r.levelname == "WARNING"]
+    assert len(warnings) == 2
+    assert "more errors" not in warnings[0]
+    assert warnings[1].endswith("(2 more errors since the last warning)")
+
+
+def test_init_shared_cache_connects_to_configured_url():
+    with patch("daq_config_server.app._shared_cache.from_url") as mock_from_url:
+        init_shared_cache(SharedCacheConfig(enabled=True, url="redis://redis:6379/1"))
+        mock_from_url.assert_called_once_with(
+            "redis://redis:6379/1", socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+        close_shared_cache()
+    client: MagicMock = mock_from_url.return_value
+    client.close.assert_called_once()
+    assert get_shared_cache() is None
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from daq_config_server.app._cache import get_conversion_cache, get_response_body_cache
+from daq_config_server.app._config import AppConfig, WarmupConfig
+from daq_config_server.app._readiness import get_warmup_status
+from daq_config_server.app._routes import ValidAcceptHeaders
+from daq_config_server.app._warmup import warm_up_cache
+from daq_config_server.app.api import lifespan
+from tests.constants import TestDataPaths
+
+
+@pytest.fixture
+def mock_converter_map_paths() -> Generator[list[Path], None, None]:
+    paths = [TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH]
+    with patch(
+        "daq_config_server.app._warmup.get_converter_map_paths", return_value=paths
+    ):
+        yield paths
+
+
+async def test_warm_up_cache_converts_every_mapped_file(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+    mock_converter_map_paths: list[Path],
+):
+    status = await warm_up_cache(WarmupConfig())
+    assert status.total == status.warmed == 1
+    assert status.failed == 0
+    assert status.finished
+    assert len(get_conversion_cache()) == 1
+    assert len(get_response_body_cache()) == 1
+    assert get_warmup_status() is status
+
+
+async def test_warm_up_cache_counts_files_which_fail(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+    mock_converter_map_paths: list[Path],
+    caplog: pytest.LogCaptureFixture,
+):
+    mock_converter_map_paths.append(TestDataPaths.TEST_INVALID_FILE_PATH)
+    with caplog.at_level(logging.WARNING):
+        status = await warm_up_cache(WarmupConfig())
+    assert (status.total, status.warmed, status.failed) == (2, 1, 1)
+    assert f"Failed to warm up {TestDataPaths.TEST_INVALID_FILE_PATH}" in caplog.text
+
+
+async def test_warm_up_cache_skips_mapped_files_which_are_not_whitelisted(
+    mock_file_converter_map: dict[str, Callable[[str], Any]],
+    mock_converter_map_paths: list[Path],
+    caplog: pytest.LogCaptureFixture,
+):
+    mock_converter_map_paths += [
+        TestDataPaths.TEST_FILE_NOT_ON_WHITELIST_PATH,
+        Path("relative"),
+    ]
+    with caplog.at_level(logging.WARNING):
+        status = await warm_up_cache(WarmupConfig())
+    assert (status.total, status.warmed, status.failed) == (1, 1, 0)
+    assert "Failed to warm up" not in caplog.text
+
+
+async def test_warm_up_cache_can_include_whitelisted_files(
+    mock_converter_map_paths: list[Path],
+):
+    with patch("daq_config_server.app._warmup.warm_up_file") as mock_warm_up_file:
+        status = await warm_up_cache(WarmupConfig(include_whitelisted_files=True))
+    assert status.total == 4
+    mock_warm_up_file.assert_any_call(
+        TestDataPaths.TEST_BEAMLINE_PARAMETERS_PATH, ValidAcceptHeaders.JSON
+    )
+    mock_warm_up_file.assert_any_call(
+        TestDataPaths.TEST_GOOD_JSON_PATH, ValidAcceptHeaders.PLAIN_TEXT
+    )
+
+
+@patch("daq_config_server.app.api.get_whitelist", MagicMock())
+@patch("daq_config_server.app.api.init_whitelist", MagicMock())
+@patch("daq_config_server.app.api.init_converter_map", MagicMock())
+async def test_lifespan_warms_up_cache_in_background_when_enabled():
+    config = AppConfig(warmup=WarmupConfig(enabled=True))
+    warm_up_started = asyncio.Event()
+
+    async def slow_warm_up(_: WarmupConfig):
+        warm_up_started.set()
+        await asyncio.sleep(60)
+
+    with (
+        patch("daq_config_server.app.api.load_config", return_value=config),
+        patch(
+            "daq_config_server.app.api.warm_up_cache", side_effect=slow_warm_up
+        ) as mock_warm_up_cache,
+    ):
+        async with asyncio.timeout(5):
+            async with lifespan(MagicMock()):
+                await warm_up_started.wait()
+    mock_warm_up_cache.assert_called_once_with(config.warmup)
+
+
+@patch("daq_config_server.app.api.get_whitelist", MagicMock())
+@patch("daq_config_server.app.api.init_whitelist", MagicMock())
+@patch("daq_config_server.app.api.init_converter_map", MagicMock())
+@patch("daq_config_server.app.api.warm_up_cache", new_callable=AsyncMock)
+async def test_lifespan_does_not_warm_up_cache_by_default(
+    mock_warm_up_cache: AsyncMock,
+):
+    async with lifespan(MagicMock()):
+        pass
+    mock_warm_up_cache.assert_not_called()
@@ -0,0 +1,309 @@
+import os
+from collections.abc import Generator
+from pathlib import Path
+from queue import Queue
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from daq_config_server.app import _watcher
+from daq_config_server.app._cache import (
+    FileFingerprint,
+    get_conversion_cache,
+    get_negative_cache,
+)
+from daq_config_server.app._config import FileWatcherBackend, FileWatcherConfig
+from daq_config_server.app._routes import ENDPOINTS, ValidAcceptHeaders
+from daq_config_server.app._watcher import (
+    FileWatcher,
+    InotifyFileWatcher,
+    PollingFileWatcher,
+    get_file_watcher,
+    init_file_watcher,
+    stat_file,
+)
+from daq_config_server.app.api import app
+
+EVENT_TIMEOUT_S = 5
+
+
+@pytest.fixture
+def mock_app():
+    return TestClient(app)
+
+
+def _inotify_is_available() -> bool:
+    try:
+        InotifyFileWatcher().stop()
+    except OSError:
+        return False
+    return True
+
+
+requires_inotify = pytest.mark.skipif(
+    not _inotify_is_available(), reason="inotify is not available"
+)
+
+
+@pytest.fixture
+def watched_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "config" / "settings.json"
+    file_path.parent.mkdir()
+    file_path.write_text('{"a": 1}')
+    return file_path
+
+
+@pytest.fixture
+def inotify_watcher() -> Generator[InotifyFileWatcher, None, None]:
+    watcher = InotifyFileWatcher()
+    watcher.start()
+    yield watcher
+    watcher.stop()
+
+
+def _listen(watcher: FileWatcher) -> "Queue[Path]":
+    changes: Queue[Path] = Queue()
+    watcher.add_listener(changes.put)
+    return changes
+
+
+def _wait_for_change(changes: "Queue[Path]", path: Path):
+    """Wait for a change to path, skipping changes to other files in its directory"""
+    while changes.get(timeout=EVENT_TIMEOUT_S) != path:
+        pass
+
+
+def _modify(file_path: Path, contents: str):
+    file_path.write_text(contents)
+    # Make sure the modification time changes on coarse-grained filesystems
+    stat_result = file_path.stat()
+    os.utime(file_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9))
+
+
+def test_watcher_memoizes_stat(polling_watcher: PollingFileWatcher, watched_file: Path):
+    first = polling_watcher.stat(watched_file)
+    with patch("daq_config_server.app._watcher.os.stat") as mock_stat:
+        assert polling_watcher.stat(watched_file) == first
+        mock_stat.assert_not_called()
+    assert polling_watcher.watched_paths() == {watched_file}
+
+
+def test_polling_watcher_forgets_changed_file_and_invalidates_caches(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    changes = _listen(polling_watcher)
+    fingerprint = FileFingerprint.from_stat(
+        watched_file, polling_watcher.stat(watched_file)
+    )
+    get_conversion_cache().put(watched_file, fingerprint, {"a": 1})
+
+    polling_watcher.poll()
+    assert changes.empty()
+
+    _modify(watched_file, '{"a": 2}')
+    polling_watcher.poll()
+    assert changes.get_nowait() == watched_file
+    assert polling_watcher.watched_paths() == set()
+    assert len(get_conversion_cache()) == 0
+    assert polling_watcher.stat(watched_file).st_size == watched_file.stat().st_size
+
+
+def test_polling_watcher_forgets_deleted_file(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    changes = _listen(polling_watcher)
+    polling_watcher.stat(watched_file)
+    watched_file.unlink()
+    polling_watcher.poll()
+    assert changes.get_nowait() == watched_file
+    with pytest.raises(FileNotFoundError):
+        polling_watcher.stat(watched_file)
+
+
+def test_stat_is_not_memoized_if_file_changes_while_it_is_stat_ed(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    real_stat = os.stat
+
+    def stat_then_change(path: Path) -> os.stat_result:
+        stat_result = real_stat(path)
+        polling_watcher._changed(path)
+        return stat_result
+
+    with patch("daq_config_server.app._watcher.os.stat", side_effect=stat_then_change):
+        polling_watcher.stat(watched_file)
+    assert polling_watcher.watched_paths() == set()
+
+
+def test_change_forgets_missing_files_below_changed_directory(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    missing_file = watched_file.with_name("missing.json")
+    get_negative_cache().put(missing_file, 404, "Not found")
+    polling_watcher._changed(watched_file.parent, recursive=True)
+    assert get_negative_cache().get(missing_file) is None
+
+
+def test_failing_listener_does_not_stop_other_listeners(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    def failing_listener(_: Path):
+        raise RuntimeError("Listener failed")
+
+    polling_watcher.add_listener(failing_listener)
+    changes = _listen(polling_watcher)
+    polling_watcher.stat(watched_file)
+    polling_watcher._changed(watched_file)
+    assert changes.get_nowait() == watched_file
+
+
+@requires_inotify
+def test_inotify_watcher_sees_file_modified(
+    inotify_watcher: InotifyFileWatcher, watched_file: Path
+):
+    changes = _listen(inotify_watcher)
+    inotify_watcher.stat(watched_file)
+    watched_file.write_text('{"a": 2}')
+    _wait_for_change(changes, watched_file)
+    assert watched_file not in inotify_watcher.watched_paths()
+
+
+@requires_inotify
+def test_inotify_watcher_sees_file_created(
+    inotify_watcher: InotifyFileWatcher, watched_file: Path
+):
+    changes = _listen(inotify_watcher)
+    new_file = watched_file.with_name("new.json")
+    with pytest.raises(FileNotFoundError):
+        inotify_watcher.stat(new_file)
+    new_file.write_text("{}")
+    _wait_for_change(changes, new_file)
+    assert watched_file not in inotify_watcher.watched_paths()
+
+
+@requires_inotify
+def test_inotify_watcher_sees_file_replaced_by_rename(
+    inotify_watcher: InotifyFileWatcher, watched_file: Path
+):
+    changes = _listen(inotify_watcher)
+    inotify_watcher.stat(watched_file)
+    new_file = watched_file.with_suffix(".tmp")
+    new_file.write_text('{"a": 2}')
+    new_file.replace(watched_file)
+    _wait_for_change(changes, watched_file)
+
+
+@requires_inotify
+def test_inotify_watcher_sees_parent_directory_renamed(
+    inotify_watcher: InotifyFileWatcher, watched_file: Path
+):
+    changes = _listen(inotify_watcher)
+    inotify_watcher.stat(watched_file)
+    watched_file.parent.rename(watched_file.parent.with_name("moved"))
+    _wait_for_change(changes, watched_file.parent)
+    assert watched_file not in inotify_watcher.watched_paths()
+    with pytest.raises(FileNotFoundError):
+        inotify_watcher.stat(watched_file)
+
+
+def test_init_file_watcher_disabled_by_default():
+    init_file_watcher(FileWatcherConfig())
+    assert get_file_watcher() is None
+
+
+@pytest.mark.parametrize(
+    "backend, expected_type",
+    [
+        (FileWatcherBackend.POLLING, PollingFileWatcher),
+        pytest.param(
+            FileWatcherBackend.INOTIFY, InotifyFileWatcher, marks=requires_inotify
+        ),
+    ],
+)
+def test_init_file_watcher_uses_configured_backend(
+    backend: FileWatcherBackend, expected_type: type[FileWatcher]
+):
+    init_file_watcher(FileWatcherConfig(enabled=True, backend=backend))
+    watcher = get_file_watcher()
+    try:
+        assert isinstance(watcher, expected_type)
+    finally:
+        assert watcher
+        watcher.stop()
+        _watcher._file_watcher = None
+
+
+def test_auto_backend_falls_back_to_polling_without_inotify():
+    with patch(
+        "daq_config_server.app._watcher._load_libc", side_effect=OSError("no inotify")
+    ):
+        init_file_watcher(
+            FileWatcherConfig(enabled=True, backend=FileWatcherBackend.AUTO)
+        )
+    watcher = get_file_watcher()
+    try:
+        assert isinstance(watcher, PollingFileWatcher)
+    finally:
+        assert watcher
+        watcher.stop()
+        _watcher._file_watcher = None
+
+
+@requires_inotify
+def test_local_filesystem_is_not_network_filesystem(tmp_path: Path):
+    assert not _watcher._is_network_filesystem(_watcher._load_libc(), tmp_path)
+
+
+@requires_inotify
+def test_auto_backend_polls_files_on_network_filesystems(watched_file: Path):
+    init_file_watcher(
+        FileWatcherConfig(
+            enabled=True, backend=FileWatcherBackend.AUTO, poll_interval_s=0.05
+        )
+    )
+    watcher = get_file_watcher()
+    assert isinstance(watcher, InotifyFileWatcher)
+    try:
+        changes = _listen(watcher)
+        with patch(
+            "daq_config_server.app._watcher._is_network_filesystem", return_value=True
+        ):
+            watcher.stat(watched_file)
+        assert watcher._watched_dirs == {}
+        _modify(watched_file, '{"a": 2}')
+        _wait_for_change(changes, watched_file)
+        assert watcher.watched_paths() == set()
+    finally:
+        watcher.stop()
+        _watcher._file_watcher = None
+
+
+def test_stat_file_uses_watcher(
+    polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    with patch("daq_config_server.app._watcher._file_watcher", polling_watcher):
+        stat_file(watched_file)
+    assert polling_watcher.watched_paths() == {watched_file}
+
+
+def test_cache_hit_needs_no_stat_with_watcher(
+    mock_app: TestClient, polling_watcher: PollingFileWatcher, watched_file: Path
+):
+    endpoint = f"{ENDPOINTS.CONFIG}/{watched_file}"
+    headers = {"Accept": ValidAcceptHeaders.JSON}
+    with (
+        patch("daq_config_server.app._routes.path_is_whitelisted"),
+        patch("daq_config_server.app._watcher._file_watcher", polling_watcher),
+    ):
+        assert mock_app.get(endpoint, headers=headers).json() == {"a": 1}
+        with patch("daq_config_server.app._watcher.os.stat") as mock_stat:
+            response = mock_app.get(endpoint, headers=headers)
+            mock_stat.assert_not_called()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"a": 1}
+
+        _modify(watched_file, '{"a": 2}')
+        polling_watcher.poll()
+        assert mock_app.get(endpoint, headers=headers).json() == {"a": 2}
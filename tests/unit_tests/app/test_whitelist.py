@@ -9,8 +9,10 @@ from _pytest.fixtures import FixtureRequest
 from daq_config_server.app._config import WhitelistConfig
 from daq_config_server.app._whitelist import (
     FilesystemWhitelist,
+    WhitelistIndex,
     get_whitelist,
     init_whitelist,
+    path_is_whitelisted,
 )
 
 """The tests in this file will read directly from the whitelist.yaml in the current
@@ -138,3 +140,47 @@ def test_file_based_whitelist():
         Path("/tests/test_data/beamline_parameters.txt")
     }
     assert whitelist.whitelist_dirs == {Path("/tests/test_data/good_dir")}
+
+
+@pytest.mark.parametrize(
+    "file_path, expected",
+    [
+        ("/dls_sw/i03/parameters.txt", True),
+        ("/dls_sw/i03/software/daq_configuration/lookup/table.txt", True),
+        ("/dls_sw/i03/software/daq_configuration", True),
+        ("/dls_sw/i03/software/daq_configuration_old/table.txt", False),
+        ("/dls_sw/i03/software/other.txt", False),
+        ("/dls_sw/i04/software/daq_configuration/table.txt", True),
+        ("/dls_sw/i04/software", False),
+        ("/dls_sw", False),
+        ("/", False),
+        ("dls_sw/i04/software/daq_configuration/table.txt", False),
+        ("/dls_sw/i04/software/../daq_configuration/table.txt", False),
+    ],
+)
+def test_whitelist_index_matches_files_and_anything_in_whitelisted_dirs(
+    file_path: str, expected: bool
+):
+    dirs = [
+        Path("/dls_sw/i03/software/daq_configuration/"),
+        Path("/dls_sw/i04/software/daq_configuration"),
+    ]
+    index = WhitelistIndex(files=[Path("/dls_sw/i03/parameters.txt")], dirs=dirs)
+    assert (Path(file_path) in index) is expected
+    # The same as checking every whitelisted directory in turn
+    assert expected is (
+        Path(file_path) in index.files
+        or any(Path(file_path).is_relative_to(directory) for directory in dirs)
+    )
+
+
+def test_path_is_whitelisted_uses_reloaded_whitelist(tmp_path: Path):
+    whitelist_path = tmp_path / "whitelist.yaml"
+    whitelist_path.write_text("whitelist_files: []\nwhitelist_dirs: [/old]\n")
+    init_whitelist(WhitelistConfig(config_file=str(whitelist_path)))
+    assert path_is_whitelisted(Path("/old/file.txt"))
+
+    whitelist_path.write_text("whitelist_files: []\nwhitelist_dirs: [/new]\n")
+    get_whitelist()._fetch_and_update()
+    assert not path_is_whitelisted(Path("/old/file.txt"))
+    assert path_is_whitelisted(Path("/new/file.txt"))
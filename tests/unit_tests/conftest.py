@@ -5,7 +5,8 @@ import pytest
 from _pytest.tmpdir import TempPathFactory
 from pytest import FixtureRequest
 
-from daq_config_server.app._config import WhitelistConfig
+from daq_config_server.app._cache import init_cache
+from daq_config_server.app._config import CacheConfig, WhitelistConfig
 from daq_config_server.app._whitelist import (
     init_whitelist,
 )
@@ -36,3 +37,8 @@ def patch_whitelist_fetch(tmp_whitelist: Path, request: FixtureRequest):
             yield
     else:
         yield
+
+
+@pytest.fixture(autouse=True)
+def reset_conversion_cache():
+    init_cache(CacheConfig())